@@ -4,6 +4,7 @@ import importlib
 import time
 import os
 import uuid
+from collections import namedtuple
 import streamlit.components.v1 as components
 
 # Import Core Modules
@@ -19,6 +20,14 @@ import core.storage
 importlib.reload(core.storage)
 from core.storage import StorageManager, Artifact
 
+import core.engine_health
+importlib.reload(core.engine_health)
+from core.engine_health import EngineHealthTracker
+
+import core.watchlist
+importlib.reload(core.watchlist)
+from core.watchlist import Watchlist
+
 import core.llm_processor
 importlib.reload(core.llm_processor)
 from core.llm_processor import LLMProcessor
@@ -148,25 +157,28 @@ if 'report_path' not in st.session_state: st.session_state.report_path = None
 if 'search_mode' not in st.session_state: st.session_state.search_mode = None
 
 # --- SHARED FUNCTIONS (Moved to Top) ---
+ResultObj = namedtuple("ResultObj", ["id", "title", "url", "engine", "snippet"])
+ArtifactObj = namedtuple("ArtifactObj", ["id", "result_id", "type", "value", "context"])
+
+def _analyze_result(i, res, analyzer):
+    r_obj = ResultObj(i, res.get('title'), res.get('link'), res.get('engine'), res.get('snippet'))
+    arts = analyzer.extract_artifacts(f"{res.get('title')} {res.get('snippet')}")
+    arts += [{"type": "Watchlist Hit", "value": h['selector'], "context": h['context']}
+             for h in {h['selector']: h for h in res.get('watchlist', [])}.values()]
+    return r_obj, [ArtifactObj(f"{i}_{j}", i, a['type'], a['value'], a.get('context')) for j, a in enumerate(arts)]
+
 def _process_results(raw_results, analyzer, status, limit):
     processed_results = []
     all_artifacts = []
-    
-    from collections import namedtuple
-    ResultObj = namedtuple("ResultObj", ["id", "title", "url", "engine", "snippet"])
-    ArtifactObj = namedtuple("ArtifactObj", ["id", "result_id", "type", "value", "context"])
 
     # Limit results
     to_process = raw_results[:limit]
     
     progress_bar = status.progress(0)
     for i, res in enumerate(to_process):
-        r_obj = ResultObj(i, res.get('title'), res.get('link'), res.get('engine'), res.get('snippet'))
+        r_obj, arts = _analyze_result(i, res, analyzer)
         processed_results.append(r_obj)
-        
-        arts = analyzer.extract_artifacts(f"{res.get('title')} {res.get('snippet')}")
-        for j, a in enumerate(arts):
-            all_artifacts.append(ArtifactObj(f"{i}_{j}", i, a['type'], a['value'], a.get('context')))
+        all_artifacts.extend(arts)
             
         progress_bar.progress((i + 1) / len(to_process))
     
@@ -174,6 +186,44 @@ def _process_results(raw_results, analyzer, status, limit):
     st.session_state.artifacts = all_artifacts
     status.update(label="Investigation Complete", state="complete", expanded=False)
 
+def _stream_results(batches, analyzer, status, limit):
+    """
+    Renders, analyses and stores search results engine by engine as they
+    arrive. Stops (cancelling slower engines) once the limit is reached.
+    """
+    processed_results = []
+    all_artifacts = []
+    live_table = st.empty()
+
+    for batch in batches:
+        progress = f"({batch['completed']}/{batch['total']})"
+        if batch['skipped']:
+            status.write(f"⏭️ {batch['engine']} skipped: {batch['error']} {progress}")
+        elif batch['error'] is not None and not batch['results']:
+            status.write(f"⚠️ {batch['engine']} failed: {str(batch['error'])[:100]} {progress}")
+        else:
+            status.write(f"✅ {batch['engine']}: {len(batch['results'])} new results {progress}")
+
+        for res in batch['results'][:limit - len(processed_results)]:
+            r_obj, arts = _analyze_result(len(processed_results), res, analyzer)
+            processed_results.append(r_obj)
+            all_artifacts.extend(arts)
+
+        st.session_state.results = processed_results
+        st.session_state.artifacts = all_artifacts
+        if processed_results:
+            status.update(label=f"Investigating... {len(processed_results)} results so far")
+            live_table.dataframe(pd.DataFrame(
+                [{"Title": r.title, "URL": r.url, "Source": r.engine} for r in processed_results]
+            ), use_container_width=True)
+        if len(processed_results) >= limit:
+            status.write(f"Reached the {limit} result limit.")
+            break
+
+    batches.close()
+    live_table.empty()
+    status.update(label="Investigation Complete", state="complete", expanded=False)
+
 def _run_search(query, mode, proxy, limit, use_llm):
     # Reset
     st.session_state.results = []
@@ -182,9 +232,11 @@ def _run_search(query, mode, proxy, limit, use_llm):
     st.session_state.search_mode = "generic"
     
     status = st.status("Initializing Investigation...", expanded=True)
+    crawler = None
     try:
         tor = TorHandler(proxy_url=proxy)
         crawler = Crawler(tor_handler=tor)
+        crawler.start_circuit_manager()
         llm = LLMProcessor()
         analyzer = Analyzer()
         
@@ -195,13 +247,15 @@ def _run_search(query, mode, proxy, limit, use_llm):
             refined_query = query
         
         status.write(f"🕷️ Crawling Dark Web Engines: {refined_query}")
-        raw_results = crawler.search(refined_query)
-        
-        _process_results(raw_results, analyzer, status, limit)
+        _stream_results(crawler.iter_search(refined_query), analyzer, status, limit)
         
     except Exception as e:
         status.update(label="Error Occurred", state="error")
         st.error(f"Error: {e}")
+    finally:
+        # Every action builds its own crawler: release its threads and connections
+        if crawler is not None:
+            crawler.close()
 
 def _run_direct(urls, proxy):
     st.session_state.results = []
@@ -209,9 +263,11 @@ def _run_direct(urls, proxy):
     st.session_state.artifacts = []
     st.session_state.search_mode = "direct"
     status = st.status("Processing Targets...", expanded=True)
+    crawler = None
     try:
         tor = TorHandler(proxy_url=proxy)
         crawler = Crawler(tor_handler=tor)
+        crawler.start_circuit_manager()
         analyzer = Analyzer()
         
         status.write(f"Pinging {len(urls)} URLs...")
@@ -227,6 +283,13 @@ def _run_direct(urls, proxy):
                         st.markdown(f"**URL:** `{res.get('link')}`")
                         st.markdown(f"**Snippet:** {res.get('snippet')}")
                         
+                        # Watchlist
+                        watch_hits = res.get('watchlist', [])
+                        if watch_hits:
+                            st.markdown("##### 🎯 Watchlist Hits")
+                            for h in watch_hits:
+                                st.markdown(f"**{h['selector']}** ({h['kind']}): ...{h['context']}...")
+
                         # Wallets
                         wallets = res.get('wallets', [])
                         if wallets:
@@ -247,10 +310,6 @@ def _run_direct(urls, proxy):
         # Persist results to session state for Reporting
         if raw_results:
             # We manually reconstruct result objects to avoid triggering the generic progress bar UI again
-            from collections import namedtuple
-            ResultObj = namedtuple("ResultObj", ["id", "title", "url", "engine", "snippet"])
-            ArtifactObj = namedtuple("ArtifactObj", ["id", "result_id", "type", "value", "context"])
-            
             processed_results = []
             all_artifacts = []
             
@@ -264,6 +323,8 @@ def _run_direct(urls, proxy):
                     all_artifacts.append(ArtifactObj(f"{i}_w", i, "Crypto Wallet", w, "Direct Scrape"))
                 for c in res.get('comments', []):
                     all_artifacts.append(ArtifactObj(f"{i}_c", i, "Hidden Comment", c, "Direct Scrape"))
+                for h in {h['selector']: h for h in res.get('watchlist', [])}.values():
+                    all_artifacts.append(ArtifactObj(f"{i}_wl", i, "Watchlist Hit", h['selector'], h['context']))
                 if res.get('hash') and res.get('hash') != "N/A":
                     all_artifacts.append(ArtifactObj(f"{i}_h", i, "Content Hash", res.get('hash'), "Direct Scrape"))
 
@@ -273,6 +334,9 @@ def _run_direct(urls, proxy):
     except Exception as e:
         status.update(label="Error", state="error")
         st.error(f"Error: {e}")
+    finally:
+        if crawler is not None:
+            crawler.close()
 
 def _run_person_search(query, proxy, limit, use_llm):
     st.session_state.results = []
@@ -281,9 +345,11 @@ def _run_person_search(query, proxy, limit, use_llm):
     st.session_state.search_mode = "person"
     
     status = st.status(f"Profiling Target: {query}...", expanded=True)
+    crawler = None
     try:
         tor = TorHandler(proxy_url=proxy)
         crawler = Crawler(tor_handler=tor)
+        crawler.start_circuit_manager()
         analyzer = Analyzer()
         
         status.write(f"🕷️ Generating dorks for auto-profiling...")
@@ -295,6 +361,9 @@ def _run_person_search(query, proxy, limit, use_llm):
     except Exception as e:
         status.update(label="Error Occurred", state="error")
         st.error(f"Error: {e}")
+    finally:
+        if crawler is not None:
+            crawler.close()
 
 # Sidebar
 with st.sidebar:
@@ -329,6 +398,42 @@ with st.sidebar:
                 st.error(f"Failed. Error: {ip}")
                 st.info("Ensure Tor Browser is open (opens port 9150) or Tor service is running (port 9050).")
                 
+    st.divider()
+    st.subheader("Engine Health")
+    try:
+        health_rows = EngineHealthTracker(StorageManager()).snapshot()
+    except Exception:
+        health_rows = []
+    if health_rows:
+        state_icons = {"closed": "🟢", "half_open": "🟡", "open": "🔴", "disabled": "⚫"}
+        st.dataframe(pd.DataFrame([{
+            "Engine": f"{state_icons.get(row['state'], '')} {row['engine']}",
+            "p50 (s)": row['p50'],
+            "Errors": f"{int(row['error_rate'] * 100)}%" if row['error_rate'] is not None else "-",
+            "Timeout (s)": row['timeout'],
+            "Retry in (s)": row['retry_in'] or ""
+        } for row in health_rows]), hide_index=True, use_container_width=True)
+    else:
+        st.caption("No engine statistics yet. Run a search first.")
+
+    st.divider()
+    st.subheader("Watchlist")
+    with st.expander("Watched selectors"):
+        try:
+            watchlist = Watchlist(StorageManager(), refresh_interval=0)
+            new_selectors = st.text_area("Add selectors (one per line)", placeholder="alice@example.com\n@handle\n1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa")
+            if st.button("Add to Watchlist") and new_selectors.strip():
+                added = watchlist.add(new_selectors.strip().split("\n"))
+                st.success(f"Watching {len(added)} new selectors.")
+            entries = watchlist.entries()
+            if entries:
+                st.dataframe(pd.DataFrame([{"Selector": e['selector'], "Kind": e['kind']} for e in entries]),
+                             hide_index=True, use_container_width=True)
+            else:
+                st.caption("No selectors watched yet.")
+        except Exception as e:
+            st.caption(f"Watchlist unavailable: {e}")
+
     st.divider()
     st.subheader("Search Settings")
     limit = st.slider("Max Results", 10, 100, 20)
@@ -341,7 +446,7 @@ st.title("👁️ Erebus: AI-Powered Dark Web OSINT")
 st.markdown("Search across multiple dark web engines, analyze content with LLMs, and visualize connections.")
 
 # Tabs for Modes
-tab_search, tab_direct, tab_person = st.tabs(["🔍 Search Engines", "🎯 Direct Targets", "👥 Person Search"])
+tab_search, tab_direct, tab_person, tab_entity = st.tabs(["🔍 Search Engines", "🎯 Direct Targets", "👥 Person Search", "🔗 Entity Lookup"])
 
 # --- SEARCH TAB ---
 with tab_search:
@@ -383,6 +488,7 @@ with tab_person:
         
         if st.button("🕵️‍♂️ Run Deep Scan on Results", type="primary"):
             status_ds = st.status("Deep Scanning Targets...", expanded=True)
+            crawler = None
             try:
                 # Get top 10 URLs from results to avoid overloading
                 targets = [r.url for r in st.session_state.results[:10]]
@@ -391,6 +497,7 @@ with tab_person:
                 # Reuse crawler from direct mode
                 tor = TorHandler(proxy_url=tor_proxy)
                 crawler = Crawler(tor_handler=tor)
+                crawler.start_circuit_manager()
                 analyzer = Analyzer()
                 
                 scraped_data = crawler.scrape_direct(targets)
@@ -427,6 +534,51 @@ with tab_person:
             except Exception as e:
                 status_ds.update(label="Error", state="error")
                 st.error(f"Deep Scan failed: {e}")
+            finally:
+                if crawler is not None:
+                    crawler.close()
+
+# --- ENTITY LOOKUP TAB ---
+with tab_entity:
+    st.info("Where else has this been seen? Look up a wallet, email, onion or any stored artifact across every investigation.")
+    entity_query = st.text_input("Artifact value", placeholder="e.g., 1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa or alice@example.com")
+    try:
+        entity_storage = StorageManager()
+        if entity_query.strip():
+            entities = entity_storage.lookup_entity(entity_query)
+            if not entities:
+                st.warning(f"'{entity_query.strip()}' has not been seen in any investigation.")
+            for entity in entities:
+                st.markdown(f"**{entity['type']}** `{entity['value']}`")
+                c1, c2, c3 = st.columns(3)
+                c1.metric("Investigations", entity['investigation_count'])
+                c2.metric("Pages", entity['result_count'])
+                c3.metric("First Seen", f"{entity['first_seen']:%Y-%m-%d}" if entity['first_seen'] else "-")
+                st.dataframe(pd.DataFrame([{
+                    "Investigation": f"#{inv['investigation_id']} {inv['name'] or ''}",
+                    "Pages": inv['results'],
+                    "First Seen": inv['first_seen'],
+                    "Last Seen": inv['last_seen']
+                } for inv in entity['investigations']]), hide_index=True, use_container_width=True)
+                st.dataframe(pd.DataFrame([{
+                    "Investigation": res['investigation_id'],
+                    "URL": res['url'],
+                    "Title": res['title'],
+                    "Seen": res['seen']
+                } for res in entity['results']]), hide_index=True, use_container_width=True)
+        else:
+            shared = entity_storage.cross_case_entities()
+            if shared:
+                st.caption("Artifacts seen in more than one investigation:")
+                st.dataframe(pd.DataFrame([{
+                    "Type": e['type'],
+                    "Value": e['value'],
+                    "Investigations": e['investigation_count'],
+                    "Pages": e['result_count'],
+                    "Last Seen": e['last_seen']
+                } for e in shared]), hide_index=True, use_container_width=True)
+    except Exception as e:
+        st.error(f"Entity lookup failed: {e}")
 
 # --- DISPLAY SECTION (Shared) ---
 if st.session_state.results:
@@ -1,12 +1,16 @@
 import argparse
 import logging
+import os
+import socket
 import sys
 import time
 from core.tor_handler import TorHandler
 from core.crawler import Crawler
-from core.storage import StorageManager
+from core.storage import StorageManager, BatchWriter
 from core.llm_processor import LLMProcessor
 from core.analyzer import Analyzer
+from core.watchlist import Watchlist
+from core.bulk_analysis import BulkAnalyzer, ANALYSIS_WORKERS, ANALYSIS_CHUNK_SIZE
 
 # Configure Logging
 logging.basicConfig(
@@ -18,15 +22,173 @@ logging.basicConfig(
 )
 logger = logging.getLogger("ErebusCLI")
 
+def run_crawl(crawler, storage, analyzer, inv_id, seeds, depth, worker_id="local"):
+    """
+    Deep-crawls from the seeds using the investigation's persistent frontier,
+    storing artifacts for every page as it arrives.
+    Returns the number of pages fetched in this run.
+    """
+    pages = 0
+    with BatchWriter(storage) as writer:
+        for page in crawler.iter_crawl_deep(seeds, depth=depth, storage=storage, investigation_id=inv_id, worker_id=worker_id):
+            artifacts = analyzer.extract_artifacts(page['content'])
+            writer.add_artifacts(page['result_id'], artifacts)
+            logger.info(f"Crawled {page['url']} (depth {page['depth']}) with {len(artifacts)} artifacts.")
+            pages += 1
+    logger.info(f"Crawl finished: {pages} pages this run. Frontier: {storage.frontier_stats(inv_id)}")
+    return pages
+
+def run_worker(args, crawler, storage, analyzer):
+    """
+    Crawl worker: leases URL batches for one investigation from the shared
+    database until its frontier is drained. Start as many as needed, on any
+    host that can reach the database.
+    """
+    inv = storage.get_investigation(args.investigation)
+    if inv is None:
+        logger.critical(f"Investigation {args.investigation} not found.")
+        sys.exit(1)
+    worker_id = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    logger.info(f"Worker {worker_id} joining investigation {args.investigation}: {storage.frontier_stats(args.investigation)}")
+    run_crawl(crawler, storage, analyzer, args.investigation, args.seed, args.depth, worker_id=worker_id)
+
+def run_watch(args, storage):
+    """
+    Manages the watchlist shared by every crawler using this database.
+    """
+    watchlist = Watchlist(storage, refresh_interval=0)
+    if args.watch_command == "add":
+        added = watchlist.add(args.selector, kind=args.kind, label=args.label)
+        logger.info(f"Watching {len(added)} selectors.")
+    elif args.watch_command == "import":
+        with open(args.file, encoding="utf-8") as f:
+            selectors = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        added = watchlist.add(selectors, kind=args.kind, label=args.label)
+        logger.info(f"Imported {len(added)} selectors from {args.file}.")
+    elif args.watch_command == "remove":
+        removed = watchlist.remove(args.selector)
+        logger.info(f"Removed {removed} selectors.")
+    else:
+        for entry in watchlist.entries():
+            label = f"  [{entry['label']}]" if entry['label'] else ""
+            print(f"{entry['kind']:<8} {entry['selector']}{label}")
+
+def run_analyze(args, storage):
+    """
+    Bulk (re-)analysis of stored results on a process pool.
+    """
+    bulk = BulkAnalyzer(storage, workers=args.workers, chunk_size=args.chunk_size)
+    stats = bulk.run(investigation_id=args.investigation, reprocess=args.all)
+    logger.info(f"Bulk analysis done: {stats['results']} results, {stats['artifacts']} artifacts in {stats['seconds']}s.")
+
+def run_scan(args, storage, analyzer):
+    """
+    Extracts artifacts from a local file of any size (e.g. a leaked dump),
+    streaming it in fixed-size windows.
+    """
+    path = os.path.abspath(args.file)
+    res_id = None
+    if args.investigation is not None:
+        res_id = storage.add_result(args.investigation, {
+            "link": f"file://{path}",
+            "title": os.path.basename(path),
+            "engine": "File"
+        })
+    count = 0
+    with BatchWriter(storage) as writer:
+        for art in analyzer.extract_artifacts_stream(path, chunk_size=args.chunk_mb * 1024 * 1024):
+            count += 1
+            if res_id is not None:
+                writer.add_artifacts(res_id, [art])
+            else:
+                print(f"{art['start']:>12}  {art['type']:<16} {art['value']}")
+    logger.info(f"Found {count} distinct artifacts in {path}" + (f" (result {res_id})." if res_id else "."))
+
+def run_entity(args, storage):
+    """
+    Looks up where else a value (wallet, email, ...) was seen, lists
+    entities shared between investigations, or rebuilds the entity index.
+    """
+    if args.rebuild:
+        logger.info(f"Rebuilt the entity index from {storage.rebuild_entity_index()} artifacts.")
+        return
+    if not args.value:
+        for entity in storage.cross_case_entities(artifact_type=args.type, limit=args.limit):
+            print(f"{entity['investigation_count']:>4} cases {entity['result_count']:>6} results  {entity['type']:<16} {entity['value']}")
+        return
+    entities = storage.lookup_entity(args.value, artifact_type=args.type, limit=args.limit)
+    if not entities:
+        logger.info(f"'{args.value}' has not been seen.")
+    for entity in entities:
+        print(f"{entity['type']} {entity['value']}: {entity['result_count']} results in {entity['investigation_count']} investigations, "
+              f"first seen {entity['first_seen']:%Y-%m-%d %H:%M}, last seen {entity['last_seen']:%Y-%m-%d %H:%M}")
+        for inv in entity['investigations']:
+            print(f"  investigation {inv['investigation_id']} ({inv['name']}): {inv['results']} results")
+        for res in entity['results']:
+            print(f"    [{res['investigation_id']}] {res['url']}")
+
 def main():
     parser = argparse.ArgumentParser(description="Erebus: Advanced Dark Web OSINT Tool")
-    parser.add_argument("-q", "--query", required=True, help="Search query")
+    subparsers = parser.add_subparsers(dest="command")
+    worker_parser = subparsers.add_parser("worker", help="Run a crawl worker against a shared investigation frontier")
+    worker_parser.add_argument("-i", "--investigation", type=int, required=True, help="Investigation ID to crawl")
+    worker_parser.add_argument("--seed", action="append", default=[], help="Seed URL to enqueue (repeatable)")
+    worker_parser.add_argument("--depth", type=int, default=None, help="Link depth (default: RECURSION_DEPTH - 1)")
+    worker_parser.add_argument("--worker-id", help="Worker name shown in leases (default: host-pid)")
+    watch_parser = subparsers.add_parser("watch", help="Manage the watchlist of selectors alerted on")
+    watch_commands = watch_parser.add_subparsers(dest="watch_command")
+    watch_add = watch_commands.add_parser("add", help="Watch selectors (emails, domains, handles, wallets, keywords)")
+    watch_add.add_argument("selector", nargs="+")
+    watch_import = watch_commands.add_parser("import", help="Watch every selector in a file (one per line)")
+    watch_import.add_argument("file")
+    for sub in (watch_add, watch_import):
+        sub.add_argument("--kind", help="Selector kind (default: guessed)")
+        sub.add_argument("--label", help="Note stored with the selectors, e.g. a case name")
+    watch_remove = watch_commands.add_parser("remove", help="Stop watching selectors")
+    watch_remove.add_argument("selector", nargs="+")
+    watch_commands.add_parser("list", help="List watched selectors")
+    scan_parser = subparsers.add_parser("scan", help="Extract artifacts from a local file of any size")
+    scan_parser.add_argument("file")
+    scan_parser.add_argument("-i", "--investigation", type=int, help="Store the artifacts under this investigation (default: print them)")
+    scan_parser.add_argument("--chunk-mb", type=int, default=4, help="Window size in MB (memory use is about twice this)")
+    analyze_parser = subparsers.add_parser("analyze", help="Extract artifacts from stored results on all cores")
+    analyze_parser.add_argument("-i", "--investigation", type=int, help="Only this investigation (default: all)")
+    analyze_parser.add_argument("--all", action="store_true", help="Re-analyze results already processed (back-fill new patterns)")
+    analyze_parser.add_argument("--workers", type=int, default=ANALYSIS_WORKERS, help="Worker processes (default: ANALYSIS_WORKERS)")
+    analyze_parser.add_argument("--chunk-size", type=int, default=ANALYSIS_CHUNK_SIZE, help="Results read per database round-trip")
+
+    entity_parser = subparsers.add_parser("entity", help="Find every investigation and page an artifact value was seen in")
+    entity_parser.add_argument("value", nargs="?", help="Value to look up (default: list entities seen in several investigations)")
+    entity_parser.add_argument("--type", help="Only this artifact type, e.g. btc_address")
+    entity_parser.add_argument("--limit", type=int, default=50, help="Max results listed")
+    entity_parser.add_argument("--rebuild", action="store_true", help="Re-index every stored artifact (databases from older versions)")
+
+    parser.add_argument("-q", "--query", help="Search query")
     parser.add_argument("--refine", action="store_true", help="Use LLM to refine the query before searching")
     parser.add_argument("--limit", type=int, default=10, help="Max results to process")
     parser.add_argument("--tor-check", action="store_true", help="Check Tor connection before starting")
     parser.add_argument("--report", action="store_true", help="Generate a summary report after crawling")
+    parser.add_argument("--crawl", action="store_true", help="Deep-crawl the search hits through the persistent frontier")
+    parser.add_argument("--depth", type=int, default=None, help="Link depth for --crawl/--resume (default: RECURSION_DEPTH - 1)")
+    parser.add_argument("--resume", type=int, metavar="INVESTIGATION_ID", help="Resume an interrupted crawl for an investigation")
     
     args = parser.parse_args()
+    if args.command is None and not args.query and args.resume is None:
+        parser.error("one of -q/--query or --resume is required")
+
+    if args.command == "watch":
+        # Database-only commands need no Tor connection
+        run_watch(args, StorageManager())
+        return
+    if args.command == "analyze":
+        run_analyze(args, StorageManager())
+        return
+    if args.command == "scan":
+        run_scan(args, StorageManager(), Analyzer())
+        return
+    if args.command == "entity":
+        run_entity(args, StorageManager())
+        return
     
     # 1. Initialize Components
     logger.info("Initializing Erebus components...")
@@ -41,9 +203,24 @@ def main():
         logger.info(f"Tor active. IP: {ip}")
 
     crawler = Crawler(tor_handler=tor)
+    crawler.start_circuit_manager()
     storage = StorageManager()
     llm = LLMProcessor()
     analyzer = Analyzer()
+
+    if args.command == "worker":
+        run_worker(args, crawler, storage, analyzer)
+        return
+
+    if args.resume is not None:
+        inv = storage.get_investigation(args.resume)
+        if inv is None:
+            logger.critical(f"Investigation {args.resume} not found.")
+            sys.exit(1)
+        storage.set_investigation_status(args.resume, "active")
+        logger.info(f"Resuming crawl for investigation {args.resume}: {storage.frontier_stats(args.resume)}")
+        run_crawl(crawler, storage, analyzer, args.resume, None, args.depth)
+        return
     
     # 2. Query Refinement
     search_query = args.query
@@ -57,33 +234,48 @@ def main():
     inv_id = storage.create_investigation(name=f"CLI Run: {args.query}", query=search_query)
     logger.info(f"Created Investigation ID: {inv_id}")
     
-    # 4. Crawl
+    # 4. Crawl & 5. Process & Save, engine by engine as results arrive
     logger.info(f"Starting crawl for: '{search_query}'")
-    results = crawler.search(search_query)
-    logger.info(f"Found {len(results)} raw results.")
-    
-    # 5. Process & Save
     processed_count = 0
     results_for_report = []
     
-    for res in results[:args.limit]:
-        # Save to DB
-        res_id = storage.add_result(inv_id, res)
-        
-        # Analyze Artifacts (on snippet + title + link)
-        # In a real deep crawl, we'd fetch the content first.
-        # Here we just analyze what we have from the search engine.
-        text_to_analyze = f"{res.get('title', '')} {res.get('snippet', '')}"
-        artifacts = analyzer.extract_artifacts(text_to_analyze)
-        
-        for art in artifacts:
-            storage.add_artifact(res_id, art['type'], art['value'], art.get('context', ''))
-            
-        logger.info(f"Saved result {res_id} with {len(artifacts)} artifacts.")
-        results_for_report.append(res)
-        processed_count += 1
+    batches = crawler.iter_search(search_query)
+    writer = BatchWriter(storage)
+    for batch in batches:
+        progress = f"[{batch['completed']}/{batch['total']}]"
+        if batch['skipped']:
+            logger.info(f"{progress} {batch['engine']} skipped: {batch['error']}")
+        elif batch['error'] is not None and not batch['results']:
+            logger.warning(f"{progress} {batch['engine']} failed: {batch['error']}")
+        else:
+            logger.info(f"{progress} {batch['engine']} returned {len(batch['results'])} new results.")
+
+        for res in batch['results'][:args.limit - processed_count]:
+            # Analyze Artifacts (on snippet + title + link)
+            # In a real deep crawl, we'd fetch the content first.
+            # Here we just analyze what we have from the search engine.
+            text_to_analyze = f"{res.get('title', '')} {res.get('snippet', '')}"
+            artifacts = analyzer.extract_artifacts(text_to_analyze)
+            watch_hits = [{"type": "watchlist", "value": hit['selector'], "context": hit['context']}
+                          for hit in {h['selector']: h for h in res.get('watchlist', [])}.values()]
+
+            # Save to DB (written in batches)
+            writer.add_result(inv_id, res, artifacts + watch_hits)
+            logger.info(f"Queued {res.get('link')} with {len(artifacts)} artifacts.")
+            results_for_report.append(res)
+            processed_count += 1
+
+        if processed_count >= args.limit:
+            logger.info(f"Reached --limit {args.limit}; not waiting for the remaining engines.")
+            break
+    batches.close()
+    writer.flush()
         
     logger.info(f"Processed {processed_count} results.")
+
+    if args.crawl and results_for_report:
+        logger.info(f"Deep-crawling {len(results_for_report)} search hits...")
+        run_crawl(crawler, storage, analyzer, inv_id, [r['link'] for r in results_for_report], args.depth)
     
     # 6. Reporting
     if args.report and processed_count > 0:
@@ -10,6 +10,26 @@ TOR_PROXY_URL = os.getenv("TOR_PROXY_URL", "socks5h://127.0.0.1:9050")
 # Tor control port for circuit rotation (requires Tor to be configured with ControlPort)
 TOR_CONTROL_PORT = int(os.getenv("TOR_CONTROL_PORT", "9051"))
 TOR_PASSWORD = os.getenv("TOR_PASSWORD", None) # Set if your Tor control port has a password
+# Extra local Tor SocksPorts (comma-separated, e.g. "9060,9070") to spread traffic over
+TOR_SOCKS_PORTS = [int(p) for p in os.getenv("TOR_SOCKS_PORTS", "").split(",") if p.strip()]
+# Background circuit health monitoring over the control port
+CIRCUIT_MANAGER_ENABLED = os.getenv("CIRCUIT_MANAGER_ENABLED", "true").lower() in ("1", "true", "yes")
+# Seconds between circuit health checks
+CIRCUIT_CHECK_INTERVAL = int(os.getenv("CIRCUIT_CHECK_INTERVAL", "15"))
+# Consecutive failed streams after which a circuit is closed
+CIRCUIT_MAX_FAILURES = int(os.getenv("CIRCUIT_MAX_FAILURES", "3"))
+# A circuit this many times slower than the median circuit is closed
+CIRCUIT_SLOW_FACTOR = float(os.getenv("CIRCUIT_SLOW_FACTOR", "3.0"))
+# Streams measured on a circuit before its latency is judged
+CIRCUIT_MIN_SAMPLES = int(os.getenv("CIRCUIT_MIN_SAMPLES", "5"))
+# Onion descriptors fetched ahead of batch scrapes/crawls (HSFETCH); 0 disables
+HS_PREFETCH_CONCURRENCY = int(os.getenv("HS_PREFETCH_CONCURRENCY", "8"))
+# Max onion addresses waiting for a prefetch slot
+HS_PREFETCH_QUEUE = int(os.getenv("HS_PREFETCH_QUEUE", "200"))
+# Seconds a prefetched descriptor is considered warm
+HS_PREFETCH_TTL = int(os.getenv("HS_PREFETCH_TTL", "600"))
+# Isolated circuits (distinct SOCKS credentials, see IsolateSOCKSAuth) used per Tor instance
+TOR_ISOLATION_SLOTS = int(os.getenv("TOR_ISOLATION_SLOTS", "4"))
 
 # --- LLM Configuration ---
 # Base URL for Ollama
@@ -22,15 +42,97 @@ OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
 MAX_WORKERS = int(os.getenv("MAX_WORKERS", "5"))
 # Request timeout in seconds (Tor can be slow)
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "45"))
+# Max requests in flight at once on the async crawl engine
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "100"))
+# Max requests in flight against a single host
+PER_HOST_CONCURRENCY = int(os.getenv("PER_HOST_CONCURRENCY", "4"))
+# Extra attempts for connection errors and 5xx responses
+FETCH_RETRIES = int(os.getenv("FETCH_RETRIES", "2"))
+# Seconds an idle keep-alive connection is kept open (rendezvous setup is expensive)
+KEEPALIVE_TIMEOUT = int(os.getenv("KEEPALIVE_TIMEOUT", "60"))
+# Max concurrent requests against any one search engine
+ENGINE_CONCURRENCY = int(os.getenv("ENGINE_CONCURRENCY", "2"))
+# Max requests per second started against any one search engine (0 = unlimited)
+ENGINE_RATE_LIMIT = float(os.getenv("ENGINE_RATE_LIMIT", "1.0"))
+# Rolling window of requests used for engine health and adaptive timeouts
+ENGINE_HEALTH_WINDOW = int(os.getenv("ENGINE_HEALTH_WINDOW", "20"))
+# Consecutive failures that open an engine's circuit breaker
+ENGINE_FAILURE_THRESHOLD = int(os.getenv("ENGINE_FAILURE_THRESHOLD", "3"))
+# Seconds an open engine is skipped before a trial request (doubles per re-trip)
+ENGINE_COOLDOWN = int(os.getenv("ENGINE_COOLDOWN", "300"))
+ENGINE_MAX_COOLDOWN = int(os.getenv("ENGINE_MAX_COOLDOWN", "3600"))
+# Floor for latency-derived engine timeouts (REQUEST_TIMEOUT is the ceiling)
+ENGINE_MIN_TIMEOUT = int(os.getenv("ENGINE_MIN_TIMEOUT", "10"))
+# Send a duplicate request over another circuit when one runs past the p90 latency
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Hedge budget: at most HEDGE_BURST + HEDGE_RATIO x requests sent so far
+HEDGE_RATIO = float(os.getenv("HEDGE_RATIO", "0.1"))
+HEDGE_BURST = int(os.getenv("HEDGE_BURST", "5"))
+# Never hedge sooner than this many seconds
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "2"))
+# Max bytes read from any one response body; larger pages are truncated
+MAX_BODY_BYTES = int(os.getenv("MAX_BODY_MB", "5")) * 1024 * 1024
 # Global recursion depth limit (1 = search results only, 2 = crawl one link deep)
 RECURSION_DEPTH = int(os.getenv("RECURSION_DEPTH", "1"))
+# Hard cap on pages fetched by one deep crawl
+MAX_CRAWL_PAGES = int(os.getenv("MAX_CRAWL_PAGES", "200"))
+# Max pages fetched from any single host during one deep crawl
+PER_HOST_PAGE_BUDGET = int(os.getenv("PER_HOST_PAGE_BUDGET", "25"))
+# URLs claimed from the persistent crawl frontier per database round-trip
+FRONTIER_BATCH_SIZE = int(os.getenv("FRONTIER_BATCH_SIZE", "50"))
+# Fetch attempts before a frontier URL is marked failed
+FRONTIER_MAX_ATTEMPTS = int(os.getenv("FRONTIER_MAX_ATTEMPTS", "3"))
+# Seconds a worker holds a claimed frontier batch before others may reclaim it
+FRONTIER_LEASE_SECONDS = int(os.getenv("FRONTIER_LEASE_SECONDS", "300"))
+# Seconds an idle worker waits before polling the frontier again
+WORKER_POLL_INTERVAL = int(os.getenv("WORKER_POLL_INTERVAL", "10"))
+
+# --- Host Liveness ---
+# Seconds a failed host is skipped after its first failure (doubles per failure)
+LIVENESS_BASE_BACKOFF = int(os.getenv("LIVENESS_BASE_BACKOFF", "600"))
+# Upper bound on the skip window
+LIVENESS_MAX_BACKOFF = int(os.getenv("LIVENESS_MAX_BACKOFF", str(24 * 3600)))
+# Timeout for the single probe sent once a dead host's back-off expires
+LIVENESS_PROBE_TIMEOUT = int(os.getenv("LIVENESS_PROBE_TIMEOUT", "10"))
+
+# --- Artifact Validation ---
+# Artifacts scoring below this confidence (checksums, Luhn, entropy; see core/validation.py) are not stored
+ARTIFACT_MIN_CONFIDENCE = float(os.getenv("ARTIFACT_MIN_CONFIDENCE", "0.5"))
+
+# --- Bulk Analysis ---
+# Worker processes for bulk re-analysis of stored pages (default: all cores)
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", str(os.cpu_count() or 1)))
+# Results read from the database and written back per chunk
+ANALYSIS_CHUNK_SIZE = int(os.getenv("ANALYSIS_CHUNK_SIZE", "200"))
+
+# --- Watchlist ---
+# Seconds between checks for selectors added or removed by other processes
+WATCHLIST_REFRESH_INTERVAL = int(os.getenv("WATCHLIST_REFRESH_INTERVAL", "60"))
+# Send watchlist hits through the configured alert channels (Telegram/Discord)
+WATCHLIST_ALERTS = os.getenv("WATCHLIST_ALERTS", "true").lower() in ("1", "true", "yes")
 
 # --- Database ---
-DB_URL = "sqlite:///erebus.db"
+DB_URL = os.getenv("DB_URL", "sqlite:///argus.db")
+# Rows (results + artifacts) written per transaction by batched writers
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "500"))
+# Seconds buffered rows may wait before their batch is written anyway
+WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", "5"))
+
+# --- Response Cache ---
+# Disposable on-disk cache of fetched pages (safe to delete)
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CACHE_DB_URL = os.getenv("CACHE_DB_URL", "sqlite:///erebus_cache.db")
+# Seconds a cached page is served without revalidation
+CACHE_TTL = int(os.getenv("CACHE_TTL", str(6 * 3600)))
+# Total cached body size before least recently used pages are evicted
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_MB", "512")) * 1024 * 1024
 
 # --- Paths ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 REPORTS_DIR = os.path.join(BASE_DIR, "reports")
+# Last auto-detected Tor ports, revalidated with one handshake before reuse
+TOR_DETECT_CACHE = os.getenv("TOR_DETECT_CACHE", os.path.join(BASE_DIR, ".tor_endpoint.json"))
+TOR_DETECT_CACHE_TTL = int(os.getenv("TOR_DETECT_CACHE_TTL", str(24 * 3600)))
 
 # Ensure reports directory exists
 os.makedirs(REPORTS_DIR, exist_ok=True)
@@ -10,6 +10,10 @@ class AlertManager:
         self.telegram_chat_id = os.getenv("TELEGRAM_CHAT_ID")
         self.discord_webhook = os.getenv("DISCORD_WEBHOOK_URL")
 
+    @property
+    def enabled(self):
+        return bool((self.telegram_token and self.telegram_chat_id) or self.discord_webhook)
+
     def send_telegram(self, message):
         """
         Sends a message via Telegram Bot API.
@@ -71,3 +75,21 @@ class AlertManager:
         d_status = self.send_discord(full_msg)
         
         return t_status or d_status
+
+    def send_watchlist_alert(self, source, hits):
+        """
+        Alerts on the watchlist selectors (see core/watchlist.py) seen in one
+        page or search result, one line per selector.
+        """
+        if not hits or not self.enabled:
+            return False
+        lines = []
+        seen = set()
+        for hit in hits:
+            if hit['selector'] in seen:
+                continue
+            seen.add(hit['selector'])
+            label = f" [{hit['label']}]" if hit.get('label') else ""
+            lines.append(f"• {hit['kind']}: {hit['selector']}{label}\n  …{hit['context'][:300]}…")
+        body = f"Source: {source}\n\n" + "\n".join(lines)
+        return self.send_alert(f"Watchlist hit: {len(seen)} selector(s)", body)
@@ -1,5 +1,10 @@
 import re
+import os
+import mmap
 import logging
+from functools import lru_cache
+
+from .validation import ArtifactValidator
 
 logger = logging.getLogger(__name__)
 
@@ -9,67 +14,332 @@ PATTERNS = {
     "email": r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}',
     "ipv4": r'\b(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\b',
     # Bitcoin: Legacy (1...), Script (3...), SegWit (bc1...)
-    "btc_address": r'\b(bc1|[13])[a-zA-HJ-NP-Z0-9]{25,39}\b',
+    "btc_address": r'\b(?:bc1|[13])[a-zA-HJ-NP-Z0-9]{25,39}\b',
     "xmr_address": r'\b4[0-9AB][1-9A-HJ-NP-Za-km-z]{93}\b',
     "eth_address": r'\b0x[a-fA-F0-9]{40}\b',
     "onion_v3": r'[a-z2-7]{56}\.onion',
     "onion_v2": r'[a-z2-7]{16}\.onion',
-    "ssn": r'\b(?!000|666|9\d{2})([0-8]\d{2}|7([0-6]\d|7[012]))[- ]?(?!00)\d{2}[- ]?(?!0000)\d{4}\b',
-    # Basic Credit Card (Major brands) - High false positive potential without Luhn
+    "ssn": r'\b(?!000|666|9\d{2})(?:[0-8]\d{2}|7(?:[0-6]\d|7[012]))[- ]?(?!00)\d{2}[- ]?(?!0000)\d{4}\b',
+    # Basic Credit Card (Major brands) - Luhn-checked in core/validation.py
     "credit_card": r'\b(?:4[0-9]{12}(?:[0-9]{3})?|5[1-5][0-9]{14}|3[47][0-9]{13}|3(?:0[0-5]|[68][0-9])[0-9]{11}|6(?:011|5[0-9]{2})[0-9]{12}|(?:2131|1800|35\d{3})\d{11})\b',
-    "api_key_generic": r'\b[a-zA-Z0-9]{32,}\b', # Too broad? Maybe limit to specific prefixes
+    "api_key_generic": r'\b[a-zA-Z0-9]{32,}\b', # Broad: kept only when its entropy looks like a key
     "aws_access_key": r'\bAKIA[0-9A-Z]{16}\b',
     "google_api_key": r'\bAIza[0-9A-Za-z-_]{35}\b'
 }
 
-class Analyzer:
+# Whole alphanumeric tokens long enough to be a card number, key or wallet address.
+# Every token-shaped pattern above is \b-delimited, so it can only ever match a whole token.
+TOKEN_RE = re.compile(r'\b[A-Za-z0-9]{13,}\b')
+# ipv4 and ssn run only on runs of digits and separators. They stay separate
+# regexes: an alternation would drop an ssn overlapping an ipv4 ('1.1.1.123-45-6789').
+NUMERIC_RES = [(name, re.compile(PATTERNS[name])) for name in ("ipv4", "ssn")]
+NUMERIC_RUN_RE = re.compile(r'\d[\d. -]{5,}\d')
+WHITESPACE = " \t\n\r\f\v"
+WHITESPACE_RE = re.compile(r'\s')
+ONION_SUFFIX = ".onion"
+BASE32_TAIL_RE = re.compile(r'[a-z2-7]*$')
+
+
+def _token_pattern(name):
+    # The token pass already enforces the \b on both sides
+    return re.compile(PATTERNS[name][2:-2])
+
+
+class ArtifactScanner:
+    """
+    Finds every PATTERNS artifact in a few passes instead of one per pattern,
+    yielding (type, value, start, end) in text order.
+
+    - email, onion and google_api_key are anchored on a literal ('@',
+      '.onion', 'AIza'): str.find locates the anchors and the regex only runs
+      on the whitespace-delimited segment around each one.
+    - btc, xmr, eth, aws, credit_card and api_key_generic are all single
+      alphanumeric tokens: one regex pass collects the tokens and each is
+      classified by length, leading literal ('0x', 'AKIA', ...) and fullmatch.
+    - ipv4 and ssn only run on the digit runs found by one cheap prefilter.
+    """
     def __init__(self):
+        self.email_re = re.compile(PATTERNS["email"])
+        self.google_re = re.compile(PATTERNS["google_api_key"])
+        self.token_patterns = {name: _token_pattern(name) for name in
+                               ("credit_card", "aws_access_key", "btc_address", "eth_address", "xmr_address")}
+
+    def scan(self, text):
+        if not text:
+            return []
+        hits = []
+        hits.extend(self._emails(text))
+        hits.extend(self._onions(text))
+        hits.extend(self._google_keys(text))
+        hits.extend(self._tokens(text))
+        hits.extend(self._numbers(text))
+        hits.sort(key=lambda hit: (hit[2], hit[3]))
+        return hits
+
+    # --- Anchored patterns ---
+
+    def _emails(self, text):
+        index = text.find("@")
+        end = 0
+        while index != -1:
+            # Segments never overlap, so every character is searched at most twice
+            start = max(text.rfind(ch, end, index) for ch in WHITESPACE) + 1
+            start = max(start, end)
+            m = WHITESPACE_RE.search(text, index)
+            end = m.start() if m else len(text)
+            for m in self.email_re.finditer(text, start, end):
+                yield ("email", m.group(), m.start(), m.end())
+            # Every '@' in this segment was covered by the pass above
+            index = text.find("@", end)
+
+    def _onions(self, text):
+        index = text.find(ONION_SUFFIX)
+        while index != -1:
+            # One character more than a v3 address tells a v3 from a longer run
+            run = BASE32_TAIL_RE.search(text, max(0, index - 57), index).group()
+            end = index + len(ONION_SUFFIX)
+            if len(run) >= 56:
+                yield ("onion_v3", text[index - 56:end], index - 56, end)
+            elif len(run) >= 16:
+                yield ("onion_v2", text[index - 16:end], index - 16, end)
+            index = text.find(ONION_SUFFIX, end)
+
+    def _google_keys(self, text):
+        index = text.find("AIza")
+        while index != -1:
+            m = self.google_re.match(text, index)
+            if m:
+                yield ("google_api_key", m.group(), m.start(), m.end())
+            index = text.find("AIza", m.end() if m else index + 4)
+
+    def _numbers(self, text):
+        for run in NUMERIC_RUN_RE.finditer(text):
+            for type_, pattern in NUMERIC_RES:
+                # One extra character keeps the trailing \b honest
+                for m in pattern.finditer(text, run.start(), run.end() + 1):
+                    yield (type_, m.group(), m.start(), m.end())
+
+    # --- Token patterns ---
+
+    def _tokens(self, text):
+        patterns = self.token_patterns
+        for m in TOKEN_RE.finditer(text):
+            token = m.group()
+            size = len(token)
+            types = []
+            if size <= 19:
+                if patterns["credit_card"].fullmatch(token):
+                    types.append("credit_card")
+            elif size == 20:
+                if token.startswith("AKIA") and patterns["aws_access_key"].fullmatch(token):
+                    types.append("aws_access_key")
+            else:
+                if size <= 42 and token[0] in "13b" and patterns["btc_address"].fullmatch(token):
+                    types.append("btc_address")
+                if size == 42 and token.startswith("0x") and patterns["eth_address"].fullmatch(token):
+                    types.append("eth_address")
+                if size == 95 and token[0] == "4" and patterns["xmr_address"].fullmatch(token):
+                    types.append("xmr_address")
+                if size >= 32:
+                    types.append("api_key_generic")
+            for type_ in types:
+                yield (type_, token, m.start(), m.end())
+
+
+# Characters of surrounding text kept on each side of a match
+CONTEXT_WINDOW = 50
+# Overlapping windows are merged up to this length
+MAX_CONTEXT_CHARS = 400
+
+
+def context_windows(spans, text_length, window=CONTEXT_WINDOW, max_chars=MAX_CONTEXT_CHARS):
+    """
+    Maps sorted (start, end) match spans to context windows: each span grows
+    by window characters on both sides and overlapping windows are merged
+    (up to max_chars). Returns the merged windows and, per span, the index
+    of the window it falls in.
+    """
+    windows = []
+    owners = []
+    for start, end in spans:
+        lo, hi = max(0, start - window), min(text_length, end + window)
+        if windows and lo <= windows[-1][1] and max(hi, windows[-1][1]) - windows[-1][0] <= max_chars:
+            windows[-1][1] = max(hi, windows[-1][1])
+        else:
+            windows.append([lo, hi])
+        owners.append(len(windows) - 1)
+    return windows, owners
+
+
+def _clean(snippet):
+    return " ".join(snippet.split())
+
+
+def _clean_latin1(snippet):
+    # Streamed text is decoded as latin-1 (one char per byte); show it as UTF-8
+    return _clean(snippet.encode("latin-1").decode("utf-8", "replace"))
+
+
+@lru_cache(maxsize=256)
+def _keyword_pattern(keyword):
+    return re.compile(re.escape(keyword), re.IGNORECASE)
+
+
+# Bytes read per window when streaming large documents
+STREAM_CHUNK_BYTES = 4 * 1024 * 1024
+# Bytes shared by consecutive windows; artifacts longer than this may be cut
+STREAM_OVERLAP = 4096
+
+
+def iter_byte_chunks(source, chunk_size=STREAM_CHUNK_BYTES):
+    """
+    Reads source in chunks of about chunk_size bytes. source is a file
+    path, a binary file object, a bytes-like or mmap buffer, or an iterable
+    of byte strings (e.g. a streamed HTTP body).
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            yield from iter_byte_chunks(f, chunk_size)
+    elif hasattr(source, "read"):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    elif isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        for offset in range(0, len(source), chunk_size):
+            yield bytes(source[offset:offset + chunk_size])
+    else:
+        pending = bytearray()
+        for piece in source:
+            pending += piece
+            while len(pending) >= chunk_size:
+                yield bytes(pending[:chunk_size])
+                del pending[:chunk_size]
+        if pending:
+            yield bytes(pending)
+
+
+def stream_windows(source, chunk_size=STREAM_CHUNK_BYTES, overlap=STREAM_OVERLAP):
+    """
+    Splits a document into overlapping text windows, yielding
+    (text, base, lead, cutoff): text covers absolute bytes [base, base +
+    len(text)) decoded as latin-1, so text offsets are byte offsets.
+
+    Only matches starting in [lead, cutoff) belong to a window. Every window
+    keeps overlap bytes on both sides of that zone, so an artifact shorter
+    than overlap is seen whole by exactly one window: never cut, never twice.
+    """
+    chunk_size = max(chunk_size, 2 * overlap)
+    carry, base, lead = b"", 0, 0
+    pending = None
+    for chunk in iter_byte_chunks(source, chunk_size):
+        if pending is not None:
+            buffer = carry + pending
+            cutoff = max(lead, len(buffer) - overlap)
+            yield buffer.decode("latin-1"), base, lead, cutoff
+            start = max(0, cutoff - overlap)
+            carry, base, lead = buffer[start:], base + start, cutoff - start
+        pending = chunk
+    if pending is not None:
+        buffer = carry + pending
+        yield buffer.decode("latin-1"), base, lead, len(buffer)
+
+
+class Analyzer:
+    def __init__(self, validator=None):
         self.compiled_patterns = {name: re.compile(regex) for name, regex in PATTERNS.items()}
+        self.scanner = ArtifactScanner()
+        self.validator = validator or ArtifactValidator()
+
+    def scan(self, text):
+        """
+        All artifact matches in text as (type, value, start, end), in text order.
+        """
+        return self.scanner.scan(text)
 
     def analyze_content(self, text):
         """
         Scans text for all defined patterns and returns a dictionary of findings.
         """
         results = {}
-        for name, pattern in self.compiled_patterns.items():
-            matches = pattern.findall(text)
-            if matches:
-                 # Deduplicate matches
-                results[name] = list(set(matches))
-        return results
-
-    def extract_artifacts(self, text):
+        for type_, value, _, _ in self.scan(text):
+            # Deduplicate matches, keeping first-seen order
+            results.setdefault(type_, {})[value] = None
+        return {type_: list(values) for type_, values in results.items()}
+
+    def _collect(self, text, hits, window, seen, base=0, clean=_clean):
+        # First occurrence of each (type, value) not yet seen, with its context
+        windows, owners = context_windows([(start, end) for _, _, start, end in hits], len(text), window)
+        snippets = {}
+        artifacts = []
+        for (type_, value, start, end), owner in zip(hits, owners):
+            if (type_, value) in seen:
+                continue
+            seen.add((type_, value))
+            if owner not in snippets:
+                lo, hi = windows[owner]
+                snippets[owner] = clean(text[lo:hi])
+            artifacts.append({
+                "type": type_,
+                "value": value,
+                "context": snippets[owner],
+                "start": start + base,
+                "end": end + base,
+            })
+        return artifacts
+
+    def extract_artifacts(self, text, window=CONTEXT_WINDOW, validate=True):
         """
-        Returns a flat list of artifact objects for easier storage.
+        Returns a flat list of artifact objects for easier storage, each with
+        the offsets and surrounding text of its first occurrence.
+        With validate, candidates are scored and those below the validator's
+        threshold are dropped (each kept artifact has a 'confidence').
         """
-        raw_results = self.analyze_content(text)
-        artifacts = []
-        for type_, values in raw_results.items():
-            for val in values:
-                # Basic context extraction could go here (grab surrounding chars)
-                artifacts.append({
-                    "type": type_,
-                    "value": val,
-                    "context": "" # TODO: Add context window (e.g. +/- 50 chars)
-                })
+        artifacts = self._collect(text, self.scan(text), window, set())
+        if validate:
+            artifacts = self.validator.filter(artifacts)
         return artifacts
 
+    def scan_stream(self, source, chunk_size=STREAM_CHUNK_BYTES, overlap=STREAM_OVERLAP):
+        """
+        scan() for documents too large to hold in memory: yields every
+        (type, value, start, end) with absolute byte offsets, reading source
+        (see iter_byte_chunks) one window at a time.
+        """
+        for text, base, lead, cutoff in stream_windows(source, chunk_size, overlap):
+            for type_, value, start, end in self.scanner.scan(text):
+                if lead <= start < cutoff:
+                    yield type_, value, start + base, end + base
+
+    def extract_artifacts_stream(self, source, window=CONTEXT_WINDOW, validate=True,
+                                 chunk_size=STREAM_CHUNK_BYTES, overlap=STREAM_OVERLAP):
+        """
+        extract_artifacts() for documents too large to hold in memory.
+        Yields artifact dicts (absolute byte offsets) window by window, each
+        (type, value) once; memory stays at about chunk_size plus the set of
+        distinct values seen.
+        """
+        seen = set()
+        for text, base, lead, cutoff in stream_windows(source, chunk_size, overlap):
+            hits = [hit for hit in self.scanner.scan(text) if lead <= hit[2] < cutoff]
+            artifacts = self._collect(text, hits, window, seen, base, _clean_latin1)
+            if validate:
+                artifacts = self.validator.filter(artifacts)
+            yield from artifacts
+
     def extract_context(self, text, keyword, window=100):
         """
         Extracts a snippet of text surrounding a keyword.
         Returns a list of unique snippets.
         """
         if not text or not keyword: return []
-        
-        # Escape keyword for regex
-        escaped_key = re.escape(keyword)
-        # Regex to find keyword with window, case-insensitive
-        pattern = re.compile(f".{{0,{window}}}{escaped_key}.{{0,{window}}}", re.IGNORECASE | re.DOTALL)
-        
-        matches = pattern.findall(text)
-        # Clean up whitespace
-        clean_matches = [m.replace("\n", " ").strip() for m in matches]
-        return list(set(clean_matches))
+
+        spans = [m.span() for m in _keyword_pattern(keyword).finditer(text)]
+        windows, _ = context_windows(spans, len(text), window, max_chars=4 * window + len(keyword))
+        # Deduplicate, keeping document order
+        return list(dict.fromkeys(_clean(text[lo:hi]) for lo, hi in windows))
+
 if __name__ == "__main__":
     text = "Contact me at test@example.com or send BTC to 1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa. Also 127.0.0.1"
     analyzer = Analyzer()
@@ -0,0 +1,107 @@
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from .analyzer import Analyzer, PATTERNS
+
+try:
+    from config import ANALYSIS_WORKERS, ANALYSIS_CHUNK_SIZE
+except ImportError:
+    ANALYSIS_WORKERS = os.cpu_count() or 1
+    ANALYSIS_CHUNK_SIZE = 200
+
+logger = logging.getLogger(__name__)
+
+# Text handed to one worker task; large pages get a task of their own
+MAX_TASK_BYTES = 16 * 1024 * 1024
+# Tasks queued per worker before reading more rows from the database
+TASKS_PER_WORKER = 2
+
+_analyzer = None
+
+
+def _init_worker():
+    global _analyzer
+    _analyzer = Analyzer()
+
+
+def analyze_rows(rows):
+    """
+    Worker entry point: (id, title, snippet, content) rows in,
+    (id, artifact dicts) out.
+    """
+    analyzer = _analyzer or Analyzer()
+    analyzed = []
+    for result_id, title, snippet, content in rows:
+        text = "\n".join(part for part in (title, snippet, content) if part)
+        analyzed.append((result_id, analyzer.extract_artifacts(text)))
+    return analyzed
+
+
+def _row_size(row):
+    return sum(len(part) for part in row[1:] if part)
+
+
+class BulkAnalyzer:
+    """
+    Re-runs the Analyzer over stored results on every core.
+
+    Unprocessed results are streamed out of the database chunk by chunk and
+    split into tasks for a process pool; at most TASKS_PER_WORKER tasks per
+    worker are in flight, so memory stays bounded however large the backlog.
+    Each finished task is written back in one transaction (artifacts
+    inserted in bulk, results marked processed), replacing any pattern
+    artifacts stored for those results earlier.
+    """
+    def __init__(self, storage, workers=ANALYSIS_WORKERS, chunk_size=ANALYSIS_CHUNK_SIZE):
+        self.storage = storage
+        self.workers = max(1, workers)
+        self.chunk_size = chunk_size
+
+    def _tasks(self, investigation_id):
+        # Every chunk is spread over all workers
+        rows_per_task = max(1, -(-self.chunk_size // self.workers))
+        for chunk in self.storage.iter_unprocessed_results(self.chunk_size, investigation_id):
+            task, size = [], 0
+            for row in chunk:
+                row_size = _row_size(row)
+                if task and (len(task) >= rows_per_task or size + row_size > MAX_TASK_BYTES):
+                    yield task
+                    task, size = [], 0
+                task.append(row)
+                size += row_size
+            if task:
+                yield task
+
+    def _save(self, futures, stats):
+        for future in futures:
+            analyzed = future.result()
+            stats["artifacts"] += self.storage.save_analysis(analyzed, replace_types=PATTERNS.keys())
+            stats["results"] += len(analyzed)
+            stats["tasks"] += 1
+        logger.info(f"Analyzed {stats['results']} results, {stats['artifacts']} artifacts so far.")
+
+    def run(self, investigation_id=None, reprocess=False):
+        """
+        Analyzes every unprocessed result (of one investigation, or all).
+        With reprocess, already processed results are analyzed again.
+        Returns {"results", "artifacts", "tasks", "seconds"}.
+        """
+        if reprocess:
+            count = self.storage.reset_processed(investigation_id)
+            logger.info(f"Re-analyzing {count} stored results.")
+        stats = {"results": 0, "artifacts": 0, "tasks": 0}
+        started = time.time()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as pool:
+            pending = set()
+            for task in self._tasks(investigation_id):
+                pending.add(pool.submit(analyze_rows, task))
+                if len(pending) >= self.workers * TASKS_PER_WORKER:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    self._save(done, stats)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                self._save(done, stats)
+        stats["seconds"] = round(time.time() - started, 1)
+        return stats
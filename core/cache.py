@@ -0,0 +1,246 @@
+import json
+import logging
+import re
+import threading
+import time
+
+from sqlalchemy import create_engine, Column, Integer, String, Text, Float, LargeBinary, func
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+try:
+    from config import CACHE_DB_URL, CACHE_TTL, CACHE_MAX_BYTES
+except ImportError:
+    CACHE_DB_URL = "sqlite:///erebus_cache.db"
+    CACHE_TTL = 6 * 3600
+    CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+# Kept apart from the investigation database: everything here is disposable
+# and the file can be deleted at any time.
+CacheBase = declarative_base()
+
+# Evict down to this fraction of the size cap so eviction is not run on every store
+EVICT_TARGET = 0.9
+
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+def header_value(headers, name):
+    """
+    Case-insensitive header lookup on a plain dict.
+    """
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+class CachedResponse(CacheBase):
+    __tablename__ = 'cached_responses'
+
+    key = Column(String, primary_key=True) # Canonical URL
+    status = Column(Integer)
+    headers = Column(Text) # JSON
+    body = Column(LargeBinary)
+    size = Column(Integer, default=0)
+    latency = Column(Float)
+    etag = Column(String)
+    last_modified = Column(String)
+    fetched_at = Column(Float)
+    expires_at = Column(Float)
+    last_access = Column(Float, index=True)
+
+
+class ResponseCache:
+    """
+    Persistent HTTP response cache keyed by canonical URL.
+
+    Fresh entries are served without touching the network. Stale entries
+    carrying an ETag or Last-Modified are revalidated with a conditional
+    request; a 304 extends their lifetime. Total body size is capped and the
+    least recently used entries are evicted first.
+    """
+    def __init__(self, db_url=CACHE_DB_URL, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.engine = create_engine(db_url, connect_args={"check_same_thread": False} if db_url.startswith("sqlite") else {})
+        CacheBase.metadata.create_all(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "revalidated": 0, "stores": 0, "evictions": 0}
+        session = self.Session()
+        try:
+            self._total_bytes = session.query(func.coalesce(func.sum(CachedResponse.size), 0)).scalar()
+        finally:
+            session.close()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _ttl_for(self, headers):
+        cache_control = (header_value(headers, "Cache-Control") or "").lower()
+        if "no-store" in cache_control:
+            return None
+        match = MAX_AGE_RE.search(cache_control)
+        if match:
+            return min(int(match.group(1)), self.ttl)
+        return self.ttl
+
+    def lookup(self, key):
+        """
+        Returns the cached entry for a key as a dict with a 'fresh' flag,
+        or None. Bumps the entry's LRU timestamp.
+        """
+        now = time.time()
+        session = self.Session()
+        try:
+            entry = session.get(CachedResponse, key)
+            if entry is None:
+                self._count("misses")
+                return None
+            entry.last_access = now
+            session.commit()
+            fresh = entry.expires_at is not None and entry.expires_at > now
+            self._count("hits" if fresh else "stale")
+            return {
+                "status": entry.status,
+                "headers": json.loads(entry.headers or "{}"),
+                "content": entry.body or b"",
+                "latency": entry.latency,
+                "etag": entry.etag,
+                "last_modified": entry.last_modified,
+                "fresh": fresh
+            }
+        finally:
+            session.close()
+
+    @staticmethod
+    def conditional_headers(entry):
+        """
+        Request headers that revalidate a stale entry.
+        """
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, key, status, headers, content, latency=None):
+        """
+        Caches a successful response. Responses marked no-store are skipped.
+        """
+        if status != 200:
+            return
+        headers = dict(headers or {})
+        ttl = self._ttl_for(headers)
+        if ttl is None:
+            return
+        size = len(content or b"")
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        session = self.Session()
+        try:
+            entry = session.get(CachedResponse, key)
+            old_size = entry.size if entry else 0
+            if entry is None:
+                entry = CachedResponse(key=key)
+                session.add(entry)
+            entry.status = status
+            entry.headers = json.dumps(headers)
+            entry.body = content
+            entry.size = size
+            entry.latency = latency
+            entry.etag = header_value(headers, "ETag")
+            entry.last_modified = header_value(headers, "Last-Modified")
+            entry.fetched_at = now
+            entry.expires_at = now + ttl
+            entry.last_access = now
+            session.commit()
+        finally:
+            session.close()
+
+        with self._lock:
+            self._total_bytes += size - old_size
+            self.stats["stores"] += 1
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def refresh(self, key, headers=None):
+        """
+        Extends a revalidated (304) entry's lifetime.
+        """
+        ttl = self._ttl_for(dict(headers or {})) or self.ttl
+        now = time.time()
+        session = self.Session()
+        try:
+            entry = session.get(CachedResponse, key)
+            if entry is not None:
+                entry.fetched_at = now
+                entry.expires_at = now + ttl
+                entry.last_access = now
+                session.commit()
+        finally:
+            session.close()
+        self._count("revalidated")
+
+    def evict(self):
+        """
+        Drops least recently used entries until the cache is below its cap.
+        """
+        target = self.max_bytes * EVICT_TARGET
+        freed = 0
+        evicted = 0
+        session = self.Session()
+        try:
+            while self._total_bytes - freed > target:
+                rows = session.query(CachedResponse.key, CachedResponse.size).order_by(
+                    CachedResponse.last_access
+                ).limit(500).all()
+                if not rows:
+                    break
+                victims = []
+                for key, size in rows:
+                    if self._total_bytes - freed <= target:
+                        break
+                    victims.append(key)
+                    freed += size or 0
+                session.query(CachedResponse).filter(
+                    CachedResponse.key.in_(victims)
+                ).delete(synchronize_session=False)
+                session.commit()
+                evicted += len(victims)
+        finally:
+            session.close()
+        with self._lock:
+            self._total_bytes -= freed
+            self.stats["evictions"] += evicted
+        logger.info(f"Response cache evicted {evicted} entries ({freed} bytes).")
+
+    def summary(self):
+        """
+        Hit/miss counters plus current size, for logs and the UI.
+        """
+        session = self.Session()
+        try:
+            entries = session.query(func.count(CachedResponse.key)).scalar()
+        finally:
+            session.close()
+        with self._lock:
+            return dict(self.stats, entries=entries, bytes=self._total_bytes)
+
+    def clear(self):
+        session = self.Session()
+        try:
+            session.query(CachedResponse).delete()
+            session.commit()
+        finally:
+            session.close()
+        with self._lock:
+            self._total_bytes = 0
@@ -0,0 +1,249 @@
+import logging
+import statistics
+import threading
+import time
+from collections import deque
+
+from stem import CircStatus, Signal, StreamStatus
+from stem.control import Controller, EventType
+
+try:
+    from config import (TOR_CONTROL_PORT, TOR_PASSWORD, CIRCUIT_CHECK_INTERVAL, CIRCUIT_MAX_FAILURES,
+                          CIRCUIT_SLOW_FACTOR, CIRCUIT_MIN_SAMPLES)
+except ImportError:
+    TOR_CONTROL_PORT = 9051
+    TOR_PASSWORD = None
+    CIRCUIT_CHECK_INTERVAL = 15
+    CIRCUIT_MAX_FAILURES = 3
+    CIRCUIT_SLOW_FACTOR = 3.0
+    CIRCUIT_MIN_SAMPLES = 5
+
+logger = logging.getLogger(__name__)
+
+# Stream outcomes kept per circuit
+CIRCUIT_WINDOW = 20
+# NEWNYM once this share of the measured circuits is degraded at the same time
+NEWNYM_DEGRADED_SHARE = 0.5
+
+
+class CircuitManager:
+    """
+    Background circuit health monitor on one persistent control connection.
+
+    Tor's STREAM events give every circuit's stream setup latency and
+    failures; CIRC events map circuits to the SOCKS credentials of the
+    TorHandler's endpoint pool, so the crawler's own per-endpoint telemetry
+    can be tied to circuits too. Circuits that keep failing or are much
+    slower than their peers are closed (CLOSECIRCUIT), and when most of them
+    degrade at once the manager signals NEWNYM. All control traffic happens
+    on the manager's thread, so crawl workers never wait on it.
+    """
+    def __init__(self, tor_handler, control_port=TOR_CONTROL_PORT, password=TOR_PASSWORD,
+                 check_interval=CIRCUIT_CHECK_INTERVAL, max_failures=CIRCUIT_MAX_FAILURES,
+                 slow_factor=CIRCUIT_SLOW_FACTOR, min_samples=CIRCUIT_MIN_SAMPLES):
+        self.tor_handler = tor_handler
+        self.control_port = control_port
+        self.password = password
+        self.check_interval = check_interval
+        self.max_failures = max_failures
+        self.slow_factor = slow_factor
+        self.min_samples = min_samples
+        self.stats = {"closed_circuits": 0, "newnym": 0}
+
+        self._controller = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._newnym_pending = False
+        self._newnym_timer = None
+        self._streams = {}   # stream id -> start time
+        self._circuits = {}  # circ id -> telemetry dict
+
+    # --- Lifecycle ---
+
+    def _connect(self):
+        controller = Controller.from_port(port=self.control_port)
+        if self.password:
+            controller.authenticate(password=self.password)
+        else:
+            controller.authenticate()
+        controller.add_event_listener(self._on_circuit, EventType.CIRC)
+        controller.add_event_listener(self._on_stream, EventType.STREAM)
+        self._controller = controller
+
+    def start(self):
+        """
+        Connects to the control port and starts the monitor thread.
+        Returns False (and stays inactive) when the control port is unusable.
+        """
+        if self._thread is not None:
+            return True
+        try:
+            self._connect()
+        except Exception as e:
+            logger.warning(f"Circuit manager disabled, control port {self.control_port} unavailable: {e}")
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="erebus-circuit-manager", daemon=True)
+        self._thread.start()
+        logger.info(f"Circuit manager started on control port {self.control_port}.")
+        return True
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._controller is not None:
+            try:
+                self._controller.close()
+            except Exception:
+                pass
+            self._controller = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def controller(self):
+        """
+        The persistent, authenticated controller (None while disconnected).
+        """
+        return self._controller if self.running else None
+
+    def request_newnym(self):
+        """
+        Asks for fresh circuits without blocking: the signal is sent from the
+        manager thread as soon as Tor's NEWNYM rate limit allows.
+        """
+        self._newnym_pending = True
+        self._wake.set()
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.check_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                if self._controller is None or not self._controller.is_alive():
+                    logger.info("Reconnecting circuit manager controller...")
+                    self._connect()
+                self._check()
+            except Exception as e:
+                logger.error(f"Circuit manager check failed: {e}")
+                self._controller = None
+
+    # --- Telemetry ---
+
+    def _circuit(self, circ_id):
+        circuit = self._circuits.get(circ_id)
+        if circuit is None:
+            circuit = self._circuits[circ_id] = {
+                "outcomes": deque(maxlen=CIRCUIT_WINDOW),
+                "latencies": deque(maxlen=CIRCUIT_WINDOW),
+                "tag": None,
+                "built_at": time.time(),
+            }
+        return circuit
+
+    def _on_circuit(self, event):
+        with self._lock:
+            if event.status == CircStatus.BUILT:
+                circuit = self._circuit(event.id)
+                circuit["tag"] = event.socks_password
+            elif event.status in (CircStatus.CLOSED, CircStatus.FAILED):
+                self._circuits.pop(event.id, None)
+
+    def _on_stream(self, event):
+        now = time.time()
+        with self._lock:
+            if event.status == StreamStatus.NEW:
+                self._streams[event.id] = now
+            elif event.status == StreamStatus.SUCCEEDED and event.circ_id:
+                circuit = self._circuit(event.circ_id)
+                started = self._streams.pop(event.id, None)
+                circuit["outcomes"].append(True)
+                if started is not None:
+                    circuit["latencies"].append(now - started)
+            elif event.status in (StreamStatus.FAILED, StreamStatus.DETACHED) and event.circ_id:
+                self._circuit(event.circ_id)["outcomes"].append(False)
+                self._streams.pop(event.id, None)
+            elif event.status == StreamStatus.CLOSED:
+                self._streams.pop(event.id, None)
+
+    # --- Decisions ---
+
+    def _degraded_circuits(self):
+        """
+        Circuit ids whose last max_failures streams all failed or whose median
+        setup latency is slow_factor times the median of all circuits.
+        Circuits serving a pool endpoint the crawler measures as slow count too.
+        """
+        slow_tags = self.tor_handler.slow_endpoint_tags(self.slow_factor)
+        with self._lock:
+            medians = {cid: statistics.median(c["latencies"]) for cid, c in self._circuits.items()
+                       if len(c["latencies"]) >= self.min_samples}
+            baseline = statistics.median(medians.values()) if len(medians) > 1 else None
+            degraded = []
+            for circ_id, circuit in self._circuits.items():
+                outcomes = list(circuit["outcomes"])
+                recent_failures = outcomes[-self.max_failures:]
+                if len(recent_failures) >= self.max_failures and not any(recent_failures):
+                    degraded.append((circ_id, "stream failures"))
+                elif baseline and circ_id in medians and medians[circ_id] > baseline * self.slow_factor:
+                    degraded.append((circ_id, f"slow ({medians[circ_id]:.1f}s vs {baseline:.1f}s)"))
+                elif circuit["tag"] in slow_tags:
+                    degraded.append((circ_id, f"endpoint {circuit['tag']} slow"))
+            return degraded, len(self._circuits)
+
+    def _check(self):
+        degraded, measured = self._degraded_circuits()
+        replaced_tags = set()
+        for circ_id, reason in degraded:
+            try:
+                self._controller.close_circuit(circ_id)
+                self.stats["closed_circuits"] += 1
+                logger.info(f"Closed degraded circuit {circ_id}: {reason}")
+            except Exception as e:
+                logger.debug(f"Could not close circuit {circ_id}: {e}")
+            with self._lock:
+                circuit = self._circuits.pop(circ_id, None)
+            if circuit and circuit["tag"]:
+                replaced_tags.add(circuit["tag"])
+
+        # Endpoints whose circuits were replaced start from a clean slate
+        if replaced_tags:
+            self.tor_handler.reset_endpoints(replaced_tags)
+
+        if measured and len(degraded) >= max(2, measured * NEWNYM_DEGRADED_SHARE):
+            self._newnym_pending = True
+        if self._newnym_pending:
+            if self._controller.is_newnym_available():
+                self._controller.signal(Signal.NEWNYM)
+                self._newnym_pending = False
+                self.stats["newnym"] += 1
+                logger.info("Sent NEWNYM: new circuits for all new streams.")
+            elif self._newnym_timer is None or not self._newnym_timer.is_alive():
+                # Retry once Tor's rate limit has passed, without sleeping here
+                self._newnym_timer = threading.Timer(self._controller.get_newnym_wait(), self._wake.set)
+                self._newnym_timer.daemon = True
+                self._newnym_timer.start()
+
+    def summary(self):
+        """
+        Per-circuit telemetry plus counters, for logs and the UI.
+        """
+        with self._lock:
+            circuits = [{
+                "circuit": circ_id,
+                "endpoint": circuit["tag"],
+                "streams": len(circuit["outcomes"]),
+                "failures": list(circuit["outcomes"]).count(False),
+                "median_latency": round(statistics.median(circuit["latencies"]), 2) if circuit["latencies"] else None,
+            } for circ_id, circuit in sorted(self._circuits.items())]
+        return dict(self.stats, circuits=circuits)
@@ -0,0 +1,541 @@
+import asyncio
+import hashlib
+import logging
+import queue
+import re
+import threading
+import time
+from collections import deque
+from urllib.parse import urljoin, urlparse
+
+import aiohttp
+from aiohttp_socks import ProxyConnector, ProxyConnectionError
+
+try:
+    from config import (MAX_CONCURRENCY, PER_HOST_CONCURRENCY, REQUEST_TIMEOUT, FETCH_RETRIES, MAX_BODY_BYTES,
+                          HEDGE_RATIO, HEDGE_BURST, HEDGE_MIN_DELAY)
+except ImportError:
+    MAX_CONCURRENCY = 100
+    PER_HOST_CONCURRENCY = 4
+    REQUEST_TIMEOUT = 45
+    FETCH_RETRIES = 2
+    MAX_BODY_BYTES = 5 * 1024 * 1024
+    HEDGE_RATIO = 0.1
+    HEDGE_BURST = 5
+    HEDGE_MIN_DELAY = 2.0
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth a second attempt (same set the old urllib3 Retry used)
+RETRY_STATUSES = {500, 502, 503, 504}
+
+_DONE = object()
+
+# Hedges rotate over this many isolated circuits
+HEDGE_CIRCUITS = 4
+# Successful latencies needed before the engine-wide p90 is trusted
+MIN_LATENCY_SAMPLES = 20
+
+BODY_CHUNK_SIZE = 64 * 1024
+
+# Content types worth downloading; anything else is dropped after the headers
+TEXT_CONTENT_TYPES = ("text/", "application/xhtml", "application/xml", "application/json",
+                      "application/rss", "application/atom", "application/javascript")
+# Magic numbers of common binary formats, checked on the first chunk since
+# onion servers often send no or wrong Content-Type headers
+BINARY_SIGNATURES = (b"%PDF", b"PK\x03\x04", b"\x1f\x8b", b"\x89PNG", b"\xff\xd8\xff", b"GIF8",
+                     b"Rar!", b"7z\xbc\xaf", b"BZh", b"\xfd7zXZ", b"\x7fELF", b"MZ")
+
+
+def make_proxy_connector(proxy_url, **kwargs):
+    """
+    Builds an aiohttp connector for a SOCKS proxy URL.
+    'socks5h' is not understood by python-socks, so it is mapped to socks5
+    with remote DNS (required for .onion resolution).
+    """
+    rdns = False
+    if proxy_url.startswith("socks5h://"):
+        proxy_url = "socks5://" + proxy_url[len("socks5h://"):]
+        rdns = True
+    return ProxyConnector.from_url(proxy_url, rdns=rdns, **kwargs)
+
+
+def decode_body(body, charset=None):
+    """
+    Decodes a response body, falling back to utf-8 with replacement.
+    """
+    if not body:
+        return ""
+    try:
+        return body.decode(charset or "utf-8", errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+
+def canonicalize_url(url, base=None):
+    """
+    Normalises a URL so that trivially different spellings of the same page
+    compare equal: resolves relative links against base, lowercases scheme and
+    host, drops fragments and default ports, and sorts query parameters.
+    Returns None for anything that is not http(s).
+    """
+    if not url:
+        return None
+    url = url.strip()
+    if base:
+        url = urljoin(base, url)
+    try:
+        parsed = urlparse(url)
+        port = parsed.port
+    except ValueError:
+        return None
+    scheme = parsed.scheme.lower()
+    if scheme not in ("http", "https") or not parsed.hostname:
+        return None
+
+    netloc = parsed.hostname.lower()
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        netloc = f"{netloc}:{port}"
+    path = parsed.path or "/"
+    query = "&".join(sorted(q for q in parsed.query.split("&") if q))
+    return f"{scheme}://{netloc}{path}" + (f"?{query}" if query else "")
+
+
+def _content_type(headers):
+    for key, value in headers.items():
+        if key.lower() == "content-type":
+            return value.split(";")[0].strip().lower()
+    return None
+
+
+def rejected_content_type(headers):
+    """
+    Returns a skip reason if the declared Content-Type is not worth
+    downloading, else None. Missing or generic types are left to sniffing.
+    """
+    content_type = _content_type(headers)
+    if not content_type or content_type == "application/octet-stream":
+        return None
+    if content_type.startswith(TEXT_CONTENT_TYPES):
+        return None
+    return f"content-type {content_type}"
+
+
+def looks_binary(chunk):
+    """
+    Sniffs the first chunk of a body for binary formats.
+    """
+    return chunk.startswith(BINARY_SIGNATURES) or b"\x00" in chunk[:1024]
+
+
+class BodyReader:
+    """
+    Accumulates a response body chunk by chunk up to a byte budget,
+    hashing it as it arrives. feed() returns False once reading should stop:
+    the budget is spent (truncated) or the body is not text (skipped).
+    """
+    def __init__(self, headers, max_bytes=MAX_BODY_BYTES):
+        self.max_bytes = max_bytes
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.truncated = False
+        self.skipped = rejected_content_type(headers)
+        self._chunks = []
+
+    def feed(self, chunk):
+        if self.skipped:
+            return False
+        if not chunk:
+            return True
+        if not self.size and looks_binary(chunk):
+            self.skipped = "binary content"
+            return False
+        room = self.max_bytes - self.size
+        if len(chunk) > room:
+            chunk = chunk[:room]
+            self.truncated = True
+        self.md5.update(chunk)
+        self.sha256.update(chunk)
+        self._chunks.append(chunk)
+        self.size += len(chunk)
+        return not self.truncated
+
+    @property
+    def content(self):
+        return b"".join(self._chunks)
+
+
+def _charset(headers):
+    for key, value in headers.items():
+        if key.lower() == "content-type":
+            match = re.search(r'charset=([\w-]+)', value, re.IGNORECASE)
+            return match.group(1) if match else None
+    return None
+
+
+class CrawlEngine:
+    """
+    Asyncio fetch engine for Tor traffic.
+
+    The engine owns an event loop running in a daemon thread, so synchronous
+    callers (Streamlit, CLI, thread pools) can submit work to it and share one
+    aiohttp session. In-flight requests are bounded by a global limit and by a
+    per-host limit so a single slow onion cannot absorb every slot. Bodies are
+    streamed and capped at max_body_bytes, so a multi-GB dump costs no more
+    memory than a normal page.
+
+    fetch_hedged() duplicates a request that runs past the p90 latency over a
+    separately isolated circuit and keeps whichever answer arrives first;
+    hedges are capped at hedge_burst + hedge_ratio x requests sent.
+
+    Proxy, keep-alive and client identity come from the TorHandler. Each
+    attempt is routed through the circuit its pool currently rates best, with
+    one session per circuit; sessions are only rebuilt when the handler's
+    identity generation changes.
+    With a ResponseCache, fresh pages are served from disk and stale ones
+    are revalidated with conditional requests.
+    """
+    def __init__(self, tor_handler, max_concurrency=MAX_CONCURRENCY,
+                 per_host=PER_HOST_CONCURRENCY, timeout=REQUEST_TIMEOUT, retries=FETCH_RETRIES, cache=None,
+                 max_body_bytes=MAX_BODY_BYTES, hedge_ratio=HEDGE_RATIO, hedge_burst=HEDGE_BURST,
+                 hedge_min_delay=HEDGE_MIN_DELAY):
+        self.tor_handler = tor_handler
+        self.cache = cache
+        self.max_body_bytes = max_body_bytes
+        self.max_concurrency = max_concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.hedge_ratio = hedge_ratio
+        self.hedge_burst = hedge_burst
+        self.hedge_min_delay = hedge_min_delay
+        self.stats = {"requests": 0, "hedges": 0, "hedge_wins": 0}
+        self._latencies = deque(maxlen=200)
+
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._session_generation = None
+        self._retired_sessions = set()
+        self._global_sem = None
+        self._host_sems = {}
+
+    # --- Event loop management ---
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="erebus-crawl-loop", daemon=True
+                )
+                self._thread.start()
+        return self._loop
+
+    def run(self, coro):
+        """
+        Runs a coroutine on the engine loop and blocks until it completes.
+        """
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("CrawlEngine.run() cannot be called from the engine loop; await the coroutine instead.")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def iterate(self, agen):
+        """
+        Drives an async generator on the engine loop and yields its items
+        in the calling thread as soon as they are produced.
+        """
+        loop = self._ensure_loop()
+        items = queue.Queue()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    items.put((item, None))
+            except BaseException as e:
+                items.put((_DONE, e))
+            else:
+                items.put((_DONE, None))
+            finally:
+                await agen.aclose()
+
+        future = asyncio.run_coroutine_threadsafe(pump(), loop)
+        try:
+            while True:
+                item, error = items.get()
+                if item is _DONE:
+                    if error and not isinstance(error, asyncio.CancelledError):
+                        raise error
+                    return
+                yield item
+        finally:
+            if not future.done():
+                future.cancel()
+
+    def close(self):
+        """
+        Closes the HTTP session and stops the engine loop.
+        """
+        if self._loop is None or self._loop.is_closed():
+            return
+        try:
+            self.run(self._close_session())
+        except Exception as e:
+            logger.debug(f"Error closing crawl engine session: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+
+    # --- HTTP ---
+
+    async def _get_session(self, proxy_url):
+        """
+        Session for the current identity through one proxy URL. Every circuit
+        of the TorHandler's pool (and every hedge tag) has distinct SOCKS
+        credentials or port, hence its own session and Tor circuit.
+        """
+        identity = self.tor_handler.identity
+        if self._sessions and self._session_generation != identity["generation"]:
+            # Identity was rotated: let requests already on the old sessions
+            # finish, then close them.
+            for old_session in self._sessions.values():
+                self._retired_sessions.add(old_session)
+                asyncio.get_running_loop().call_later(
+                    self.timeout, lambda s=old_session: asyncio.ensure_future(self._retire(s))
+                )
+            self._sessions = {}
+        session = self._sessions.get(proxy_url)
+        if session is None or session.closed:
+            connector = make_proxy_connector(
+                proxy_url,
+                limit=self.max_concurrency,
+                limit_per_host=self.per_host,
+                keepalive_timeout=self.tor_handler.keepalive_timeout
+            )
+            session = self._sessions[proxy_url] = aiohttp.ClientSession(connector=connector, headers=identity["headers"])
+            self._session_generation = identity["generation"]
+        return session
+
+    async def _retire(self, session):
+        self._retired_sessions.discard(session)
+        await session.close()
+
+    async def _close_session(self):
+        for session in list(self._retired_sessions):
+            await self._retire(session)
+        for session in self._sessions.values():
+            if not session.closed:
+                await session.close()
+        self._sessions = {}
+        self._session_generation = None
+
+    def _host_sem(self, host):
+        sem = self._host_sems.get(host)
+        if sem is None:
+            sem = self._host_sems[host] = asyncio.Semaphore(self.per_host)
+        return sem
+
+    async def fetch(self, url, timeout=None, use_cache=True, retries=None, max_bytes=None, isolation=None):
+        """
+        Fetches a URL through the proxy, consulting the response cache first.
+        Never raises: failures are reported through the 'error' key of the
+        returned dict. Cached responses carry from_cache=True; bodies cut at
+        the byte budget carry truncated=True and non-text bodies that were
+        not downloaded carry the reason in 'skipped'.
+        """
+        key = canonicalize_url(url) if self.cache is not None and use_cache else None
+        cached = None
+        if key:
+            cached = await asyncio.to_thread(self.cache.lookup, key)
+            if cached and cached["fresh"]:
+                return self._cached_response(url, cached)
+
+        resp = await self._fetch_network(
+            url, timeout, self.cache.conditional_headers(cached) if cached else None, retries, max_bytes, isolation
+        )
+
+        if key and resp["error"] is None:
+            if resp["status"] == 304 and cached:
+                await asyncio.to_thread(self.cache.refresh, key, resp["headers"])
+                return self._cached_response(url, cached)
+            if resp["truncated"] or resp["skipped"]:
+                return resp
+            await asyncio.to_thread(
+                self.cache.store, key, resp["status"], resp["headers"], resp["content"], resp["latency"]
+            )
+        return resp
+
+    @staticmethod
+    def _response(url, **fields):
+        resp = {
+            "url": url,
+            "final_url": url,
+            "status": None,
+            "headers": {},
+            "content": b"",
+            "text": "",
+            "latency": 0.0,
+            "error": None,
+            "from_cache": False,
+            "size": 0,
+            "md5": None,
+            "sha256": None,
+            "truncated": False,
+            "skipped": None,
+        }
+        resp.update(fields)
+        return resp
+
+    @classmethod
+    def _cached_response(cls, url, cached):
+        content = cached["content"]
+        return cls._response(
+            url,
+            status=cached["status"],
+            headers=cached["headers"],
+            content=content,
+            text=decode_body(content, _charset(cached["headers"])),
+            latency=cached["latency"],
+            from_cache=True,
+            size=len(content),
+            md5=hashlib.md5(content).hexdigest(),
+            sha256=hashlib.sha256(content).hexdigest(),
+        )
+
+    async def _fetch_network(self, url, timeout=None, extra_headers=None, retries=None, max_bytes=None,
+                             isolation=None):
+        if self._global_sem is None:
+            self._global_sem = asyncio.Semaphore(self.max_concurrency)
+        host = urlparse(url).hostname or ""
+        client_timeout = aiohttp.ClientTimeout(total=timeout or self.timeout)
+        retries = self.retries if retries is None else retries
+        max_bytes = max_bytes or self.max_body_bytes
+
+        self.stats["requests"] += 1
+        async with self._global_sem, self._host_sem(host):
+            attempt = 0
+            while True:
+                start_time = time.time()
+                # Each attempt goes to the currently best circuit of the pool;
+                # hedges use their own isolation tag instead.
+                endpoint = self.tor_handler.acquire_endpoint() if isolation is None else None
+                proxy_url = endpoint.url if endpoint else self.tor_handler.isolated_proxy_url(isolation)
+                header_latency, circuit_ok = None, True
+                try:
+                    session = await self._get_session(proxy_url)
+                    async with session.get(url, timeout=client_timeout, headers=extra_headers) as resp:
+                        header_latency = time.time() - start_time
+                        if resp.status in RETRY_STATUSES and attempt < retries:
+                            raise aiohttp.ClientResponseError(
+                                resp.request_info, resp.history, status=resp.status
+                            )
+                        # Leaving the block early drops the connection, aborting the transfer
+                        reader = BodyReader(resp.headers, max_bytes)
+                        async for chunk in resp.content.iter_chunked(BODY_CHUNK_SIZE):
+                            if not reader.feed(chunk):
+                                break
+                        if reader.truncated:
+                            logger.warning(f"Truncated {url} at {reader.size} bytes.")
+                        elif reader.skipped:
+                            logger.info(f"Not downloading {url}: {reader.skipped}.")
+                        body = reader.content
+                        self._latencies.append(time.time() - start_time)
+                        return self._response(
+                            url,
+                            final_url=str(resp.url),
+                            status=resp.status,
+                            headers=dict(resp.headers),
+                            content=body,
+                            text=decode_body(body, resp.charset),
+                            latency=round(time.time() - start_time, 2),
+                            size=reader.size,
+                            md5=reader.md5.hexdigest(),
+                            sha256=reader.sha256.hexdigest(),
+                            truncated=reader.truncated,
+                            skipped=reader.skipped,
+                        )
+                except Exception as e:
+                    # Only a refused proxy connection says the Tor instance itself is unhealthy
+                    circuit_ok = not isinstance(e, ProxyConnectionError)
+                    if attempt < retries and not isinstance(e, asyncio.TimeoutError):
+                        attempt += 1
+                        await asyncio.sleep(0.5 * (2 ** (attempt - 1)))
+                        continue
+                    logger.error(f"Error fetching {url}: {e!r}")
+                    return self._response(url, latency=round(time.time() - start_time, 2), error=e)
+                finally:
+                    if endpoint is not None:
+                        self.tor_handler.release_endpoint(endpoint, header_latency, circuit_ok)
+
+    def hedge_delay(self):
+        """
+        Engine-wide p90 latency of successful fetches, or None until enough
+        samples have been seen.
+        """
+        if len(self._latencies) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[int(len(ordered) * 0.9) - 1]
+
+    def _take_hedge(self):
+        if self.stats["hedges"] >= self.hedge_burst + self.hedge_ratio * self.stats["requests"]:
+            return False
+        self.stats["hedges"] += 1
+        return True
+
+    async def fetch_hedged(self, url, hedge_after=None, timeout=None, retries=None):
+        """
+        Like fetch(), but if no answer arrived after hedge_after seconds
+        (default: the engine-wide p90), sends a duplicate over a different
+        circuit and returns the first successful response. Falls back to a
+        plain fetch when there is no latency estimate or the hedge budget is
+        spent.
+        """
+        hedge_after = hedge_after or self.hedge_delay()
+        if not hedge_after:
+            return await self.fetch(url, timeout=timeout, retries=retries)
+        hedge_after = max(hedge_after, self.hedge_min_delay)
+
+        start_time = time.time()
+        primary = asyncio.ensure_future(self.fetch(url, timeout=timeout, retries=retries))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done or not self._take_hedge():
+            return await primary
+
+        tag = f"hedge-{self.stats['hedges'] % HEDGE_CIRCUITS}"
+        logger.debug(f"Hedging {url} after {hedge_after:.1f}s over circuit {tag}.")
+        hedge = asyncio.ensure_future(
+            self.fetch(url, timeout=timeout, retries=retries, use_cache=False, isolation=tag)
+        )
+        pending = {primary, hedge}
+        resp = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    resp = task.result()
+                    if resp["error"] is None:
+                        if task is hedge:
+                            self.stats["hedge_wins"] += 1
+                        resp["hedged"] = True
+                        resp["latency"] = round(time.time() - start_time, 2)
+                        return resp
+            return resp
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def fetch_many(self, urls, timeout=None):
+        """
+        Fetches all URLs concurrently, yielding responses as they complete.
+        """
+        tasks = [asyncio.ensure_future(self.fetch(u, timeout=timeout)) for u in urls]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -1,18 +1,42 @@
+import asyncio
 import logging
 import re
 import uuid
 import time
 from urllib.parse import urljoin, urlparse
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Comment
+from aiohttp_socks import ProxyError, ProxyConnectionError, ProxyTimeoutError
 from .tor_handler import TorHandler
+from .crawl_engine import CrawlEngine, BodyReader, BODY_CHUNK_SIZE, canonicalize_url, decode_body
+from .cache import ResponseCache
+from .storage import StorageManager
+from .liveness import LivenessTracker, SKIP, PROBE
+from .extractors import extract_results, parse_html
+from .scheduler import SearchScheduler
+from .engine_health import EngineHealthTracker
+from .hs_prefetch import DescriptorPrefetcher
+from .watchlist import Watchlist
+from .alerts import AlertManager
+from .validation import score_artifact, ARTIFACT_MIN_CONFIDENCE
 
 try:
-    from ..config import MAX_WORKERS, RECURSION_DEPTH, REQUEST_TIMEOUT
+    from config import (MAX_WORKERS, RECURSION_DEPTH, REQUEST_TIMEOUT, MAX_CRAWL_PAGES, PER_HOST_PAGE_BUDGET,
+                          FRONTIER_BATCH_SIZE, FRONTIER_MAX_ATTEMPTS, FRONTIER_LEASE_SECONDS, WORKER_POLL_INTERVAL,
+                          CACHE_ENABLED, HEDGE_ENABLED, CIRCUIT_MANAGER_ENABLED, WATCHLIST_ALERTS)
 except ImportError:
     MAX_WORKERS = 5
     RECURSION_DEPTH = 1
     REQUEST_TIMEOUT = 45
+    MAX_CRAWL_PAGES = 200
+    PER_HOST_PAGE_BUDGET = 25
+    FRONTIER_BATCH_SIZE = 50
+    FRONTIER_MAX_ATTEMPTS = 3
+    FRONTIER_LEASE_SECONDS = 300
+    WORKER_POLL_INTERVAL = 10
+    CACHE_ENABLED = True
+    HEDGE_ENABLED = True
+    CIRCUIT_MANAGER_ENABLED = True
+    WATCHLIST_ALERTS = True
 
 logger = logging.getLogger(__name__)
 
@@ -20,252 +44,626 @@ logger = logging.getLogger(__name__)
 SEARCH_ENGINES = [
     {"name": "Ahmia", "url": "http://juhanurmihxlp77nkq76byazcldy2hlmovfu2epvl5ankdibsot4csyd.onion/search/?q={query}"},
     {"name": "Daniel", "url": "http://danielas3rtn54uwmofdo3x2bsdifr47huadnmbg7lgn5d4fjgi7oe6a.onion/onions.php?q={query}"},
-    {"name": "Torch", "url": "http://xmh57jrzrnw6insl.onion/4a1f6b371c/search.cgi?q={query}"},
+    {"name": "Torch", "url": "http://xmh57jrknzkhv6y3ls3ubitzfqnkrwxhopf5aygthi7d6rplyvk3noyd.onion/cgi-bin/omega/omega?P={query}"},
     {"name": "Haystak", "url": "http://haystak5njsmn2hqkewecpaxetahtwhsbsa64jom2k22z5afxhnpxfid.onion/?q={query}"},
     {"name": "OnionLand", "url": "http://3bbad7fauom4d6sgppalyqddsqbf5u5p56b5k5uk2zxsy3d6ey2jobad.onion/search?q={query}"}
 ]
 
+# Crypto Regex Patterns used by direct scraping (artifact type used for validation)
+CRYPTO_TYPES = {"BTC": "btc_address", "ETH": "eth_address", "XMR": "xmr_address"}
+CRYPTO_REGEX = {
+    "BTC": r'\b(?:bc1|[13])[a-zA-HJ-NP-Z0-9]{25,39}\b',
+    "ETH": r'\b0x[a-fA-F0-9]{40}\b',
+    "XMR": r'\b4[0-9AB][1-9A-HJ-NP-Za-km-z]{93}\b'
+}
+
+# Timeout for direct target liveness checks
+DIRECT_TIMEOUT = 30
+
+def extract_onion_links(html, base_url):
+    """
+    Returns the canonical .onion links found in a page, in document order.
+    Relative links are resolved against base_url.
+    """
+    doc = parse_html(html)
+    if doc is None:
+        return []
+    links = []
+    for href in doc.xpath('//a/@href'):
+        link = canonicalize_url(href, base=base_url)
+        if link and urlparse(link).hostname.endswith(".onion"):
+            links.append(link)
+    return links
+
+
+def extract_title(html, default=""):
+    """
+    Cheap <title> lookup that avoids building a full parse tree.
+    """
+    match = re.search(r'<title[^>]*>(.*?)</title>', html, re.IGNORECASE | re.DOTALL)
+    if match:
+        title = " ".join(match.group(1).split())
+        if title:
+            return title
+    return default
+
+
 class Crawler:
-    def __init__(self, tor_handler=None):
+    def __init__(self, tor_handler=None, cache=None, storage=None, hedge=HEDGE_ENABLED):
         self.tor_handler = tor_handler or TorHandler()
-        self.session = self.tor_handler.get_session()
+        self.hedge = hedge
+        self.prefetcher = DescriptorPrefetcher(self.tor_handler)
+        self.storage = storage or StorageManager()
+        self.liveness = LivenessTracker(self.storage)
+        self.health = EngineHealthTracker(self.storage)
+        self.watchlist = Watchlist(self.storage)
+        self.alerts = AlertManager() if WATCHLIST_ALERTS else None
+        self._alerted = set()
+        if cache is None and CACHE_ENABLED:
+            cache = ResponseCache()
+        self.cache = cache
+        self.engine = CrawlEngine(self.tor_handler, cache=self.cache)
+        self.scheduler = SearchScheduler(self, health=self.health)
+
+    def start_circuit_manager(self):
+        """
+        Starts background Tor circuit monitoring (if CIRCUIT_MANAGER_ENABLED)
+        on a persistent control connection; close() stops it. Returns
+        whether it is running.
+        """
+        if not CIRCUIT_MANAGER_ENABLED:
+            return False
+        return self.tor_handler.start_circuit_manager()
+
+    def close(self):
+        """
+        Releases the async engine, its connections and the circuit manager.
+        """
+        self.engine.close()
+        self.tor_handler.close()
 
     def fetch_page(self, url):
+        key = canonicalize_url(url) if self.cache is not None else None
+        cached = self.cache.lookup(key) if key else None
+        if cached and cached['fresh']:
+            return cached['content'].decode('utf-8', errors='replace')
         try:
             logger.info(f"Fetching: {url}")
-            response = self.session.get(url, timeout=REQUEST_TIMEOUT)
-            response.raise_for_status()
-            return response.text
+            headers = ResponseCache.conditional_headers(cached)
+            with self.tor_handler.session() as session:
+                with session.get(url, timeout=REQUEST_TIMEOUT, headers=headers, stream=True) as response:
+                    if response.status_code == 304 and cached:
+                        self.cache.refresh(key, response.headers)
+                        return cached['content'].decode('utf-8', errors='replace')
+                    response.raise_for_status()
+                    reader = BodyReader(response.headers)
+                    for chunk in response.iter_content(BODY_CHUNK_SIZE):
+                        if not reader.feed(chunk):
+                            break
+            if reader.skipped:
+                logger.info(f"Not downloading {url}: {reader.skipped}.")
+                return None
+            if reader.truncated:
+                logger.warning(f"Truncated {url} at {reader.size} bytes.")
+            elif key:
+                self.cache.store(key, response.status_code, response.headers, reader.content,
+                                 response.elapsed.total_seconds())
+            return decode_body(reader.content, response.encoding)
         except Exception as e:
             logger.error(f"Error fetching {url}: {e}")
             return None
 
+    def _warm_descriptors(self, urls):
+        """
+        Starts descriptor prefetch for upcoming targets without waiting on
+        the control port.
+        """
+        if urls and self.prefetcher.active:
+            asyncio.get_running_loop().run_in_executor(None, self.prefetcher.prefetch, list(urls))
+
     def parse_search_results(self, html, engine_name):
-        results = []
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        # Generic heuristic for search results: look for links with interesting text
-        # This can be specialized per engine if needed
-        for a in soup.find_all('a', href=True):
-            href = a['href']
-            text = a.get_text(strip=True)
-            
-            # Simple validation for .onion links
-            if '.onion' in href and len(text) > 3:
-                # Resolve relative URLs
-                if href.startswith('/'):
-                    # This assumes we know the base domain, which is tricky in generic parsing
-                    # For now, let's just grab absolute onion links or keep relative if we can
-                    pass 
-                
-                # Check if it's a valid onion v3 link (56 chars) or v2 (16 chars)
-                onion_match = re.search(r'(https?://[a-z2-7]{16,56}\.onion)', href)
-                if onion_match:
-                    full_link = onion_match.group(1)
-                    results.append({
-                        "title": text,
-                        "link": full_link,
-                        "engine": engine_name,
-                        "snippet": "" # Future: extract snippet
-                    })
-        return results
+        """
+        Extracts title, link and snippet for every hit on a result page,
+        using the engine's registered extractor (see core/extractors.py).
+        """
+        return extract_results(html, engine_name)
 
-    def search_single_engine(self, engine, query):
+    async def _search_engine_async(self, engine, query, timeout=None, retries=None, hedge_after=None, use_cache=True):
+        """
+        Queries one engine. Returns (results, response) so callers can judge
+        the engine's health from the raw response. With hedging enabled the
+        request is duplicated over another circuit after hedge_after seconds.
+        """
         url = engine['url'].format(query=query)
-        html = self.fetch_page(url)
-        if html:
-            return self.parse_search_results(html, engine['name'])
-        return []
+        # Half-open trials (retries=0) must measure the engine on its own
+        if self.hedge and retries != 0:
+            resp = await self.engine.fetch_hedged(url, hedge_after=hedge_after, timeout=timeout, retries=retries)
+        else:
+            resp = await self.engine.fetch(url, timeout=timeout, retries=retries, use_cache=use_cache)
+        if resp['error'] is None and resp['status'] == 200 and resp['text']:
+            return self.parse_search_results(resp['text'], engine['name']), resp
+        return [], resp
+
+    def search_single_engine(self, engine, query):
+        return self.engine.run(self._search_engine_async(engine, query))[0]
+
+    @staticmethod
+    def _enforce_onion(query):
+        # Global .onion enforcement
+        if query and "site:onion" not in query:
+             query = f"{query} site:onion"
+        return query
+
+    async def _iter_search_async(self, queries):
+        async for batch in self.scheduler.run(queries, SEARCH_ENGINES):
+            if batch['skipped']:
+                logger.info(f"Skipped {batch['engine']}: {batch['error']}")
+            else:
+                logger.info(f"Engine {batch['engine']} found {len(batch['results'])} new results for '{batch['query']}'.")
+            for res in batch['results']:
+                res['context_query'] = batch['query']
+            if batch['results']:
+                # The scan may refresh the watchlist from the database
+                await asyncio.to_thread(self._watch_results, batch['results'])
+            yield batch
+
+    def _watch_results(self, results):
+        """
+        Scans search hits against the watchlist, tagging and alerting matches.
+        """
+        for res in results:
+            hits = self.watchlist.scan(f"{res.get('link', '')} {res.get('title', '')} {res.get('snippet', '')}")
+            if hits:
+                res['watchlist'] = hits
+                self._alert_watchlist(res.get('link'), hits)
+
+    async def _search_many_async(self, queries):
+        all_results = []
+        async for batch in self._iter_search_async(queries):
+            all_results.extend(batch['results'])
+        return all_results
+
+    def iter_search(self, query):
+        """
+        Streaming variant of search(): yields one event per engine as soon
+        as it answers, with that engine's de-duplicated new results:
+        {"query", "engine", "results", "error", "skipped", "completed", "total"}.
+        Closing the generator early cancels the engines still running.
+        """
+        return self.engine.iterate(self._iter_search_async([self._enforce_onion(query)]))
 
     def search(self, query):
         """
         Queries all configured search engines concurrently.
         Automatically enforces .onion context if not present.
         """
-        # Global .onion enforcement
-        if query and "site:onion" not in query:
-             query = f"{query} site:onion"
-             
-        all_results = []
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            future_to_engine = {
-                executor.submit(self.search_single_engine, engine, query): engine 
-                for engine in SEARCH_ENGINES
-            }
-            
-            for future in as_completed(future_to_engine):
-                engine = future_to_engine[future]
+        return self.engine.run(self._search_many_async([self._enforce_onion(query)]))
+
+    async def _crawl_deep_async(self, seeds, max_depth, max_pages, per_host_pages):
+        """
+        Concurrent breadth-first crawl. The frontier is a priority queue keyed
+        on depth, so shallower pages are always fetched first; workers share
+        one visited set and push pages to the caller as they complete.
+        """
+        frontier = asyncio.PriorityQueue()
+        pages = asyncio.Queue()
+        visited = set()
+        host_pages = {}
+        sequence = 0
+
+        def admit(url, depth, parent):
+            nonlocal sequence
+            if depth > max_depth or len(visited) >= max_pages or url in visited:
+                return
+            host = urlparse(url).hostname
+            if host_pages.get(host, 0) >= per_host_pages:
+                return
+            visited.add(url)
+            host_pages[host] = host_pages.get(host, 0) + 1
+            sequence += 1
+            frontier.put_nowait((depth, sequence, url, parent))
+
+        async def worker():
+            while True:
+                depth, _, url, parent = await frontier.get()
                 try:
-                    results = future.result()
-                    logger.info(f"Engine {engine['name']} found {len(results)} results.")
-                    all_results.extend(results)
+                    resp = await self.engine.fetch(url)
+                    if resp['error'] is not None or resp['status'] != 200 or not resp['text']:
+                        continue
+                    links = []
+                    if depth < max_depth:
+                        links = extract_onion_links(resp['text'], resp['final_url'])
+                        for link in links:
+                            admit(link, depth + 1, url)
+                        self._warm_descriptors(links)
+                    await pages.put({
+                        "url": url,
+                        "content": resp['text'],
+                        "depth": depth,
+                        "parent": parent,
+                        "links": len(links)
+                    })
                 except Exception as e:
-                    logger.error(f"Engine {engine['name']} failed: {e}")
-        
-        # Deduplication
-        unique_results = {res['link']: res for res in all_results}.values()
-        return list(unique_results)
+                    logger.error(f"Deep crawl failed on {url}: {e}")
+                finally:
+                    frontier.task_done()
+
+        for seed in seeds:
+            url = canonicalize_url(self._normalize_target(seed))
+            if url:
+                admit(url, 0, None)
+
+        workers = [
+            asyncio.ensure_future(worker())
+            for _ in range(max(1, min(self.engine.max_concurrency, max_pages)))
+        ]
+        finished = asyncio.ensure_future(frontier.join())
+        try:
+            while True:
+                next_page = asyncio.ensure_future(pages.get())
+                await asyncio.wait({next_page, finished}, return_when=asyncio.FIRST_COMPLETED)
+                if next_page.done():
+                    yield next_page.result()
+                    continue
+                next_page.cancel()
+                while not pages.empty():
+                    yield pages.get_nowait()
+                break
+        finally:
+            finished.cancel()
+            for w in workers:
+                w.cancel()
+
+    async def _crawl_frontier_async(self, storage, investigation_id, max_depth, max_pages, per_host_pages,
+                                    worker_id="local", batch_size=FRONTIER_BATCH_SIZE,
+                                    lease_seconds=FRONTIER_LEASE_SECONDS, poll_interval=WORKER_POLL_INTERVAL):
+        """
+        Breadth-first crawl driven by the persistent frontier in the database.
+        URLs are leased in batches and outcomes recorded per batch, so an
+        interrupted crawl can be resumed without refetching finished pages and
+        several workers can share one investigation. When the queue is empty
+        but other workers still hold leases, the worker polls for the links
+        they will enqueue. The crawl stops claiming new work once the
+        investigation is paused.
+        """
+        from .storage import FrontierEntry
+
+        pending = {}
+        low_water = max(1, batch_size // 2)
+        exhausted = False
+
+        async def fetch_entry(entry):
+            return entry, await self.engine.fetch(entry['url'])
+
+        while True:
+            if not exhausted and len(pending) < low_water:
+                inv = await asyncio.to_thread(storage.get_investigation, investigation_id)
+                if inv is None or inv.status == "paused":
+                    exhausted = True
+                else:
+                    batch = await asyncio.to_thread(
+                        storage.lease_batch, investigation_id, worker_id,
+                        batch_size - len(pending), lease_seconds, max_depth
+                    )
+                    for entry in batch:
+                        task = asyncio.ensure_future(fetch_entry(entry))
+                        pending[task] = entry
+                    if not batch and not pending:
+                        stats = await asyncio.to_thread(storage.frontier_stats, investigation_id)
+                        if not stats.get(FrontierEntry.IN_FLIGHT):
+                            exhausted = True
+                        else:
+                            # Peers are still fetching; their links may refill the queue
+                            await asyncio.sleep(poll_interval)
+                            continue
+            if not pending:
+                break
 
-    def crawl_deep(self, url, depth=1):
+            finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            pages, failed, children = [], [], []
+            for task in finished:
+                entry = pending.pop(task)
+                _, resp = task.result()
+                if resp['error'] is not None or resp['status'] != 200 or not resp['text']:
+                    failed.append((entry['id'], resp['error'] or f"HTTP {resp['status']}"))
+                    continue
+                links = []
+                if entry['depth'] < max_depth:
+                    links = extract_onion_links(resp['text'], resp['final_url'])
+                    children.append((entry['url'], entry['depth'] + 1, links))
+                pages.append((entry, {
+                    "url": entry['url'],
+                    "content": resp['text'],
+                    "depth": entry['depth'],
+                    "parent": entry['parent_url'],
+                    "links": len(links),
+                    "title": extract_title(resp['text'], entry['url'])
+                }))
+            self._warm_descriptors([link for _, _, links in children for link in links])
+
+            def record():
+                result_ids = storage.save_crawl_batch(investigation_id, [(entry['id'], {
+                    "link": page['url'],
+                    "title": page['title'],
+                    "snippet": "",
+                    "engine": "Crawl",
+                    "content": page['content']
+                }) for entry, page in pages], failed, max_attempts=FRONTIER_MAX_ATTEMPTS, worker_id=worker_id)
+                for (_, page), result_id in zip(pages, result_ids):
+                    page['result_id'] = result_id
+                for parent_url, depth, links in children:
+                    storage.enqueue_urls(
+                        investigation_id, links, depth=depth, parent_url=parent_url,
+                        per_host_limit=per_host_pages, max_entries=max_pages
+                    )
+
+            await asyncio.to_thread(record)
+            for _, page in pages:
+                yield page
+
+    def iter_crawl_deep(self, url, depth=None, max_pages=MAX_CRAWL_PAGES, per_host_pages=PER_HOST_PAGE_BUDGET,
+                        storage=None, investigation_id=None, worker_id="local"):
         """
-        Recursively crawls a URL to the specified depth.
-        depth=0 means just fetch this page.
-        depth=1 means fetch this page and followed links.
+        Breadth-first crawl from one URL (or a list of seed URLs), yielding
+        each page as soon as it has been fetched.
+        depth=0 means just fetch the seed pages.
+        depth=1 means fetch the seeds and the pages they link to.
+        Defaults to RECURSION_DEPTH - 1 (RECURSION_DEPTH=1 is "result pages only").
+
+        With a StorageManager and investigation_id, the frontier is persisted
+        in the database and every page is stored as a SearchResult; calling
+        again with the same investigation resumes the crawl (pass url=None
+        to resume without adding seeds). Processes using distinct worker_ids
+        can crawl the same investigation concurrently.
         """
+        if depth is None:
+            depth = max(0, RECURSION_DEPTH - 1)
         if depth < 0:
-            return []
-            
-        content = self.fetch_page(url)
-        if not content:
-            return []
-            
-        start_data = [{"url": url, "content": content, "depth": depth}]
-        
-        if depth > 0:
-            soup = BeautifulSoup(content, 'html.parser')
-            links = [a['href'] for a in soup.find_all('a', href=True) if '.onion' in a['href']]
-            # Limit number of sub-links to avoid explosion?
-            
-            # Simple recursion
-            # Note: This can be exponential. In production, need a visited set shared across calls.
-            # For now, implementing shallow depth (depth=1 usually means just the page itself in some contexts, 
-            # but here let's say depth=1 means 'this page').
-            # If RECURSION_DEPTH is 1 (from config), we usually just want the search result page content.
-            pass
-            
-        return start_data
+            return
+        seeds = [] if url is None else [url] if isinstance(url, str) else list(url)
 
-    def scrape_direct(self, urls):
+        if storage is None:
+            yield from self.engine.iterate(
+                self._crawl_deep_async(seeds, depth, max_pages, per_host_pages)
+            )
+            return
+
+        storage.enqueue_urls(
+            investigation_id,
+            [canonicalize_url(self._normalize_target(seed)) for seed in seeds],
+            depth=0, per_host_limit=per_host_pages, max_entries=max_pages
+        )
+        yield from self.engine.iterate(
+            self._crawl_frontier_async(storage, investigation_id, depth, max_pages, per_host_pages, worker_id)
+        )
+
+    def crawl_deep(self, url, depth=None, max_pages=MAX_CRAWL_PAGES, per_host_pages=PER_HOST_PAGE_BUDGET,
+                   storage=None, investigation_id=None, worker_id="local"):
         """
-        Directly scans a list of URLs for forensic artifacts.
-        Extracts: Tech Stack, Headers, Comments, Crypto Wallets, and Content Hash.
+        Crawls a URL to the specified depth and returns every fetched page.
+        See iter_crawl_deep for the streaming and persistent variants.
         """
-        import hashlib
-        from bs4 import Comment
-        results = []
-        
-        # Crypto Regex Patterns
-        CRYPTO_REGEX = {
-            "BTC": r'\b(bc1|[13])[a-zA-HJ-NP-Z0-9]{25,39}\b',
-            "ETH": r'\b0x[a-fA-F0-9]{40}\b',
-            "XMR": r'\b4[0-9AB][1-9A-HJ-NP-Za-km-z]{93}\b'
+        return list(self.iter_crawl_deep(url, depth, max_pages, per_host_pages, storage, investigation_id, worker_id))
+
+    @staticmethod
+    def _normalize_target(url_input):
+        """
+        Turns a user-supplied target line into a fetchable URL.
+        Returns None for blank lines.
+        """
+        url_input = url_input.strip()
+        if not url_input: return None
+
+        # Simple heuristic: try to extract http[s]://...onion...
+        # If not found, assume it might be just text, but let's try to be smart.
+        match = re.search(r'(https?://[a-zA-Z0-9.-]+\.onion\S*)', url_input)
+        if match:
+            url = match.group(1)
+        else:
+            # If no http/https, maybe it's just domain.onion...
+            match_domain = re.search(r'([a-zA-Z0-9.-]+\.onion\S*)', url_input)
+            if match_domain:
+                url = "http://" + match_domain.group(1)
+            else:
+                url = url_input # Fallback
+
+        # Ensure protocol
+        if not url.startswith("http"): url = "http://" + url
+        return url
+
+    @staticmethod
+    def _describe_error(error):
+        """
+        Maps a fetch exception to an analyst-friendly snippet.
+        """
+        if isinstance(error, (asyncio.TimeoutError, ProxyTimeoutError)):
+            return "⏱️ Connection Timed Out."
+        if isinstance(error, (ProxyError, ProxyConnectionError, ConnectionError)):
+            return "⚠️ Connection Failed: Tor could not reach this site (Offline or Invalid)."
+        err_msg = str(error) or repr(error)
+        return f"⚠️ Error: {err_msg[:100]}..." # Truncate generic errors
+
+    def _alert_watchlist(self, source, hits):
+        """
+        Logs watchlist hits and alerts on each (selector, source) pair once.
+        """
+        fresh = [hit for hit in hits if (hit['selector'], source) not in self._alerted]
+        if not fresh:
+            return
+        self._alerted.update((hit['selector'], source) for hit in fresh)
+        logger.warning(f"Watchlist hit on {source}: {sorted({hit['selector'] for hit in fresh})}")
+        if self.alerts is not None:
+            self.alerts.send_watchlist_alert(source, fresh)
+
+    def _build_direct_result(self, url, resp):
+        """
+        Turns a fetched direct target into a forensic result dict.
+        Extracts: Tech Stack, Headers, Comments, Crypto Wallets, Watchlist Hits and Content Hash.
+        """
+        if resp['error'] is not None:
+            return {
+                "title": f"[ERROR] {url}",
+                "link": url,
+                "engine": "Direct",
+                "snippet": self._describe_error(resp['error']),
+                "tech_stack": "Error",
+                "hash": "Error",
+                "wallets": [],
+                "comments": []
+            }
+
+        # 1. Liveness & Latency
+        latency = resp['latency']
+
+        # 2. Tech Stack Fingerprinting (Headers)
+        headers = resp['headers']
+        server_sig = headers.get("Server", "Unknown")
+        powered_by = headers.get("X-Powered-By", "")
+        tech_stack = f"{server_sig} {powered_by}".strip()
+
+        # 3. Content Hashing (Change Detection), computed while streaming
+        content_hash = resp['md5']
+
+        if resp['status'] != 200:
+            return {
+                "title": f"[OFFLINE {resp['status']}] {url}",
+                "link": url,
+                "engine": "Direct",
+                "snippet": "Site is offline.",
+                "tech_stack": "N/A",
+                "hash": "N/A",
+                "wallets": [],
+                "comments": []
+            }
+
+        if resp['skipped']:
+            return {
+                "title": f"[LIVE {latency}s] {url}",
+                "link": url,
+                "engine": "Direct",
+                "snippet": f"📦 Not downloaded: {resp['skipped']}.",
+                "tech_stack": tech_stack,
+                "hash": "N/A",
+                "wallets": [],
+                "comments": []
+            }
+
+        # Truncated bodies are parsed as far as they go
+        soup = BeautifulSoup(resp['text'], 'html.parser')
+        title = soup.title.string.strip() if soup.title and soup.title.string else url
+        text = soup.get_text()
+
+        # 4. "Ghost Text" (HTML Comments)
+        comments = soup.find_all(string=lambda text: isinstance(text, Comment))
+        ghost_text = [c.strip() for c in comments if len(c.strip()) > 5] # Filter short noise
+
+        # 5. Crypto Extraction
+        wallets = []
+        for c_type, pattern in CRYPTO_REGEX.items():
+            found = list(set(re.findall(pattern, text)))
+            for f in found:
+                # Checksum-validated: drops look-alike tokens
+                if score_artifact(CRYPTO_TYPES[c_type], f) >= ARTIFACT_MIN_CONFIDENCE:
+                    wallets.append(f"{c_type}: {f}")
+
+        # 6. Watchlist selectors, one pass for all of them
+        watch_hits = self.watchlist.scan(text)
+
+        # 7. Extract Forms (Existing)
+        forms = []
+        for f in soup.find_all("form"):
+            method = f.get("method", "get").upper()
+            inputs = [i.get("name") for i in f.find_all("input") if i.get("name")]
+            forms.append(f"{method} Form: {inputs}")
+
+        # Construct Snippet
+        snippet_parts = []
+        if watch_hits: snippet_parts.append(f"🎯 Watchlist: {len({h['selector'] for h in watch_hits})}")
+        if wallets: snippet_parts.append(f"💰 Wallets: {len(wallets)}")
+        if ghost_text: snippet_parts.append(f"👻 Hidden Comments: {len(ghost_text)}")
+        if forms: snippet_parts.append(f"🔑 Forms: {len(forms)}")
+        if resp['truncated']: snippet_parts.append(f"✂️ Truncated at {resp['size'] // 1024} KB")
+        snippet_parts.append(text[:200].replace("\n", " "))
+
+        return {
+            "title": f"[LIVE {latency}s{' cached' if resp.get('from_cache') else ''}] {title}",
+            "link": url,
+            "engine": "Direct",
+            "snippet": " | ".join(snippet_parts),
+            "tech_stack": tech_stack,
+            "hash": content_hash,
+            "sha256": resp['sha256'],
+            "truncated": resp['truncated'],
+            "wallets": wallets,
+            "comments": ghost_text,
+            "watchlist": watch_hits
         }
-        
-        def process_url(url_input):
-            url_input = url_input.strip()
-            if not url_input: return None
-            
-            # Simple heuristic: try to extract http[s]://...onion...
-            # If not found, assume it might be just text, but let's try to be smart.
-            match = re.search(r'(https?://[a-zA-Z0-9.-]+\.onion\S*)', url_input)
-            if match:
-                url = match.group(1)
+
+    @staticmethod
+    def _skipped_result(url, record):
+        return {
+            "title": f"[SKIPPED DEAD] {url}",
+            "link": url,
+            "engine": "Direct",
+            "snippet": f"💤 Skipped: known dead ({LivenessTracker.describe(record)}).",
+            "tech_stack": "N/A",
+            "hash": "N/A",
+            "wallets": [],
+            "comments": [],
+            "liveness": SKIP
+        }
+
+    async def _scrape_direct_async(self, urls):
+        targets = list(dict.fromkeys(u for u in (self._normalize_target(u) for u in urls) if u))
+        hosts = {url: urlparse(url).hostname for url in targets}
+        plan = await asyncio.to_thread(self.liveness.plan, list(set(hosts.values())))
+
+        async def run(url):
+            action = plan[hosts[url]]['action']
+            if action == PROBE:
+                # Suspected dead: one short attempt instead of the full timeout + retries
+                resp = await self.engine.fetch(url, timeout=self.liveness.probe_timeout, retries=0)
+            elif self.hedge:
+                resp = await self.engine.fetch_hedged(url, timeout=DIRECT_TIMEOUT)
             else:
-                # If no http/https, maybe it's just domain.onion...
-                match_domain = re.search(r'([a-zA-Z0-9.-]+\.onion\S*)', url_input)
-                if match_domain:
-                    url = "http://" + match_domain.group(1)
-                else:
-                    url = url_input # Fallback
-            
-            # Ensure protocol
-            if not url.startswith("http"): url = "http://" + url
-            
-            try:
-                # 1. Check Liveness & Latency
-                session = self.tor_handler.get_session()
-                start_time = time.time()
-                resp = session.get(url, timeout=30)
-                latency = round((time.time() - start_time), 2)
-                
-                # 2. Tech Stack Fingerprinting (Headers)
-                headers = resp.headers
-                server_sig = headers.get("Server", "Unknown")
-                powered_by = headers.get("X-Powered-By", "")
-                tech_stack = f"{server_sig} {powered_by}".strip()
-                
-                # 3. Content Hashing (Change Detection)
-                content_hash = hashlib.md5(resp.content).hexdigest()
-                
-                if resp.status_code == 200:
-                    soup = BeautifulSoup(resp.text, 'html.parser')
-                    title = soup.title.string.strip() if soup.title else url
-                    text = soup.get_text()
-                    
-                    # 4. "Ghost Text" (HTML Comments)
-                    comments = soup.find_all(string=lambda text: isinstance(text, Comment))
-                    ghost_text = [c.strip() for c in comments if len(c.strip()) > 5] # Filter short noise
-                    
-                    # 5. Crypto Extraction
-                    wallets = []
-                    for c_type, pattern in CRYPTO_REGEX.items():
-                        found = list(set(re.findall(pattern, text)))
-                        for f in found:
-                            wallets.append(f"{c_type}: {f}")
-                            
-                    # 6. Extract Forms (Existing)
-                    forms = []
-                    for f in soup.find_all("form"):
-                        method = f.get("method", "get").upper()
-                        inputs = [i.get("name") for i in f.find_all("input") if i.get("name")]
-                        forms.append(f"{method} Form: {inputs}")
-                    
-                    # Construct Snippet
-                    snippet_parts = []
-                    if wallets: snippet_parts.append(f"💰 Wallets: {len(wallets)}")
-                    if ghost_text: snippet_parts.append(f"👻 Hidden Comments: {len(ghost_text)}")
-                    if forms: snippet_parts.append(f"🔑 Forms: {len(forms)}")
-                    snippet_parts.append(text[:200].replace("\n", " "))
-                    
-                    return {
-                        "title": f"[LIVE {latency}s] {title}",
-                        "link": url,
-                        "engine": "Direct",
-                        "snippet": " | ".join(snippet_parts),
-                        "tech_stack": tech_stack,
-                        "hash": content_hash,
-                        "wallets": wallets,
-                        "comments": ghost_text
-                    }
-                else:
-                    return {
-                        "title": f"[OFFLINE {resp.status_code}] {url}",
-                        "link": url,
-                        "engine": "Direct",
-                        "snippet": "Site is offline.",
-                        "tech_stack": "N/A",
-                        "hash": "N/A",
-                        "wallets": [],
-                        "comments": []
-                    }
-            except Exception as e:
-                # Sanitize error message
-                err_msg = str(e)
-                if "SOCKSHTTPConnectionPool" in err_msg or "NewConnectionError" in err_msg:
-                    snippet = "⚠️ Connection Failed: Tor could not reach this site (Offline or Invalid)."
-                elif "ReadTimeout" in err_msg or "ConnectTimeout" in err_msg:
-                    snippet = "⏱️ Connection Timed Out."
-                else:
-                    snippet = f"⚠️ Error: {err_msg[:100]}..." # Truncate generic errors
-
-                return {
-                    "title": f"[ERROR] {url}",
-                    "link": url,
-                    "engine": "Direct",
-                    "snippet": snippet,
-                    "tech_stack": "Error",
-                    "hash": "Error",
-                    "wallets": [],
-                    "comments": []
-                }
-
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            futures = [executor.submit(process_url, u) for u in urls]
-            for future in as_completed(futures):
-                if res := future.result():
-                    results.append(res)
+                resp = await self.engine.fetch(url, timeout=DIRECT_TIMEOUT)
+            return url, action, resp
+
+        results = []
+        outcomes = []
+        to_fetch = []
+        for url in targets:
+            decision = plan[hosts[url]]
+            if decision['action'] == SKIP:
+                results.append(self._skipped_result(url, decision['record']))
+            else:
+                to_fetch.append(url)
+        # Targets beyond the first wave of fetches find their descriptors warm
+        self._warm_descriptors(to_fetch)
+
+        for next_done in asyncio.as_completed([run(url) for url in to_fetch]):
+            url, action, resp = await next_done
+            if not resp.get('from_cache'):
+                outcomes.append((hosts[url], resp['error']))
+            # Parsing and scanning a large page would stall every other fetch on the loop
+            result = await asyncio.to_thread(self._build_direct_result, url, resp)
+            result['liveness'] = action
+            if result.get('watchlist'):
+                await asyncio.to_thread(self._alert_watchlist, url, result['watchlist'])
+            results.append(result)
+
+        await asyncio.to_thread(self.liveness.record, outcomes)
         return results
 
+    def scrape_direct(self, urls):
+        """
+        Directly scans a list of URLs for forensic artifacts.
+        All targets are fetched concurrently on the async engine; hosts known
+        to be dead are skipped or probed cheaply (see core/liveness.py), and
+        each result's 'liveness' key records that decision.
+        """
+        return self.engine.run(self._scrape_direct_async(urls))
+
     def _deduplicate(self, results):
         """
         Deduplicates results based on URL link.
@@ -305,24 +703,12 @@ class Crawler:
         # 5. Dating
         queries.append(f"{sel} (dating OR match OR tinder OR bumble OR profile OR \"looking for\") site:onion")
                 
-        # Deduplicate
-        queries = list(set(queries))
+        # Deduplicate (the scheduler also collapses duplicate (query, engine) pairs)
+        queries = list(dict.fromkeys(self._enforce_onion(q) for q in queries))
         logger.info(f"Generated {len(queries)} person-search dorks for '{query}': {queries}")
         
-        # Execute Searches
-        all_results = []
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            future_to_query = {executor.submit(self.search, q): q for q in queries}
-            for future in as_completed(future_to_query):
-                q = future_to_query[future]
-                try:
-                    res = future.result()
-                    for r in res: r['context_query'] = q
-                    all_results.extend(res)
-                except Exception as e:
-                    logger.error(f"Dork '{q}' failed: {e}")
-                    
-        return self._deduplicate(all_results)
+        # Execute every (dork, engine) pair through one scheduler
+        return self.engine.run(self._search_many_async(queries))
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
@@ -0,0 +1,248 @@
+import json
+import logging
+import re
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+try:
+    from config import (REQUEST_TIMEOUT, ENGINE_HEALTH_WINDOW, ENGINE_FAILURE_THRESHOLD,
+                          ENGINE_COOLDOWN, ENGINE_MAX_COOLDOWN, ENGINE_MIN_TIMEOUT)
+except ImportError:
+    REQUEST_TIMEOUT = 45
+    ENGINE_HEALTH_WINDOW = 20
+    ENGINE_FAILURE_THRESHOLD = 3
+    ENGINE_COOLDOWN = 300
+    ENGINE_MAX_COOLDOWN = 3600
+    ENGINE_MIN_TIMEOUT = 10
+
+logger = logging.getLogger(__name__)
+
+# Circuit breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+# Engines whose address can never work (e.g. v2 onions, unsupported since Tor 0.4.6)
+DISABLED = "disabled"
+
+# Samples needed before timeouts are derived from latency percentiles
+MIN_SAMPLES = 5
+# Adaptive timeout = p95 latency x this factor
+TIMEOUT_FACTOR = 2.0
+# Error rate over the window that opens the circuit
+MAX_ERROR_RATE = 0.5
+
+V2_ONION_RE = re.compile(r'^[a-z2-7]{16}\.onion$')
+
+
+class EngineUnavailable(Exception):
+    """
+    Raised instead of querying an engine whose circuit is open.
+    """
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers (None if empty).
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def is_v2_onion(url):
+    return bool(V2_ONION_RE.match(urlparse(url).hostname or ""))
+
+
+class EngineHealthTracker:
+    """
+    Per-search-engine health: rolling latency and error rate, a circuit
+    breaker, and request timeouts derived from observed latency.
+
+    After failure_threshold consecutive failures (or a majority of failures
+    over the window) the circuit opens and the engine is skipped for a
+    cooldown that doubles on every re-trip. Once it expires the engine is
+    half-open: a single trial request decides whether it closes again.
+    State is persisted through the StorageManager so it survives restarts.
+    """
+    def __init__(self, storage=None, window=ENGINE_HEALTH_WINDOW, failure_threshold=ENGINE_FAILURE_THRESHOLD,
+                 cooldown=ENGINE_COOLDOWN, max_cooldown=ENGINE_MAX_COOLDOWN,
+                 min_timeout=ENGINE_MIN_TIMEOUT, max_timeout=REQUEST_TIMEOUT):
+        self.storage = storage
+        self.window = window
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self._lock = threading.Lock()
+        self._engines = {}
+        self._dirty = set()
+        self._trials = set()
+        if storage is not None:
+            for name, record in storage.get_engine_health().items():
+                self._engines[name] = self._from_record(record)
+
+    def _from_record(self, record):
+        samples = json.loads(record.get("samples") or "[]")
+        return {
+            "state": record.get("state") or CLOSED,
+            "samples": deque((tuple(s) for s in samples), maxlen=self.window),
+            "consecutive_failures": record.get("consecutive_failures") or 0,
+            "trips": record.get("trips") or 0,
+            "opened_until": record.get("opened_until") or 0.0,
+            "last_error": record.get("last_error"),
+            "last_success": record.get("last_success"),
+        }
+
+    def _engine(self, name):
+        engine = self._engines.get(name)
+        if engine is None:
+            engine = self._engines[name] = self._from_record({})
+        return engine
+
+    def register(self, engines):
+        """
+        Marks engines whose URL can never resolve as permanently disabled.
+        """
+        with self._lock:
+            for engine in engines:
+                state = self._engine(engine['name'])
+                if is_v2_onion(engine['url']):
+                    if state["state"] != DISABLED:
+                        state.update(state=DISABLED, last_error="v2 onion address (no longer supported by Tor)")
+                        self._dirty.add(engine['name'])
+                elif state["state"] == DISABLED:
+                    # Address was updated in config
+                    state.update(state=CLOSED, last_error=None)
+                    self._dirty.add(engine['name'])
+
+    def allow(self, name):
+        """
+        Whether a request to the engine may be sent now. Moves an expired
+        open circuit to half-open and admits exactly one trial request.
+        """
+        with self._lock:
+            engine = self._engine(name)
+            if engine["state"] == DISABLED:
+                return False
+            if engine["state"] == OPEN:
+                if time.time() < engine["opened_until"]:
+                    return False
+                engine["state"] = HALF_OPEN
+                self._dirty.add(name)
+            if engine["state"] == HALF_OPEN:
+                if name in self._trials:
+                    return False
+                self._trials.add(name)
+            return True
+
+    def is_trial(self, name):
+        with self._lock:
+            return name in self._trials
+
+    def end_trial(self, name):
+        """
+        Releases a half-open trial slot without recording an outcome.
+        """
+        with self._lock:
+            self._trials.discard(name)
+
+    def timeout_for(self, name):
+        """
+        Request timeout for the engine: p95 of recent successful latencies
+        times TIMEOUT_FACTOR, clamped to [min_timeout, max_timeout]. Trials
+        on a half-open circuit use min_timeout.
+        """
+        with self._lock:
+            engine = self._engine(name)
+            if name in self._trials:
+                return self.min_timeout
+            latencies = [latency for ok, latency in engine["samples"] if ok]
+        if len(latencies) < MIN_SAMPLES:
+            return self.max_timeout
+        return max(self.min_timeout, min(self.max_timeout, percentile(latencies, 95) * TIMEOUT_FACTOR))
+
+    def hedge_delay(self, name):
+        """
+        The engine's p90 latency, after which a request is worth hedging
+        (None until MIN_SAMPLES successes were seen).
+        """
+        with self._lock:
+            latencies = [latency for ok, latency in self._engine(name)["samples"] if ok]
+        if len(latencies) < MIN_SAMPLES:
+            return None
+        return percentile(latencies, 90)
+
+    def record(self, name, ok, latency, error=None):
+        """
+        Records the outcome of one request and updates the circuit.
+        """
+        with self._lock:
+            engine = self._engine(name)
+            self._trials.discard(name)
+            engine["samples"].append((bool(ok), round(latency or 0.0, 2)))
+            self._dirty.add(name)
+            if ok:
+                if engine["state"] != CLOSED:
+                    logger.info(f"Engine {name} recovered, closing circuit.")
+                engine.update(state=CLOSED, consecutive_failures=0, trips=0, last_success=time.time())
+                return
+
+            engine["consecutive_failures"] += 1
+            engine["last_error"] = (str(error) or repr(error))[:200] if error else "failed"
+            outcomes = [ok for ok, _ in engine["samples"]]
+            error_rate = outcomes.count(False) / len(outcomes)
+            if (engine["state"] == HALF_OPEN
+                    or engine["consecutive_failures"] >= self.failure_threshold
+                    or (len(outcomes) >= MIN_SAMPLES and error_rate >= MAX_ERROR_RATE)):
+                engine["trips"] += 1
+                cooldown = min(self.cooldown * 2 ** (engine["trips"] - 1), self.max_cooldown)
+                engine.update(state=OPEN, opened_until=time.time() + cooldown)
+                logger.warning(f"Engine {name} circuit open for {cooldown}s: {engine['last_error']}")
+
+    def snapshot(self):
+        """
+        Per-engine health summary for logs and the UI.
+        """
+        with self._lock:
+            rows = []
+            for name, engine in sorted(self._engines.items()):
+                samples = list(engine["samples"])
+                latencies = [latency for ok, latency in samples if ok]
+                errors = sum(1 for ok, _ in samples if not ok)
+                rows.append({
+                    "engine": name,
+                    "state": engine["state"],
+                    "error_rate": round(errors / len(samples), 2) if samples else None,
+                    "p50": percentile(latencies, 50),
+                    "p90": percentile(latencies, 90),
+                    "retry_in": max(0, int(engine["opened_until"] - time.time())) if engine["state"] == OPEN else 0,
+                    "last_error": engine["last_error"],
+                })
+        for row in rows:
+            row["timeout"] = round(self.timeout_for(row["engine"]), 1)
+        return rows
+
+    def flush(self):
+        """
+        Persists engines changed since the last flush.
+        """
+        if self.storage is None:
+            return
+        with self._lock:
+            records = [{
+                "name": name,
+                "state": self._engines[name]["state"],
+                "samples": json.dumps(list(self._engines[name]["samples"])),
+                "consecutive_failures": self._engines[name]["consecutive_failures"],
+                "trips": self._engines[name]["trips"],
+                "opened_until": self._engines[name]["opened_until"],
+                "last_error": self._engines[name]["last_error"],
+                "last_success": self._engines[name]["last_success"],
+            } for name in self._dirty]
+            self._dirty.clear()
+        self.storage.update_engine_health(records)
@@ -0,0 +1,174 @@
+import logging
+import re
+from urllib.parse import urlparse, parse_qs
+
+from lxml import etree, html as lxml_html
+
+logger = logging.getLogger(__name__)
+
+# Onion v3 (56 chars) or v2 (16 chars) root URL
+ONION_URL_RE = re.compile(r'(https?://[a-z2-7]{16,56}\.onion)')
+# lxml refuses str input that carries an XML encoding declaration (XHTML pages)
+XML_DECLARATION_RE = re.compile(r'^\s*<\?xml[^>]*\?>')
+
+# Engine name -> extractor(doc) returning [{"title", "link", "snippet"}]
+EXTRACTORS = {}
+
+
+def register_extractor(*engine_names):
+    """
+    Registers a result extractor for one or more engines in SEARCH_ENGINES.
+    """
+    def decorator(func):
+        for name in engine_names:
+            EXTRACTORS[name] = func
+        return func
+    return decorator
+
+
+def parse_html(html):
+    """
+    Parses HTML with lxml. Returns None for empty or unparseable input.
+    """
+    if not html or not html.strip():
+        return None
+    # The text is already decoded, so the declared encoding is moot
+    html = XML_DECLARATION_RE.sub("", html, count=1)
+    try:
+        return lxml_html.fromstring(html)
+    except (etree.ParserError, ValueError) as e:
+        logger.debug(f"Unparseable HTML: {e}")
+        return None
+
+
+def clean_text(element):
+    """
+    Whitespace-normalised text content of an element (or "" for None).
+    """
+    if element is None:
+        return ""
+    return " ".join(element.text_content().split())
+
+
+def onion_link(href):
+    """
+    Extracts the onion root URL from an href, unwrapping redirect links
+    (e.g. Ahmia's ?redirect_url=...). Returns None if there is no onion.
+    """
+    if not href:
+        return None
+    # The redirect target first: an absolute redirect href starts with the engine's own onion
+    for values in parse_qs(urlparse(href).query).values():
+        for value in values:
+            match = ONION_URL_RE.search(value)
+            if match:
+                return match.group(1)
+    match = ONION_URL_RE.search(href)
+    return match.group(1) if match else None
+
+
+def _first(element, xpath):
+    found = element.xpath(xpath)
+    return found[0] if found else None
+
+
+def _block_results(doc, block_xpath, link_xpath, snippet_xpath):
+    """
+    Shared shape of most engines: one container per hit holding a title link
+    and a description element.
+    """
+    results = []
+    for block in doc.xpath(block_xpath):
+        anchor = _first(block, link_xpath)
+        if anchor is None:
+            continue
+        link = onion_link(anchor.get('href'))
+        if not link:
+            # Some engines show the real URL as text next to a tracking link
+            link = onion_link(block.text_content())
+        title = clean_text(anchor)
+        if not link or len(title) <= 3:
+            continue
+        results.append({
+            "title": title,
+            "link": link,
+            "snippet": clean_text(_first(block, snippet_xpath))
+        })
+    return results
+
+
+@register_extractor("Ahmia")
+def extract_ahmia(doc):
+    return _block_results(
+        doc,
+        "//li[contains(concat(' ', normalize-space(@class), ' '), ' result ')]",
+        ".//h4/a[@href]",
+        ".//p"
+    )
+
+
+@register_extractor("Haystak")
+def extract_haystak(doc):
+    return _block_results(
+        doc,
+        "//div[contains(concat(' ', normalize-space(@class), ' '), ' result ')]",
+        ".//a[contains(@href, '.onion')]",
+        ".//p"
+    )
+
+
+@register_extractor("OnionLand")
+def extract_onionland(doc):
+    return _block_results(
+        doc,
+        "//div[contains(@class, 'result-block')]",
+        ".//div[contains(@class, 'title')]//a[@href]",
+        ".//div[contains(@class, 'desc')]"
+    )
+
+
+def extract_generic(doc):
+    """
+    Fallback heuristic for any engine: every anchor pointing at an onion
+    with meaningful text. The snippet is the surrounding block's text.
+    """
+    results = []
+    for a in doc.xpath('//a[@href]'):
+        href = a.get('href')
+        if '.onion' not in href:
+            continue
+        text = clean_text(a)
+        if len(text) <= 3:
+            continue
+        link = onion_link(href)
+        if not link:
+            continue
+        snippet = ""
+        parent = a.getparent()
+        if parent is not None:
+            snippet = clean_text(parent).replace(text, "", 1).strip()[:300]
+        results.append({"title": text, "link": link, "snippet": snippet})
+    return results
+
+
+def extract_results(html, engine_name):
+    """
+    Parses a search engine result page in one pass with the engine's
+    registered extractor, falling back to the generic heuristic when the
+    engine is unknown or its layout did not match.
+    """
+    doc = parse_html(html)
+    if doc is None:
+        return []
+    extractor = EXTRACTORS.get(engine_name)
+    results = []
+    if extractor:
+        try:
+            results = extractor(doc)
+        except Exception as e:
+            logger.error(f"{engine_name} extractor failed, using generic parser: {e}")
+    if not results:
+        results = extract_generic(doc)
+    for res in results:
+        res["engine"] = engine_name
+    return results
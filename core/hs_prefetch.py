@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+from stem import HSDescAction
+from stem.control import EventType
+
+try:
+    from config import HS_PREFETCH_CONCURRENCY, HS_PREFETCH_QUEUE, HS_PREFETCH_TTL
+except ImportError:
+    HS_PREFETCH_CONCURRENCY = 8
+    HS_PREFETCH_QUEUE = 200
+    HS_PREFETCH_TTL = 600
+
+logger = logging.getLogger(__name__)
+
+# Seconds after which an unanswered HSFETCH stops holding a slot
+IN_FLIGHT_TIMEOUT = 60
+
+
+def onion_address(url):
+    """
+    The v3 onion address (without '.onion') of a URL or host, else None.
+    """
+    host = urlparse(url).hostname if "://" in url else url.lower()
+    if not host or not host.endswith(".onion"):
+        return None
+    address = host[:-len(".onion")].split(".")[-1]
+    return address if len(address) == 56 else None
+
+
+class DescriptorPrefetcher:
+    """
+    Warms hidden service descriptors for upcoming targets with HSFETCH, so
+    that by the time a target is fetched Tor already knows how to reach it.
+
+    Requests go out over the circuit manager's persistent controller (the
+    prefetcher is inactive without one). At most max_in_flight HSFETCHes are
+    outstanding; HS_DESC events free their slots. The backlog is capped at
+    max_queue addresses and addresses warmed within ttl seconds are skipped.
+    """
+    def __init__(self, tor_handler, max_in_flight=HS_PREFETCH_CONCURRENCY, max_queue=HS_PREFETCH_QUEUE,
+                 ttl=HS_PREFETCH_TTL):
+        self.tor_handler = tor_handler
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.ttl = ttl
+        self.stats = {"requested": 0, "received": 0, "failed": 0, "dropped": 0}
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._queue = deque()
+        self._queued = set()
+        self._in_flight = {}  # address -> sent at
+        self._warmed = {}     # address -> received at
+        self._controller = None
+        self._thread = None
+
+    @property
+    def active(self):
+        return self.max_in_flight > 0 and self.tor_handler.controller is not None
+
+    def _attach(self):
+        controller = self.tor_handler.controller
+        if controller is not None and controller is not self._controller:
+            controller.add_event_listener(self._on_descriptor, EventType.HS_DESC)
+            self._controller = controller
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="erebus-hs-prefetch", daemon=True)
+            self._thread.start()
+        return self._controller
+
+    def prefetch(self, urls):
+        """
+        Queues the onion services behind urls for descriptor warm-up, in
+        order. Returns immediately; the HSFETCHes are sent in the background.
+        """
+        if not self.active or self._attach() is None:
+            return 0
+        now = time.time()
+        queued = 0
+        with self._lock:
+            for url in urls:
+                address = onion_address(url)
+                if (not address or address in self._queued or address in self._in_flight
+                        or now - self._warmed.get(address, 0) < self.ttl):
+                    continue
+                if len(self._queue) >= self.max_queue:
+                    self.stats["dropped"] += 1
+                    continue
+                self._queue.append(address)
+                self._queued.add(address)
+                queued += 1
+        if queued:
+            self._wake.set()
+        return queued
+
+    def _run(self):
+        while True:
+            self._wake.wait(IN_FLIGHT_TIMEOUT)
+            self._wake.clear()
+            try:
+                self._dispatch()
+            except Exception as e:
+                logger.debug(f"Descriptor prefetch dispatch failed: {e}")
+
+    def _dispatch(self):
+        now = time.time()
+        with self._lock:
+            for address, sent_at in list(self._in_flight.items()):
+                if now - sent_at > IN_FLIGHT_TIMEOUT:
+                    del self._in_flight[address]
+            for address, warmed_at in list(self._warmed.items()):
+                if now - warmed_at >= self.ttl:
+                    del self._warmed[address]
+            batch = []
+            while self._queue and len(self._in_flight) < self.max_in_flight:
+                address = self._queue.popleft()
+                self._queued.discard(address)
+                batch.append(address)
+                self._in_flight[address] = now
+        controller = self._controller
+        for address in batch:
+            try:
+                controller.get_hidden_service_descriptor(address, await_result=False)
+                self.stats["requested"] += 1
+            except Exception as e:
+                logger.debug(f"HSFETCH {address} failed: {e}")
+                with self._lock:
+                    self._in_flight.pop(address, None)
+                    self.stats["failed"] += 1
+
+    def _on_descriptor(self, event):
+        # Runs on stem's event thread: only bookkeeping here, dispatch happens on ours
+        if event.action not in (HSDescAction.RECEIVED, HSDescAction.FAILED):
+            return
+        with self._lock:
+            if self._in_flight.pop(event.address, None) is None:
+                return
+            if event.action == HSDescAction.RECEIVED:
+                self._warmed[event.address] = time.time()
+                self.stats["received"] += 1
+            else:
+                self.stats["failed"] += 1
+        self._wake.set()
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from aiohttp_socks import ProxyError, ProxyConnectionError, ProxyTimeoutError
+
+try:
+    from config import LIVENESS_BASE_BACKOFF, LIVENESS_MAX_BACKOFF, LIVENESS_PROBE_TIMEOUT
+except ImportError:
+    LIVENESS_BASE_BACKOFF = 600
+    LIVENESS_MAX_BACKOFF = 24 * 3600
+    LIVENESS_PROBE_TIMEOUT = 10
+
+logger = logging.getLogger(__name__)
+
+# SOCKS5 reply codes sent by Tor. The 0xF* codes need "ExtendedErrors" on the SocksPort.
+SOCKS_FAILURE_CLASSES = {
+    0x01: "general_failure",
+    0x03: "host_unreachable",
+    0x04: "host_unreachable",
+    0x05: "connect_refused",
+    0x06: "timeout",
+    0xF0: "hs_descriptor_not_found",
+    0xF1: "hs_descriptor_invalid",
+    0xF2: "hs_intro_failed",
+    0xF3: "hs_rendezvous_failed",
+    0xF4: "hs_auth_required",
+    0xF5: "hs_auth_required",
+    0xF6: "bad_address",
+    0xF7: "hs_intro_timeout",
+}
+
+# Liveness decisions for a target
+FETCH = "fetch"
+PROBE = "probe"
+SKIP = "skip"
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def classify_failure(error):
+    """
+    Maps a fetch exception to a failure class. Returns None when the failure
+    says nothing about the target (e.g. the local Tor proxy is down).
+    """
+    if isinstance(error, ProxyError):
+        return SOCKS_FAILURE_CLASSES.get(getattr(error, "error_code", None), "proxy_error")
+    if isinstance(error, (asyncio.TimeoutError, ProxyTimeoutError)):
+        return "timeout"
+    if isinstance(error, ProxyConnectionError):
+        return None
+    return "other"
+
+
+class LivenessTracker:
+    """
+    Negative cache of dead or unreachable hosts, persisted in the database.
+
+    Hosts that failed are skipped until their back-off expires (doubling with
+    every consecutive failure, up to max_backoff); after that they get one
+    cheap probe with a short timeout and no retries instead of a full fetch.
+    """
+    def __init__(self, storage, base_backoff=LIVENESS_BASE_BACKOFF, max_backoff=LIVENESS_MAX_BACKOFF,
+                 probe_timeout=LIVENESS_PROBE_TIMEOUT):
+        self.storage = storage
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.probe_timeout = probe_timeout
+
+    def plan(self, hosts):
+        """
+        Decides, per host, whether to fetch, probe or skip it.
+        Returns {host: {"action": ..., "record": liveness dict or None}}.
+        """
+        records = self.storage.get_host_liveness(hosts)
+        now = _utcnow()
+        plan = {}
+        for host in hosts:
+            record = records.get(host)
+            if not record or not record["consecutive_failures"]:
+                action = FETCH
+            elif record["next_probe_at"] and record["next_probe_at"] > now:
+                action = SKIP
+            else:
+                action = PROBE
+            plan[host] = {"action": action, "record": record}
+        return plan
+
+    def record(self, outcomes):
+        """
+        Persists fetch outcomes. outcomes: iterable of (host, error) where
+        error is None for any HTTP response (the host answered). Several
+        URLs on one host count once: the host is alive if any of them
+        answered, otherwise it gains a single consecutive failure.
+        """
+        now = _utcnow()
+        # One verdict per host and run: alive if any URL answered, else one failure
+        by_host = {}
+        for host, error in outcomes:
+            if host:
+                by_host.setdefault(host, []).append(error)
+        previous = self.storage.get_host_liveness(list(by_host))
+        updates = []
+        for host, errors in by_host.items():
+            record = dict(previous.get(host) or {"host": host, "consecutive_failures": 0}, last_checked=now)
+            if any(error is None for error in errors):
+                record.update(status="alive", failure_class=None, consecutive_failures=0,
+                              last_error=None, last_seen_alive=now, next_probe_at=None)
+            else:
+                classified = [(classify_failure(error), error) for error in errors]
+                classified = [(failure_class, error) for failure_class, error in classified if failure_class]
+                if not classified:
+                    continue
+                failure_class, error = classified[0]
+                failures = (record.get("consecutive_failures") or 0) + 1
+                backoff = min(self.base_backoff * 2 ** (failures - 1), self.max_backoff)
+                record.update(status="dead", failure_class=failure_class, consecutive_failures=failures,
+                              last_error=(str(error) or repr(error))[:300],
+                              next_probe_at=now + timedelta(seconds=backoff))
+            updates.append(record)
+        self.storage.update_host_liveness(updates)
+
+    @staticmethod
+    def describe(record):
+        """
+        Short human-readable reason for a skip decision.
+        """
+        if not record:
+            return ""
+        retry_in = ""
+        if record.get("next_probe_at"):
+            minutes = max(0, int((record["next_probe_at"] - _utcnow()).total_seconds() // 60))
+            retry_in = f", next probe in {minutes} min"
+        return f"{record.get('failure_class')} x{record.get('consecutive_failures')}{retry_in}"
@@ -2,7 +2,7 @@ import logging
 import json
 import ollama
 try:
-    from ..config import OLLAMA_BASE_URL, OLLAMA_MODEL
+    from config import OLLAMA_BASE_URL, OLLAMA_MODEL
 except ImportError:
     OLLAMA_BASE_URL = "http://localhost:11434"
     OLLAMA_MODEL = "llama3"
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import time
+
+from .engine_health import EngineHealthTracker, EngineUnavailable
+
+try:
+    from config import ENGINE_CONCURRENCY, ENGINE_RATE_LIMIT
+except ImportError:
+    ENGINE_CONCURRENCY = 2
+    ENGINE_RATE_LIMIT = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query):
+    """
+    Collapses whitespace so trivially different dorks map to one request.
+    """
+    return " ".join((query or "").split())
+
+
+class SearchScheduler:
+    """
+    Runs (query, engine) pairs on the crawl engine as one task set.
+
+    Every engine gets its own concurrency cap and request rate, so a slow or
+    hammered engine only delays its own queue. Duplicate pairs are collapsed
+    before anything is sent and results are de-duplicated across the run as
+    they stream back. Engines with an open circuit breaker are skipped at
+    once and the rest run with timeouts derived from their own latency.
+    """
+    def __init__(self, crawler, per_engine=ENGINE_CONCURRENCY, rate_limit=ENGINE_RATE_LIMIT, health=None):
+        self.crawler = crawler
+        self.health = health or EngineHealthTracker()
+        self.per_engine = max(1, per_engine)
+        self.min_interval = 1.0 / rate_limit if rate_limit and rate_limit > 0 else 0.0
+        # Created lazily on the engine loop; kept across runs so limits hold
+        # for every search issued through the same Crawler.
+        self._engine_sems = {}
+        self._next_slot = {}
+
+    def _engine_sem(self, name):
+        sem = self._engine_sems.get(name)
+        if sem is None:
+            sem = self._engine_sems[name] = asyncio.Semaphore(self.per_engine)
+        return sem
+
+    async def _throttle(self, name):
+        if not self.min_interval:
+            return
+        now = time.monotonic()
+        start = max(now, self._next_slot.get(name, now))
+        self._next_slot[name] = start + self.min_interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def _run_pair(self, query, engine):
+        name = engine['name']
+        async with self._engine_sem(name):
+            if not self.health.allow(name):
+                return query, engine, [], EngineUnavailable(f"{name} circuit open")
+            trial = self.health.is_trial(name)
+            try:
+                await self._throttle(name)
+                try:
+                    # A half-open trial must reach the engine: a cached page proves nothing
+                    results, resp = await self.crawler._search_engine_async(
+                        engine, query, timeout=self.health.timeout_for(name), retries=0 if trial else None,
+                        hedge_after=None if trial else self.health.hedge_delay(name), use_cache=not trial
+                    )
+                except Exception as e:
+                    logger.error(f"Engine {name} failed for '{query}': {e}")
+                    self.health.record(name, False, 0.0, e)
+                    return query, engine, [], e
+                error = resp['error']
+                if error is None and resp['status'] != 200:
+                    error = RuntimeError(f"{name} returned HTTP {resp['status']}")
+                if not resp.get('from_cache'):
+                    self.health.record(name, error is None, resp['latency'], error)
+                return query, engine, results, error
+            finally:
+                if trial:
+                    # Cancelled (early close, --limit) before an outcome was recorded:
+                    # free the slot so a later run can send the trial again
+                    self.health.end_trial(name)
+
+    @staticmethod
+    def expand(queries, engines):
+        """
+        Expands queries x engines into unique (query, engine) pairs.
+        """
+        pairs = {}
+        for query in queries:
+            query = normalize_query(query)
+            if not query:
+                continue
+            for engine in engines:
+                pairs.setdefault((query, engine['name']), (query, engine))
+        return list(pairs.values())
+
+    async def run(self, queries, engines):
+        """
+        Async generator yielding one completion event per (query, engine)
+        pair: {"query", "engine", "results", "error", "skipped", "completed",
+        "total"}. "results" only contains links not already yielded earlier
+        in the run; "skipped" is set when the engine's circuit was open.
+        """
+        self.health.register(engines)
+        pairs = self.expand(queries, engines)
+        logger.info(f"Scheduling {len(pairs)} (query, engine) tasks across {len(engines)} engines.")
+        tasks = [asyncio.ensure_future(self._run_pair(q, e)) for q, e in pairs]
+        seen = set()
+        try:
+            for completed, next_done in enumerate(asyncio.as_completed(tasks), 1):
+                query, engine, results, error = await next_done
+                fresh = []
+                for res in results:
+                    if res['link'] not in seen:
+                        seen.add(res['link'])
+                        fresh.append(res)
+                yield {
+                    "query": query,
+                    "engine": engine['name'],
+                    "results": fresh,
+                    "error": error,
+                    "skipped": isinstance(error, EngineUnavailable),
+                    "completed": completed,
+                    "total": len(tasks)
+                }
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.to_thread(self.health.flush)
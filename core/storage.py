@@ -1,12 +1,56 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import create_engine, event, insert, inspect, select, text, or_, bindparam, Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, UniqueConstraint, Index
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
 from sqlalchemy.sql import func
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
 import logging
+import threading
+import time
+import uuid
 
 try:
-    from ..config import DB_URL
+    from config import DB_URL, FRONTIER_LEASE_SECONDS, WRITE_BATCH_SIZE, WRITE_FLUSH_INTERVAL
 except ImportError:
     DB_URL = "sqlite:///argus.db"
+    FRONTIER_LEASE_SECONDS = 300
+    WRITE_BATCH_SIZE = 500
+    WRITE_FLUSH_INTERVAL = 5.0
+
+logger = logging.getLogger(__name__)
+
+def _utcnow():
+    # Naive UTC, comparable across hosts sharing the database
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _naive_utc(value):
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+# Artifact types whose values compare case-insensitively
+CASELESS_TYPES = {"email", "ipv4", "eth_address", "onion_v2", "onion_v3", "watchlist"}
+# Artifact types written with optional separators
+SEPARATED_TYPES = {"ssn", "credit_card"}
+# Values per IN (...) list, below SQLite's bound-parameter limit
+IN_CHUNK = 500
+
+def normalize_entity(artifact_type, value):
+    """
+    Canonical entity value of an artifact, so the same address, email or
+    number found in different spellings maps to one entity.
+    """
+    value = (value or "").strip()
+    if artifact_type in SEPARATED_TYPES:
+        return value.replace("-", "").replace(" ", "")
+    if artifact_type in CASELESS_TYPES or (artifact_type == "btc_address" and value.lower().startswith("bc1")):
+        return value.lower()
+    return value
+
+def _chunks(values, size=IN_CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
 
 Base = declarative_base()
 
@@ -45,16 +89,150 @@ class Artifact(Base):
     type = Column(String) # email, crypto, ssn, person, etc.
     value = Column(String)
     context = Column(Text)
+    confidence = Column(Float) # 0-1 validation score (see core/validation.py), NULL if not validated
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     result = relationship("SearchResult", back_populates="artifacts")
 
+class FrontierEntry(Base):
+    __tablename__ = 'crawl_frontier'
+    __table_args__ = (
+        UniqueConstraint('investigation_id', 'url', name='uq_frontier_investigation_url'),
+        Index('ix_frontier_investigation_state', 'investigation_id', 'state', 'depth'),
+    )
+
+    # Frontier states
+    QUEUED = "queued"
+    IN_FLIGHT = "in_flight"
+    DONE = "done"
+    FAILED = "failed"
+
+    id = Column(Integer, primary_key=True)
+    investigation_id = Column(Integer, ForeignKey('investigations.id'), nullable=False)
+    url = Column(String, nullable=False) # Canonical URL
+    host = Column(String)
+    depth = Column(Integer, default=0)
+    parent_url = Column(String)
+    state = Column(String, default=QUEUED) # queued, in_flight, done, failed
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text)
+    result_id = Column(Integer, ForeignKey('search_results.id'))
+    lease_owner = Column(String) # "<worker_id>:<batch token>" while in flight
+    lease_expires_at = Column(DateTime)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    fetched_at = Column(DateTime(timezone=True))
+
+class HostLiveness(Base):
+    __tablename__ = 'host_liveness'
+
+    host = Column(String, primary_key=True)
+    status = Column(String) # alive, dead
+    failure_class = Column(String) # timeout, connect_refused, hs_descriptor_not_found, ...
+    consecutive_failures = Column(Integer, default=0)
+    last_error = Column(Text)
+    last_seen_alive = Column(DateTime)
+    last_checked = Column(DateTime)
+    next_probe_at = Column(DateTime) # Back-off: skip the host until then
+
+class EngineHealth(Base):
+    __tablename__ = 'engine_health'
+
+    name = Column(String, primary_key=True) # Search engine name
+    state = Column(String) # closed, open, half_open, disabled
+    samples = Column(Text) # JSON [[ok, latency], ...] rolling window
+    consecutive_failures = Column(Integer, default=0)
+    trips = Column(Integer, default=0)
+    opened_until = Column(Float) # Epoch seconds
+    last_error = Column(Text)
+    last_success = Column(Float) # Epoch seconds
+    updated_at = Column(DateTime, default=_utcnow)
+
+class WatchlistEntry(Base):
+    __tablename__ = 'watchlist'
+
+    id = Column(Integer, primary_key=True)
+    selector = Column(String, nullable=False, unique=True) # Normalised (lower-case) selector
+    kind = Column(String) # email, domain, onion, handle, wallet, keyword
+    label = Column(String) # Analyst note, e.g. case or owner
+    active = Column(Boolean, default=True) # Removed selectors stay as inactive rows so watchers see the removal
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime, default=_utcnow, index=True)
+
+class Entity(Base):
+    __tablename__ = 'entities'
+    __table_args__ = (
+        UniqueConstraint('type', 'value', name='uq_entity_type_value'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    type = Column(String, nullable=False) # Artifact type
+    value = Column(String, nullable=False, index=True) # Normalised value (see normalize_entity)
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime)
+    result_count = Column(Integer, default=0) # Distinct results it was found in
+    investigation_count = Column(Integer, default=0, index=True) # Distinct investigations it was found in
+
+class EntityOccurrence(Base):
+    __tablename__ = 'entity_occurrences'
+    __table_args__ = (
+        UniqueConstraint('entity_id', 'result_id', name='uq_entity_occurrence_result'),
+        Index('ix_entity_occurrence_investigation', 'entity_id', 'investigation_id'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    entity_id = Column(Integer, ForeignKey('entities.id'), nullable=False)
+    result_id = Column(Integer, ForeignKey('search_results.id'))
+    investigation_id = Column(Integer, ForeignKey('investigations.id'))
+    first_seen = Column(DateTime)
+
 class StorageManager:
     def __init__(self, db_url=DB_URL):
-        self.engine = create_engine(db_url)
+        if db_url.startswith("sqlite"):
+            # Several crawl workers may share one SQLite file: wait for locks
+            # instead of failing, and let readers run alongside the writer.
+            self.engine = create_engine(db_url, connect_args={"timeout": 30})
+            event.listen(self.engine, "connect", self._sqlite_pragmas)
+        else:
+            self.engine = create_engine(db_url, pool_pre_ping=True)
+        had_entities = inspect(self.engine).has_table(Entity.__tablename__)
         Base.metadata.create_all(self.engine)
+        self._migrate()
         self.Session = sessionmaker(bind=self.engine)
+        if not had_entities and inspect(self.engine).has_table(Artifact.__tablename__):
+            session = self.Session()
+            try:
+                if session.query(Artifact.id).first() is not None:
+                    logger.warning("Existing artifacts are not in the entity index yet: run 'cli.py entity --rebuild'.")
+            finally:
+                session.close()
         
+    @staticmethod
+    def _sqlite_pragmas(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=30000")
+        cursor.close()
+
+    # Columns added after their table was first created: {table: {column: SQL type}}
+    MIGRATIONS = {
+        "artifacts": {"confidence": "FLOAT"},
+    }
+
+    def _migrate(self):
+        """
+        Adds columns missing from tables created by older versions
+        (create_all only creates missing tables).
+        """
+        inspector = inspect(self.engine)
+        for table, columns in self.MIGRATIONS.items():
+            existing = {column["name"] for column in inspector.get_columns(table)}
+            for column, sql_type in columns.items():
+                if column not in existing:
+                    with self.engine.begin() as conn:
+                        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {sql_type}"))
+                    logger.info(f"Added column {table}.{column}.")
+
     def create_investigation(self, name, query):
         session = self.Session()
         inv = Investigation(name=name, query=query)
@@ -64,35 +242,80 @@ class StorageManager:
         session.close()
         return inv_id
 
+    @staticmethod
+    def _result_row(investigation_id, result_data):
+        return {
+            "investigation_id": investigation_id,
+            "url": result_data.get('link'),
+            "title": result_data.get('title'),
+            "snippet": result_data.get('snippet', ''),
+            "engine": result_data.get('engine', 'unknown'),
+            "content": result_data.get('content', '')
+        }
+
+    @staticmethod
+    def _artifact_row(result_id, art):
+        return {
+            "result_id": result_id,
+            "type": art['type'],
+            "value": art['value'],
+            "context": art.get('context', ''),
+            "confidence": art.get('confidence')
+        }
+
     def add_result(self, investigation_id, result_data):
         session = self.Session()
         # Check if URL exists for this investigation? 
         # For now, just add.
-        res = SearchResult(
-            investigation_id=investigation_id,
-            url=result_data.get('link'),
-            title=result_data.get('title'),
-            snippet=result_data.get('snippet', ''),
-            engine=result_data.get('engine', 'unknown'),
-            content=result_data.get('content', '')
-        )
+        res = SearchResult(**self._result_row(investigation_id, result_data))
         session.add(res)
         session.commit()
         res_id = res.id
         session.close()
         return res_id
 
-    def add_artifact(self, result_id, artifact_type, value, context=""):
-        session = self.Session()
-        art = Artifact(
-            result_id=result_id,
-            type=artifact_type,
-            value=value,
-            context=context
-        )
-        session.add(art)
-        session.commit()
-        session.close()
+    def add_artifact(self, result_id, artifact_type, value, context="", confidence=None):
+        def write(session):
+            session.add(Artifact(**self._artifact_row(result_id, {
+                "type": artifact_type,
+                "value": value,
+                "context": context,
+                "confidence": confidence
+            })))
+            return None, [(result_id, artifact_type, value, None)]
+        self._write_indexed(write)
+
+    def save_batch(self, results=(), artifacts=()):
+        """
+        Bulk write path: stores results together with their artifacts in one
+        transaction. results are (investigation_id, result_data, artifact
+        dicts) tuples, artifacts are (result_id, artifact dict) pairs for
+        results stored earlier. Results and artifacts are each inserted with
+        one executemany, and the artifacts are indexed as entities.
+        Returns the new result IDs, in the order given.
+        """
+        results, artifacts = list(results), list(artifacts)
+        if not results and not artifacts:
+            return []
+        return self._write_indexed(lambda session: self._insert_batch(session, results, artifacts))
+
+    def _insert_batch(self, session, results, artifacts):
+        """
+        save_batch's inserts within the caller's transaction.
+        Returns (result IDs, entity sightings).
+        """
+        result_ids = []
+        if results:
+            result_ids = list(session.scalars(
+                insert(SearchResult).returning(SearchResult.id, sort_by_parameter_order=True),
+                [self._result_row(investigation_id, result_data) for investigation_id, result_data, _ in results]
+            ))
+        rows = [self._artifact_row(result_id, art)
+                for result_id, (_, _, arts) in zip(result_ids, results) for art in arts or ()]
+        rows += [self._artifact_row(result_id, art) for result_id, art in artifacts]
+        if rows:
+            session.execute(insert(Artifact), rows)
+        return result_ids, [(row["result_id"], row["type"], row["value"], None) for row in rows]
 
     def get_investigation(self, inv_id):
         session = self.Session()
@@ -113,3 +336,877 @@ class StorageManager:
             res.processed = True
             session.commit()
         session.close()
+
+    def iter_unprocessed_results(self, chunk_size=200, investigation_id=None):
+        """
+        Yields unprocessed results as lists of up to chunk_size
+        (id, title, snippet, content) tuples, in id order. Each chunk is read
+        in its own short session, so marking rows processed meanwhile is safe.
+        """
+        last_id = 0
+        while True:
+            session = self.Session()
+            try:
+                query = session.query(
+                    SearchResult.id, SearchResult.title, SearchResult.snippet, SearchResult.content
+                ).filter(
+                    SearchResult.id > last_id,
+                    or_(SearchResult.processed == False, SearchResult.processed.is_(None))
+                )
+                if investigation_id is not None:
+                    query = query.filter(SearchResult.investigation_id == investigation_id)
+                rows = [tuple(row) for row in query.order_by(SearchResult.id).limit(chunk_size)]
+            finally:
+                session.close()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield rows
+
+    def reset_processed(self, investigation_id=None):
+        """
+        Marks results unprocessed again (e.g. to back-fill a new pattern).
+        Returns the number of results reset.
+        """
+        session = self.Session()
+        try:
+            query = session.query(SearchResult)
+            if investigation_id is not None:
+                query = query.filter(SearchResult.investigation_id == investigation_id)
+            count = query.update({SearchResult.processed: False}, synchronize_session=False)
+            session.commit()
+            return count
+        finally:
+            session.close()
+
+    def save_analysis(self, analyzed, replace_types=()):
+        """
+        Stores analysis output in one transaction: analyzed is a list of
+        (result_id, artifact dicts). Artifacts of replace_types already stored
+        for those results are replaced, the new ones are inserted in one
+        executemany (and indexed as entities) and the results are marked
+        processed. Replaced values that were not found again leave the entity
+        index. Returns the number of artifacts inserted.
+        """
+        if not analyzed:
+            return 0
+        result_ids = [result_id for result_id, _ in analyzed]
+        rows = [self._artifact_row(result_id, art) for result_id, artifacts in analyzed for art in artifacts]
+        def write(session):
+            if replace_types:
+                session.query(Artifact).filter(
+                    Artifact.result_id.in_(result_ids),
+                    Artifact.type.in_(list(replace_types))
+                ).delete(synchronize_session=False)
+                self._unindex_entities(session, result_ids, replace_types, rows)
+            if rows:
+                session.execute(insert(Artifact), rows)
+            session.query(SearchResult).filter(
+                SearchResult.id.in_(result_ids)
+            ).update({SearchResult.processed: True}, synchronize_session=False)
+            return len(rows), [(row["result_id"], row["type"], row["value"], None) for row in rows]
+        return self._write_indexed(write)
+
+    def set_investigation_status(self, inv_id, status):
+        session = self.Session()
+        inv = session.query(Investigation).filter(Investigation.id == inv_id).first()
+        if inv:
+            inv.status = status
+            session.commit()
+        session.close()
+
+    # --- Crawl Frontier ---
+
+    def enqueue_urls(self, investigation_id, urls, depth=0, parent_url=None, per_host_limit=None, max_entries=None):
+        """
+        Adds canonical URLs to an investigation's frontier in one transaction.
+        URLs already known to the frontier (in any state) are skipped, so done
+        pages are never queued twice. Optional per-host and total budgets are
+        counted against everything the frontier has ever admitted.
+        Returns the number of newly queued URLs.
+        """
+        urls = list(dict.fromkeys(u for u in urls if u))
+        if not urls:
+            return 0
+
+        # Another worker may queue the same URL between the check and the
+        # commit; the unique constraint rejects the batch, so re-check and retry.
+        for attempt in range(3):
+            try:
+                return self._enqueue_new_urls(investigation_id, urls, depth, parent_url, per_host_limit, max_entries)
+            except IntegrityError:
+                if attempt == 2:
+                    raise
+                logger.debug(f"Frontier enqueue raced another worker (investigation {investigation_id}), retrying.")
+
+    def _enqueue_new_urls(self, investigation_id, urls, depth, parent_url, per_host_limit, max_entries):
+        session = self.Session()
+        try:
+            known = {
+                row.url for row in session.query(FrontierEntry.url).filter(
+                    FrontierEntry.investigation_id == investigation_id,
+                    FrontierEntry.url.in_(urls)
+                )
+            }
+            total = None
+            if max_entries is not None:
+                total = session.query(func.count(FrontierEntry.id)).filter(
+                    FrontierEntry.investigation_id == investigation_id
+                ).scalar()
+
+            host_counts = {}
+            added = 0
+            for url in urls:
+                if url in known:
+                    continue
+                if total is not None and total + added >= max_entries:
+                    break
+                host = urlparse(url).hostname
+                if per_host_limit is not None:
+                    if host not in host_counts:
+                        host_counts[host] = session.query(func.count(FrontierEntry.id)).filter(
+                            FrontierEntry.investigation_id == investigation_id,
+                            FrontierEntry.host == host
+                        ).scalar()
+                    if host_counts[host] >= per_host_limit:
+                        continue
+                    host_counts[host] += 1
+                session.add(FrontierEntry(
+                    investigation_id=investigation_id,
+                    url=url,
+                    host=host,
+                    depth=depth,
+                    parent_url=parent_url,
+                    state=FrontierEntry.QUEUED
+                ))
+                added += 1
+            session.commit()
+            return added
+        finally:
+            session.close()
+
+    def lease_batch(self, investigation_id, worker_id, limit=50, lease_seconds=FRONTIER_LEASE_SECONDS, max_depth=None):
+        """
+        Claims up to `limit` queued URLs (shallowest first) for a worker with a
+        time-limited lease, in one transaction. Expired leases are reclaimed
+        first. Claims are compare-and-set on the queued state, and candidate
+        rows are selected FOR UPDATE SKIP LOCKED where the database supports
+        it, so concurrent workers on any host never receive the same URL.
+        Returns plain dicts so callers never hold ORM objects across threads.
+        """
+        now = _utcnow()
+        lease = f"{worker_id}:{uuid.uuid4().hex[:12]}"
+        session = self.Session()
+        try:
+            self._reclaim_expired_leases(session, investigation_id, now)
+
+            query = session.query(FrontierEntry.id).filter(
+                FrontierEntry.investigation_id == investigation_id,
+                FrontierEntry.state == FrontierEntry.QUEUED
+            )
+            if max_depth is not None:
+                query = query.filter(FrontierEntry.depth <= max_depth)
+            candidate_ids = [
+                row.id for row in query.order_by(FrontierEntry.depth, FrontierEntry.id)
+                .limit(limit).with_for_update(skip_locked=True)
+            ]
+            if not candidate_ids:
+                session.commit()
+                return []
+
+            session.query(FrontierEntry).filter(
+                FrontierEntry.id.in_(candidate_ids),
+                FrontierEntry.state == FrontierEntry.QUEUED
+            ).update({
+                FrontierEntry.state: FrontierEntry.IN_FLIGHT,
+                FrontierEntry.attempts: func.coalesce(FrontierEntry.attempts, 0) + 1,
+                FrontierEntry.lease_owner: lease,
+                FrontierEntry.lease_expires_at: now + timedelta(seconds=lease_seconds)
+            }, synchronize_session=False)
+            session.commit()
+
+            entries = session.query(FrontierEntry).filter(
+                FrontierEntry.lease_owner == lease
+            ).order_by(FrontierEntry.depth, FrontierEntry.id).all()
+            return [{
+                "id": entry.id,
+                "url": entry.url,
+                "depth": entry.depth,
+                "parent_url": entry.parent_url,
+                "attempts": entry.attempts,
+                "lease": lease
+            } for entry in entries]
+        finally:
+            session.close()
+
+    def dequeue_batch(self, investigation_id, limit=50, max_depth=None):
+        """
+        Single-process shorthand for lease_batch().
+        """
+        return self.lease_batch(investigation_id, "local", limit, max_depth=max_depth)
+
+    def _reclaim_expired_leases(self, session, investigation_id, now):
+        count = session.query(FrontierEntry).filter(
+            FrontierEntry.investigation_id == investigation_id,
+            FrontierEntry.state == FrontierEntry.IN_FLIGHT,
+            FrontierEntry.lease_expires_at < now
+        ).update({
+            FrontierEntry.state: FrontierEntry.QUEUED,
+            FrontierEntry.lease_owner: None,
+            FrontierEntry.lease_expires_at: None
+        }, synchronize_session=False)
+        if count:
+            logger.info(f"Reclaimed {count} expired frontier leases for investigation {investigation_id}.")
+        return count
+
+    def complete_frontier_batch(self, done=(), failed=(), max_attempts=3, worker_id=None):
+        """
+        Records the outcome of a fetched batch in one transaction.
+        done: iterable of (entry_id, result_id) tuples.
+        failed: iterable of (entry_id, error) tuples; entries are re-queued
+        until they have been attempted max_attempts times.
+        With worker_id, entries whose lease has since passed to another
+        worker are left alone.
+        """
+        done = dict(done)
+        failed = dict(failed)
+        if not done and not failed:
+            return
+
+        session = self.Session()
+        try:
+            self._complete_frontier_entries(session, done, failed, max_attempts, worker_id)
+            session.commit()
+        finally:
+            session.close()
+
+    def save_crawl_batch(self, investigation_id, pages, failed=(), max_attempts=3, worker_id=None):
+        """
+        Stores fetched frontier pages and completes their frontier entries in
+        one transaction, so a worker dying in between can neither lose a page
+        nor leave it to be fetched and stored again.
+        pages: (entry_id, result_data) pairs; failed: (entry_id, error) pairs
+        as for complete_frontier_batch. Returns the pages' result IDs, in order.
+        """
+        pages, failed = list(pages), dict(failed)
+        if not pages and not failed:
+            return []
+        def write(session):
+            result_ids, sightings = self._insert_batch(
+                session, [(investigation_id, result_data, ()) for _, result_data in pages], ()
+            )
+            done = {entry_id: result_id for (entry_id, _), result_id in zip(pages, result_ids)}
+            self._complete_frontier_entries(session, done, failed, max_attempts, worker_id)
+            return result_ids, sightings
+        return self._write_indexed(write)
+
+    def _complete_frontier_entries(self, session, done, failed, max_attempts, worker_id):
+        entries = session.query(FrontierEntry).filter(
+            FrontierEntry.id.in_(list(done) + list(failed))
+        ).all()
+        for entry in entries:
+            if worker_id is not None and not (entry.lease_owner or "").startswith(f"{worker_id}:"):
+                continue
+            entry.lease_owner = None
+            entry.lease_expires_at = None
+            if entry.id in done:
+                entry.state = FrontierEntry.DONE
+                entry.result_id = done[entry.id]
+                entry.last_error = None
+                entry.fetched_at = func.now()
+            else:
+                entry.last_error = str(failed[entry.id])[:500]
+                if (entry.attempts or 0) < max_attempts:
+                    entry.state = FrontierEntry.QUEUED
+                else:
+                    entry.state = FrontierEntry.FAILED
+
+    def resume_frontier(self, investigation_id):
+        """
+        Re-queues URLs left in-flight by an interrupted crawl, without waiting
+        for their leases to expire. Only use when no worker is running.
+        Returns the number of re-queued URLs.
+        """
+        session = self.Session()
+        try:
+            count = session.query(FrontierEntry).filter(
+                FrontierEntry.investigation_id == investigation_id,
+                FrontierEntry.state == FrontierEntry.IN_FLIGHT
+            ).update({
+                FrontierEntry.state: FrontierEntry.QUEUED,
+                FrontierEntry.lease_owner: None,
+                FrontierEntry.lease_expires_at: None
+            }, synchronize_session=False)
+            session.commit()
+            return count
+        finally:
+            session.close()
+
+    def restart_frontier(self, investigation_id):
+        """
+        Re-queues every URL that is not done, giving failed URLs a fresh set
+        of attempts. Pages already fetched are left alone.
+        """
+        session = self.Session()
+        try:
+            count = session.query(FrontierEntry).filter(
+                FrontierEntry.investigation_id == investigation_id,
+                FrontierEntry.state.in_([FrontierEntry.IN_FLIGHT, FrontierEntry.FAILED])
+            ).update({
+                FrontierEntry.state: FrontierEntry.QUEUED,
+                FrontierEntry.attempts: 0,
+                FrontierEntry.lease_owner: None,
+                FrontierEntry.lease_expires_at: None
+            }, synchronize_session=False)
+            session.commit()
+            return count
+        finally:
+            session.close()
+
+    def frontier_stats(self, investigation_id):
+        """
+        Returns a {state: count} summary of an investigation's frontier.
+        """
+        session = self.Session()
+        try:
+            rows = session.query(FrontierEntry.state, func.count(FrontierEntry.id)).filter(
+                FrontierEntry.investigation_id == investigation_id
+            ).group_by(FrontierEntry.state).all()
+            return {state: count for state, count in rows}
+        finally:
+            session.close()
+
+    # --- Host Liveness ---
+
+    def get_host_liveness(self, hosts):
+        """
+        Returns {host: liveness dict} for the hosts that have a record.
+        """
+        hosts = list(set(hosts))
+        if not hosts:
+            return {}
+        session = self.Session()
+        try:
+            rows = session.query(HostLiveness).filter(HostLiveness.host.in_(hosts)).all()
+            return {row.host: {
+                "host": row.host,
+                "status": row.status,
+                "failure_class": row.failure_class,
+                "consecutive_failures": row.consecutive_failures or 0,
+                "last_error": row.last_error,
+                "last_seen_alive": row.last_seen_alive,
+                "last_checked": row.last_checked,
+                "next_probe_at": row.next_probe_at
+            } for row in rows}
+        finally:
+            session.close()
+
+    def update_host_liveness(self, records):
+        """
+        Upserts liveness dicts (as returned by get_host_liveness) in one transaction.
+        """
+        if not records:
+            return
+        session = self.Session()
+        try:
+            for record in records:
+                row = session.get(HostLiveness, record["host"]) or HostLiveness(host=record["host"])
+                for field in ("status", "failure_class", "consecutive_failures", "last_error",
+                              "last_seen_alive", "last_checked", "next_probe_at"):
+                    setattr(row, field, record.get(field))
+                session.add(row)
+            session.commit()
+        finally:
+            session.close()
+
+    def get_engine_health(self):
+        """
+        Returns {engine name: health dict} for every tracked search engine.
+        """
+        session = self.Session()
+        try:
+            return {row.name: {
+                "state": row.state,
+                "samples": row.samples,
+                "consecutive_failures": row.consecutive_failures or 0,
+                "trips": row.trips or 0,
+                "opened_until": row.opened_until or 0.0,
+                "last_error": row.last_error,
+                "last_success": row.last_success
+            } for row in session.query(EngineHealth).all()}
+        finally:
+            session.close()
+
+    def update_engine_health(self, records):
+        """
+        Upserts engine health dicts in one transaction.
+        """
+        if not records:
+            return
+        session = self.Session()
+        try:
+            for record in records:
+                row = session.get(EngineHealth, record["name"]) or EngineHealth(name=record["name"])
+                for field in ("state", "samples", "consecutive_failures", "trips",
+                              "opened_until", "last_error", "last_success"):
+                    setattr(row, field, record.get(field))
+                row.updated_at = _utcnow()
+                session.add(row)
+            session.commit()
+        finally:
+            session.close()
+
+    # --- Watchlist ---
+
+    def add_watchlist_entries(self, entries):
+        """
+        Upserts watchlist dicts ({"selector", "kind", "label"}) in one
+        transaction, re-activating removed selectors. Returns the count.
+        """
+        entries = {entry["selector"]: entry for entry in entries}
+        if not entries:
+            return 0
+        session = self.Session()
+        try:
+            now = _utcnow()
+            existing = {row.selector: row for row in session.query(WatchlistEntry).filter(
+                WatchlistEntry.selector.in_(list(entries))
+            )}
+            for selector, entry in entries.items():
+                row = existing.get(selector) or WatchlistEntry(selector=selector)
+                row.kind = entry.get("kind")
+                row.label = entry.get("label")
+                row.active = True
+                row.updated_at = now
+                session.add(row)
+            session.commit()
+            return len(entries)
+        finally:
+            session.close()
+
+    def remove_watchlist_entries(self, selectors):
+        """
+        Deactivates selectors. Returns the number of selectors removed.
+        """
+        selectors = list(set(selectors))
+        if not selectors:
+            return 0
+        session = self.Session()
+        try:
+            count = session.query(WatchlistEntry).filter(
+                WatchlistEntry.selector.in_(selectors),
+                WatchlistEntry.active == True
+            ).update({
+                WatchlistEntry.active: False,
+                WatchlistEntry.updated_at: _utcnow()
+            }, synchronize_session=False)
+            session.commit()
+            return count
+        finally:
+            session.close()
+
+    def get_watchlist_changes(self, since=None):
+        """
+        Returns (entries, synced_at): every active selector when since is
+        None, else every selector added or removed since then (including
+        inactive ones). Pass synced_at back in as since for the next call.
+        """
+        session = self.Session()
+        try:
+            query = session.query(WatchlistEntry)
+            if since is None:
+                query = query.filter(WatchlistEntry.active == True)
+            else:
+                # >= so rows written in the same instant as the last sync are not missed
+                query = query.filter(WatchlistEntry.updated_at >= since)
+            entries = [{
+                "selector": row.selector,
+                "kind": row.kind,
+                "label": row.label,
+                "active": bool(row.active),
+                "updated_at": row.updated_at
+            } for row in query.order_by(WatchlistEntry.updated_at)]
+            synced_at = entries[-1]["updated_at"] if entries else since
+            if synced_at is None:
+                synced_at = _utcnow()
+            return entries, synced_at
+        finally:
+            session.close()
+
+    # --- Entity Index ---
+
+    def _write_indexed(self, write):
+        """
+        Runs write(session) -> (return value, sightings), folds the sightings
+        into the entity index and commits, all in one transaction. Retried
+        once when a concurrent writer created one of the same entities first.
+        """
+        for attempt in range(2):
+            session = self.Session()
+            try:
+                value, sightings = write(session)
+                self._index_entities(session, sightings)
+                session.commit()
+                return value
+            except IntegrityError:
+                session.rollback()
+                if attempt:
+                    raise
+                logger.debug("Entity index write raced a concurrent writer, retrying.")
+            finally:
+                session.close()
+
+    def _index_entities(self, session, sightings):
+        """
+        Folds (result_id, artifact type, value, seen_at) sightings into the
+        entity index within the caller's transaction. Unknown entities are
+        created; every new (entity, result) pair adds an occurrence and bumps
+        the entity's result and investigation counts. A result seen again
+        (e.g. re-analysed) only moves last_seen on.
+        """
+        now = _utcnow()
+        by_key = {}
+        for result_id, artifact_type, value, seen_at in sightings:
+            value = normalize_entity(artifact_type, value)
+            if value:
+                by_key.setdefault((artifact_type, value), []).append((result_id, seen_at or now))
+        if not by_key:
+            return
+
+        result_ids = {result_id for seen in by_key.values() for result_id, _ in seen if result_id is not None}
+        investigations = {}
+        for chunk in _chunks(result_ids):
+            investigations.update({row.id: row.investigation_id for row in session.query(
+                SearchResult.id, SearchResult.investigation_id
+            ).filter(SearchResult.id.in_(chunk))})
+
+        entities = {}
+        for chunk in _chunks({value for _, value in by_key}):
+            for entity in session.query(Entity).filter(Entity.value.in_(chunk)):
+                if (entity.type, entity.value) in by_key:
+                    entities[(entity.type, entity.value)] = entity
+        existing = set(entities)
+        for key in by_key.keys() - existing:
+            entities[key] = Entity(type=key[0], value=key[1], result_count=0, investigation_count=0)
+            session.add(entities[key])
+        session.flush()
+
+        # Occurrences already recorded for these results and investigations
+        entity_ids = {entity.id for entity in entities.values()}
+        known_results, known_investigations = set(), set()
+        # Both lists in SQL so the (entity_id, result_id) index is used
+        for result_chunk in _chunks(result_ids, IN_CHUNK // 2):
+            for chunk in _chunks(entity_ids, IN_CHUNK // 2):
+                known_results.update(
+                    (row.entity_id, row.result_id) for row in session.query(
+                        EntityOccurrence.entity_id, EntityOccurrence.result_id
+                    ).filter(
+                        EntityOccurrence.entity_id.in_(chunk),
+                        EntityOccurrence.result_id.in_(result_chunk)
+                    )
+                )
+        investigation_ids = {i for i in investigations.values() if i is not None}
+        for investigation_chunk in _chunks(investigation_ids, 50):
+            for chunk in _chunks(entity_ids, IN_CHUNK - 50):
+                known_investigations.update(
+                    (row.entity_id, row.investigation_id) for row in session.query(
+                        EntityOccurrence.entity_id, EntityOccurrence.investigation_id
+                    ).filter(
+                        EntityOccurrence.entity_id.in_(chunk),
+                        EntityOccurrence.investigation_id.in_(investigation_chunk)
+                    ).distinct()
+                )
+
+        occurrences, updates = [], []
+        for key, seen in by_key.items():
+            entity = entities[key]
+            results = investigations_added = 0
+            first_seen = min(seen_at for _, seen_at in seen)
+            last_seen = max(seen_at for _, seen_at in seen)
+            for result_id, seen_at in seen:
+                if (entity.id, result_id) in known_results:
+                    continue
+                known_results.add((entity.id, result_id))
+                investigation_id = investigations.get(result_id)
+                occurrences.append({
+                    "entity_id": entity.id,
+                    "result_id": result_id,
+                    "investigation_id": investigation_id,
+                    "first_seen": seen_at
+                })
+                results += 1
+                if investigation_id is not None and (entity.id, investigation_id) not in known_investigations:
+                    known_investigations.add((entity.id, investigation_id))
+                    investigations_added += 1
+            if key in existing:
+                # Counts are incremented in SQL so concurrent writers don't lose updates
+                updates.append({
+                    "entity_id": entity.id,
+                    "results": results,
+                    "investigations": investigations_added,
+                    "first": min(entity.first_seen or first_seen, first_seen),
+                    "last": max(entity.last_seen or last_seen, last_seen)
+                })
+            else:
+                entity.result_count = results
+                entity.investigation_count = investigations_added
+                entity.first_seen = first_seen
+                entity.last_seen = last_seen
+        session.flush()
+        if occurrences:
+            session.execute(insert(EntityOccurrence), occurrences)
+        if updates:
+            table = Entity.__table__
+            session.execute(table.update().where(table.c.id == bindparam("entity_id")).values(
+                result_count=table.c.result_count + bindparam("results"),
+                investigation_count=table.c.investigation_count + bindparam("investigations"),
+                first_seen=bindparam("first"),
+                last_seen=bindparam("last")
+            ), updates)
+
+    def _unindex_entities(self, session, result_ids, artifact_types, rows):
+        """
+        Within the caller's transaction, drops the occurrences of
+        artifact_types entities in result_ids that the replacing artifact
+        rows don't contain again, recomputes the affected entities' counts
+        and deletes entities left without any occurrence.
+        """
+        kept = {(row["type"], normalize_entity(row["type"], row["value"]), row["result_id"]) for row in rows}
+        stale, affected = [], set()
+        for chunk in _chunks(result_ids, IN_CHUNK // 2):
+            for occurrence_id, entity_id, result_id, artifact_type, value in session.query(
+                EntityOccurrence.id, EntityOccurrence.entity_id, EntityOccurrence.result_id, Entity.type, Entity.value
+            ).join(Entity, Entity.id == EntityOccurrence.entity_id).filter(
+                EntityOccurrence.result_id.in_(chunk),
+                Entity.type.in_(list(artifact_types))
+            ):
+                if (artifact_type, value, result_id) not in kept:
+                    stale.append(occurrence_id)
+                    affected.add(entity_id)
+        if not stale:
+            return
+        for chunk in _chunks(stale):
+            session.query(EntityOccurrence).filter(EntityOccurrence.id.in_(chunk)).delete(synchronize_session=False)
+        occurrences = EntityOccurrence.__table__
+        entities = Entity.__table__
+        for chunk in _chunks(affected):
+            session.execute(entities.update().where(entities.c.id.in_(chunk)).values(
+                result_count=select(func.count()).where(
+                    occurrences.c.entity_id == entities.c.id
+                ).scalar_subquery(),
+                investigation_count=select(func.count(occurrences.c.investigation_id.distinct())).where(
+                    occurrences.c.entity_id == entities.c.id
+                ).scalar_subquery()
+            ))
+            session.execute(entities.delete().where(entities.c.id.in_(chunk), entities.c.result_count == 0))
+        logger.debug(f"Removed {len(stale)} entity occurrences no longer found on re-analysis.")
+
+    def lookup_entity(self, value, artifact_type=None, limit=100):
+        """
+        Where else has this value been seen? Returns one dict per matching
+        entity (any type unless artifact_type is given) with its counts,
+        first/last seen, a per-investigation breakdown and up to `limit` of
+        the most recent results it was found in. Served from the index alone.
+        """
+        value = (value or "").strip()
+        if not value:
+            return []
+        types = [artifact_type] if artifact_type else None
+        session = self.Session()
+        try:
+            # The spellings value normalises to under the types it could be
+            candidates = {value, value.lower(), normalize_entity("ssn", value)}
+            query = session.query(Entity).filter(Entity.value.in_(list(candidates)))
+            if types:
+                query = query.filter(Entity.type.in_(types))
+            entities = [entity for entity in query if normalize_entity(entity.type, value) == entity.value]
+
+            found = []
+            for entity in sorted(entities, key=lambda e: (-(e.investigation_count or 0), -(e.result_count or 0))):
+                per_investigation = session.query(
+                    EntityOccurrence.investigation_id,
+                    Investigation.name,
+                    func.count(EntityOccurrence.id),
+                    func.min(EntityOccurrence.first_seen),
+                    func.max(EntityOccurrence.first_seen)
+                ).outerjoin(
+                    Investigation, Investigation.id == EntityOccurrence.investigation_id
+                ).filter(
+                    EntityOccurrence.entity_id == entity.id
+                ).group_by(EntityOccurrence.investigation_id, Investigation.name)
+                investigations = sorted(({
+                    "investigation_id": inv_id,
+                    "name": name,
+                    "results": count,
+                    "first_seen": first,
+                    "last_seen": last
+                } for inv_id, name, count, first, last in per_investigation), key=lambda i: i["last_seen"] or datetime.min, reverse=True)
+                results = [{
+                    "result_id": row.result_id,
+                    "investigation_id": row.investigation_id,
+                    "url": row.url,
+                    "title": row.title,
+                    "seen": row.first_seen
+                } for row in session.query(
+                    EntityOccurrence.result_id,
+                    EntityOccurrence.investigation_id,
+                    EntityOccurrence.first_seen,
+                    SearchResult.url,
+                    SearchResult.title
+                ).outerjoin(
+                    SearchResult, SearchResult.id == EntityOccurrence.result_id
+                ).filter(
+                    EntityOccurrence.entity_id == entity.id
+                ).order_by(EntityOccurrence.id.desc()).limit(limit)]
+                found.append({
+                    "id": entity.id,
+                    "type": entity.type,
+                    "value": entity.value,
+                    "first_seen": entity.first_seen,
+                    "last_seen": entity.last_seen,
+                    # Exact counts from the occurrences (the stored ones are maintained incrementally)
+                    "result_count": sum(i["results"] for i in investigations),
+                    "investigation_count": sum(1 for i in investigations if i["investigation_id"] is not None),
+                    "investigations": investigations,
+                    "results": results
+                })
+            return found
+        finally:
+            session.close()
+
+    def cross_case_entities(self, min_investigations=2, artifact_type=None, limit=50):
+        """
+        Entities found in at least min_investigations investigations, most
+        widespread first.
+        """
+        session = self.Session()
+        try:
+            query = session.query(Entity).filter(Entity.investigation_count >= min_investigations)
+            if artifact_type:
+                query = query.filter(Entity.type == artifact_type)
+            return [{
+                "id": entity.id,
+                "type": entity.type,
+                "value": entity.value,
+                "first_seen": entity.first_seen,
+                "last_seen": entity.last_seen,
+                "result_count": entity.result_count,
+                "investigation_count": entity.investigation_count
+            } for entity in query.order_by(
+                Entity.investigation_count.desc(), Entity.result_count.desc()
+            ).limit(limit)]
+        finally:
+            session.close()
+
+    def rebuild_entity_index(self, batch_size=5000):
+        """
+        Rebuilds the entity index from every stored artifact (e.g. for a
+        database that predates it), one transaction per batch of artifacts.
+        Returns the number of artifacts indexed.
+        """
+        session = self.Session()
+        try:
+            session.query(EntityOccurrence).delete(synchronize_session=False)
+            session.query(Entity).delete(synchronize_session=False)
+            session.commit()
+        finally:
+            session.close()
+
+        last_id, indexed = 0, 0
+        while True:
+            session = self.Session()
+            try:
+                rows = session.query(
+                    Artifact.id, Artifact.result_id, Artifact.type, Artifact.value, Artifact.created_at
+                ).filter(Artifact.id > last_id).order_by(Artifact.id).limit(batch_size).all()
+            finally:
+                session.close()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            sightings = [(row.result_id, row.type, row.value, _naive_utc(row.created_at)) for row in rows]
+            self._write_indexed(lambda session: (None, sightings))
+            indexed += len(rows)
+            logger.info(f"Indexed {indexed} artifacts.")
+        return indexed
+
+
+class BatchWriter:
+    """
+    Buffers results and artifacts and writes them with
+    StorageManager.save_batch: one transaction per batch_size rows, or once
+    the oldest buffered row has waited flush_interval seconds (checked as
+    rows are added), instead of one commit per row.
+
+    Use it as a context manager, or call flush() when done; IDs of every
+    result written so far are in result_ids, in the order added.
+    """
+    def __init__(self, storage, batch_size=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL):
+        self.storage = storage
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.result_ids = []
+        self._results = []
+        self._artifacts = []
+        self._rows = 0
+        self._oldest = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+            return
+        # Write what we can, but never let a failing flush mask the original error
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Could not write {self._rows} buffered rows while handling {exc_type.__name__}: {e}")
+
+    def __len__(self):
+        return self._rows
+
+    def add_result(self, investigation_id, result_data, artifacts=()):
+        """
+        Queues a result with its artifact dicts.
+        """
+        artifacts = list(artifacts)
+        self._add(lambda: self._results.append((investigation_id, result_data, artifacts)), 1 + len(artifacts))
+
+    def add_artifacts(self, result_id, artifacts):
+        """
+        Queues artifact dicts for a result already stored.
+        """
+        artifacts = [(result_id, art) for art in artifacts]
+        if artifacts:
+            self._add(lambda: self._artifacts.extend(artifacts), len(artifacts))
+
+    def _add(self, append, rows):
+        with self._lock:
+            append()
+            self._rows += rows
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            due = self._rows >= self.batch_size or time.monotonic() - self._oldest >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes everything buffered. Returns the IDs of the results written.
+        If the write fails the rows stay buffered and the error is raised.
+        """
+        with self._lock:
+            results, rows = self._results, self._rows
+            if not rows:
+                return []
+            started = time.monotonic()
+            # Buffers are only cleared once written: after a failure the rows
+            # stay queued for the next flush
+            result_ids = self.storage.save_batch(results, self._artifacts)
+            self._results, self._artifacts, self._rows, self._oldest = [], [], 0, None
+            self.result_ids.extend(result_ids)
+        logger.debug(f"Wrote {len(result_ids)} results and {rows - len(results)} artifacts in {time.monotonic() - started:.2f}s.")
+        return result_ids
@@ -1,32 +1,113 @@
+import json
 import requests
 import socket
 import socks
 import time
 import logging
+import queue
+import random
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlparse
 from stem import Signal
 from stem.control import Controller
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 from fake_useragent import UserAgent
+from .circuit_manager import CircuitManager
 
 try:
-    from ..config import TOR_PROXY_URL, TOR_CONTROL_PORT, TOR_PASSWORD, REQUEST_TIMEOUT
+    from config import (TOR_PROXY_URL, TOR_CONTROL_PORT, TOR_PASSWORD, REQUEST_TIMEOUT, MAX_WORKERS, KEEPALIVE_TIMEOUT,
+                          TOR_SOCKS_PORTS, TOR_ISOLATION_SLOTS, TOR_DETECT_CACHE, TOR_DETECT_CACHE_TTL)
 except ImportError:
     # Fallback for standalone testing
     TOR_PROXY_URL = "socks5h://127.0.0.1:9050"
     TOR_CONTROL_PORT = 9051
     TOR_PASSWORD = None
     REQUEST_TIMEOUT = 45
+    MAX_WORKERS = 5
+    KEEPALIVE_TIMEOUT = 60
+    TOR_SOCKS_PORTS = []
+    TOR_ISOLATION_SLOTS = 4
+    TOR_DETECT_CACHE = ".tor_endpoint.json"
+    TOR_DETECT_CACHE_TTL = 24 * 3600
 
 logger = logging.getLogger(__name__)
 
+# Seconds to wait for a local SOCKS handshake during port detection
+PROBE_TIMEOUT = 0.3
+
+# Weight of the newest sample in an endpoint's latency average
+LATENCY_EWMA_ALPHA = 0.3
+# Seconds added to an endpoint's score per consecutive connection failure
+FAILURE_PENALTY = 30.0
+
+
+def _isolated_url(base_url, user, password):
+    parsed = urlparse(base_url)
+    host = parsed.hostname or "127.0.0.1"
+    port = f":{parsed.port}" if parsed.port else ""
+    return f"{parsed.scheme}://{user}:{password}@{host}{port}"
+
+
+class ProxyEndpoint:
+    """
+    One circuit slot: a Tor SocksPort plus optional isolation credentials.
+    Tracks a moving average of request latency, consecutive connection
+    failures and the requests currently in flight.
+    """
+    def __init__(self, base_url, tag=None, generation=0):
+        self.base_url = base_url
+        self.tag = tag
+        self.url = _isolated_url(base_url, f"erebus-{generation}", tag) if tag else base_url
+        self.latency = None
+        self.failures = 0
+        self.in_flight = 0
+        self.requests = 0
+
+    def score(self):
+        # Untried endpoints score 0 so every circuit gets measured
+        latency = self.latency or 0.0
+        return (latency + self.failures * FAILURE_PENALTY) * (self.in_flight + 1)
+
+    def record(self, latency=None, ok=True):
+        self.requests += 1
+        if not ok:
+            self.failures += 1
+            return
+        self.failures = 0
+        if latency is not None:
+            self.latency = latency if self.latency is None else (
+                LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * self.latency
+            )
+
+    def __repr__(self):
+        return f"<ProxyEndpoint {self.base_url} {self.tag or 'shared'}>"
+
 class TorHandler:
-    def __init__(self, proxy_url=None):
+    def __init__(self, proxy_url=None, pool_size=MAX_WORKERS, socks_ports=None, isolation_slots=TOR_ISOLATION_SLOTS):
         self.proxy_url = proxy_url or TOR_PROXY_URL
+        self.socks_ports = TOR_SOCKS_PORTS if socks_ports is None else socks_ports
+        self.isolation_slots = isolation_slots
         self.control_port = TOR_CONTROL_PORT
         self.password = TOR_PASSWORD
         self.ua = UserAgent()
+
+        # Session pool: at most pool_size requests.Sessions, reused across calls
+        # so keep-alive connections to a host survive between fetches.
+        self.pool_size = max(1, pool_size)
+        self.keepalive_timeout = KEEPALIVE_TIMEOUT
+        self._pool = queue.LifoQueue()
+        self._pool_lock = threading.Lock()
+        self._pool_slots = threading.BoundedSemaphore(self.pool_size)
+        self._identity = {"generation": 0, "headers": self._new_headers()}
+
+        # Circuit pool: every (Tor instance, isolation slot) pair, load-balanced by latency
+        self._endpoints = None
+        self._endpoint_lock = threading.Lock()
+        self.circuit_manager = None
         
         # Only auto-detect if NOT explicitly provided/overridden by user input
         # (Assuming TOR_PROXY_URL from config is a 'default' not a hard requirement if passed via arg)
@@ -38,8 +119,14 @@ class TorHandler:
     def _detect_ports(self):
         """
         Probes standard Tor ports first, then scans system for any open SOCKS proxy
-        if defaults fail.
+        if defaults fail. A previous detection cached on disk is reused after a
+        single handshake; all other probes run in parallel.
         """
+        cached = self._load_detected()
+        if cached and self._test_socks_port(cached["proxy_port"]):
+            self._set_ports(cached["proxy_port"], cached["control_port"])
+            return
+
         # 1. Try standard ports
         candidates = [
             (9050, 9051), # System Tor
@@ -59,32 +146,68 @@ class TorHandler:
             except:
                 pass
 
-        for p_port, c_port in candidates:
-            if self._test_socks_port(p_port):
-                self._set_ports(p_port, c_port)
-                return
+        found = self._probe_ports([p_port for p_port, _ in candidates])
+        if found:
+            c_port = dict(candidates)[found]
+            self._set_ports(found, c_port)
+            self._save_detected(found, c_port)
+            return
 
         # 2. If standard ports fail, scan all localhost listeners
         logger.info("Standard Tor ports not found. Scanning system for active SOCKS proxies...")
         found_port = self._scan_system_ports()
         if found_port:
              self._set_ports(found_port, found_port + 1) # Guess control port
+             self._save_detected(found_port, found_port + 1)
              return
 
         logger.warning("Could not detect any active Tor proxy. Defaulting to 9050.")
+
+    def _load_detected(self):
+        try:
+            with open(TOR_DETECT_CACHE, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if time.time() - cached.get("detected_at", 0) < TOR_DETECT_CACHE_TTL:
+                return cached
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def _save_detected(self, p_port, c_port):
+        try:
+            with open(TOR_DETECT_CACHE, "w", encoding="utf-8") as f:
+                json.dump({"proxy_port": p_port, "control_port": c_port, "detected_at": time.time()}, f)
+        except OSError as e:
+            logger.debug(f"Could not cache detected Tor ports: {e}")
+
+    def _probe_ports(self, ports):
+        """
+        Handshakes with all ports concurrently. Returns the first port in the
+        given (priority) order that speaks SOCKS5, or None.
+        """
+        ports = list(dict.fromkeys(ports))
+        if not ports:
+            return None
+        with ThreadPoolExecutor(max_workers=min(32, len(ports))) as pool:
+            results = list(pool.map(self._test_socks_port, ports))
+        for port, ok in zip(ports, results):
+            if ok:
+                return port
+        return None
         
     def _set_ports(self, p_port, c_port):
         logger.info(f"detected active Tor proxy on port {p_port}")
         self.proxy_url = f"socks5h://127.0.0.1:{p_port}"
         self.control_port = c_port
+        self._endpoints = None
 
-    def _test_socks_port(self, port):
+    def _test_socks_port(self, port, timeout=PROBE_TIMEOUT):
         """
         Tries to perform a SOCKS5 handshake to verify it's actually a proxy.
         """
         try:
             s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            s.settimeout(1)
+            s.settimeout(timeout)
             if s.connect_ex(('127.0.0.1', port)) != 0:
                 s.close()
                 return False
@@ -129,21 +252,125 @@ class TorHandler:
             logger.error(f"Port scan failed: {e}")
             return None
         
-        # Test each found port
-        for port in ports:
-            # Skip common non-proxy ports to save time
-            if port in [80, 443, 8080, 8501, 11434, 3306, 5432]: 
-                continue
-                
-            if self._test_socks_port(port):
-                return port
-        return None
+        # Test all found ports at once, skipping common non-proxy ports
+        return self._probe_ports(sorted(p for p in ports if p not in [80, 443, 8080, 8501, 11434, 3306, 5432]))
+
+
+    def _new_headers(self):
+        return {
+            "User-Agent": self.ua.random,
+            "Accept-Language": "en-US,en;q=0.9"
+        }
+
+    @property
+    def identity(self):
+        """
+        Current client identity: a generation counter and the headers every
+        session should present. The generation only changes on rotate_identity().
+        """
+        return self._identity
+
+    def isolated_proxy_url(self, tag):
+        """
+        Proxy URL with SOCKS credentials unique to tag (and to the current
+        identity). Tor isolates streams by SOCKS auth (IsolateSOCKSAuth is on
+        by default), so every tag is routed over its own circuit.
+        """
+        return _isolated_url(self.proxy_url, f"erebus-{self._identity['generation']}", tag)
+
+    def _build_endpoints(self):
+        parsed = urlparse(self.proxy_url)
+        base_urls = [self.proxy_url]
+        for port in self.socks_ports:
+            url = f"{parsed.scheme}://{parsed.hostname or '127.0.0.1'}:{port}"
+            if port != parsed.port and url not in base_urls:
+                base_urls.append(url)
+        generation = self._identity["generation"]
+        if self.isolation_slots <= 0:
+            return [ProxyEndpoint(url) for url in base_urls]
+        return [ProxyEndpoint(url, f"pool-{slot}", generation)
+                for url in base_urls for slot in range(self.isolation_slots)]
+
+    @property
+    def endpoints(self):
+        """
+        The circuit pool: one ProxyEndpoint per Tor SocksPort (proxy_url plus
+        socks_ports) and isolation slot. Rebuilt when the identity rotates.
+        """
+        with self._endpoint_lock:
+            if self._endpoints is None:
+                self._endpoints = self._build_endpoints()
+            return self._endpoints
 
+    def pick_endpoint(self):
+        """
+        Endpoint with the lowest latency x load score (random tie-break).
+        """
+        endpoints = self.endpoints
+        with self._endpoint_lock:
+            return min(endpoints, key=lambda e: (e.score(), random.random()))
+
+    def acquire_endpoint(self):
+        """
+        Picks an endpoint for one request and counts it as in flight.
+        Must be paired with release_endpoint().
+        """
+        endpoint = self.pick_endpoint()
+        with self._endpoint_lock:
+            endpoint.in_flight += 1
+        return endpoint
+
+    def release_endpoint(self, endpoint, latency=None, ok=True):
+        """
+        Feeds a finished request's latency (or connection failure) back into
+        the load balancer.
+        """
+        with self._endpoint_lock:
+            endpoint.in_flight = max(0, endpoint.in_flight - 1)
+            endpoint.record(latency, ok)
+
+    def slow_endpoint_tags(self, factor):
+        """
+        Isolation tags of pool endpoints whose measured latency is more than
+        factor times the median endpoint's.
+        """
+        with self._endpoint_lock:
+            measured = [e for e in (self._endpoints or []) if e.tag and e.latency is not None]
+        if len(measured) < 2:
+            return set()
+        latencies = sorted(e.latency for e in measured)
+        median = latencies[len(latencies) // 2]
+        return {e.tag for e in measured if e.latency > median * factor}
+
+    def reset_endpoints(self, tags):
+        """
+        Forgets the telemetry of endpoints whose circuits were replaced.
+        """
+        with self._endpoint_lock:
+            for endpoint in self._endpoints or []:
+                if endpoint.tag in tags:
+                    endpoint.failures = 0
+                    endpoint.latency = None
+
+    def endpoint_stats(self):
+        """
+        Per-endpoint latency and load, for logs and the UI.
+        """
+        with self._endpoint_lock:
+            return [{
+                "proxy": e.base_url,
+                "slot": e.tag or "shared",
+                "latency": round(e.latency, 2) if e.latency is not None else None,
+                "in_flight": e.in_flight,
+                "requests": e.requests,
+                "failures": e.failures
+            } for e in (self._endpoints or [])]
 
     def get_session(self):
         """
-        Creates a requests Session with Tor SOCKS proxy, random User-Agent,
-        and automatic retries.
+        Creates a requests Session with Tor SOCKS proxy, the current identity's
+        User-Agent, and automatic retries.
+        Prefer session() for repeated fetches: it reuses pooled sessions.
         """
         session = requests.Session()
         
@@ -156,30 +383,123 @@ class TorHandler:
             status_forcelist=[500, 502, 503, 504],
             raise_on_status=False
         )
-        adapter = HTTPAdapter(max_retries=retry)
+        # One connection pool per host, bounded to the worker count
+        adapter = HTTPAdapter(
+            max_retries=retry,
+            pool_connections=self.pool_size,
+            pool_maxsize=self.pool_size
+        )
         
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         
-        # Set proxies
+        # Set proxies: each pooled session sticks to one circuit of the pool
+        proxy_url = self.pick_endpoint().url
         session.proxies = {
-            "http": self.proxy_url,
-            "https": self.proxy_url
+            "http": proxy_url,
+            "https": proxy_url
         }
         
-        # Set random User-Agent
-        session.headers.update({
-            "User-Agent": self.ua.random,
-            "Accept-Language": "en-US,en;q=0.9"
-        })
+        identity = self._identity
+        session.headers.update(identity["headers"])
+        session.erebus_generation = identity["generation"]
         
         return session
 
+    @contextmanager
+    def session(self):
+        """
+        Checks a session out of the pool for the duration of the block.
+        Blocks when pool_size sessions are already in use; sessions from a
+        previous identity generation are closed instead of being returned.
+        """
+        self._pool_slots.acquire()
+        session = None
+        try:
+            while session is None:
+                try:
+                    candidate = self._pool.get_nowait()
+                except queue.Empty:
+                    candidate = self.get_session()
+                if candidate.erebus_generation == self._identity["generation"]:
+                    session = candidate
+                else:
+                    candidate.close()
+            yield session
+        finally:
+            if session is not None:
+                if session.erebus_generation == self._identity["generation"]:
+                    self._pool.put(session)
+                else:
+                    session.close()
+            self._pool_slots.release()
+
+    def rotate_identity(self, new_circuit=False):
+        """
+        Deliberately switches to a new client identity: new User-Agent, and
+        pooled sessions are retired so no connection outlives the old identity.
+        With new_circuit=True, also asks Tor for fresh circuits (NEWNYM).
+        """
+        with self._pool_lock:
+            self._identity = {
+                "generation": self._identity["generation"] + 1,
+                "headers": self._new_headers()
+            }
+            self._drain_pool()
+        with self._endpoint_lock:
+            # New credentials, hence new circuits for every slot
+            self._endpoints = None
+        logger.info(f"Rotated client identity (generation {self._identity['generation']}).")
+        if new_circuit:
+            return self.renew_connection()
+        return True
+
+    def _drain_pool(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def close(self):
+        """
+        Closes all idle pooled sessions and stops the circuit manager.
+        """
+        with self._pool_lock:
+            self._drain_pool()
+        if self.circuit_manager is not None:
+            self.circuit_manager.stop()
+            self.circuit_manager = None
+
+    def start_circuit_manager(self):
+        """
+        Starts background circuit monitoring on a persistent control
+        connection (see core/circuit_manager.py). Returns False when the
+        control port cannot be used.
+        """
+        if self.circuit_manager is None:
+            manager = CircuitManager(self, control_port=self.control_port, password=self.password)
+            if not manager.start():
+                return False
+            self.circuit_manager = manager
+        return True
+
+    @property
+    def controller(self):
+        """
+        The circuit manager's persistent controller, or None when it is not running.
+        """
+        return self.circuit_manager.controller if self.circuit_manager is not None else None
+
     def renew_connection(self):
         """
         Signals the Tor controller to switch to a new circuit (new IP).
-        Requires Tor ControlPort to be enabled (usually 9051).
+        Requires Tor ControlPort to be enabled (usually 9051). Never waits
+        for Tor's NEWNYM rate limit: with a running circuit manager the
+        signal is queued on its thread.
         """
+        if self.circuit_manager is not None and self.circuit_manager.running:
+            return self.circuit_manager.request_newnym()
         try:
             with Controller.from_port(port=self.control_port) as controller:
                 if self.password:
@@ -187,9 +507,10 @@ class TorHandler:
                 else:
                     controller.authenticate()
                 
+                if not controller.is_newnym_available():
+                    logger.info(f"NEWNYM rate-limited for {controller.get_newnym_wait():.0f}s; Tor will apply it then.")
                 controller.signal(Signal.NEWNYM)
                 logger.info("Tor circuit renewed successfully.")
-                time.sleep(controller.get_newnym_wait())
                 return True
         except Exception as e:
             logger.error(f"Failed to renew Tor connection: {e}")
@@ -199,11 +520,11 @@ class TorHandler:
         """
         Verifies if traffic is being routed through Tor.
         """
-        session = self.get_session()
         try:
             # check.torproject.org is reliable but sometimes slow
             # httpbin or similar IP echo services can also be used
-            resp = session.get("https://check.torproject.org/api/ip", timeout=REQUEST_TIMEOUT)
+            with self.session() as session:
+                resp = session.get("https://check.torproject.org/api/ip", timeout=REQUEST_TIMEOUT)
             if resp.status_code == 200:
                 data = resp.json()
                 is_tor = data.get("IsTor", False)
@@ -223,6 +544,6 @@ if __name__ == "__main__":
     handler.check_connection()
     
     print("Renewing circuit...")
-    if handler.renew_connection():
+    if handler.rotate_identity(new_circuit=True):
         print("Checking new connection...")
         handler.check_connection()
@@ -0,0 +1,325 @@
+import hashlib
+import logging
+import math
+from collections import Counter
+from functools import lru_cache
+
+try:
+    from config import ARTIFACT_MIN_CONFIDENCE
+except ImportError:
+    ARTIFACT_MIN_CONFIDENCE = 0.5
+
+logger = logging.getLogger(__name__)
+
+# Confidence of types without a dedicated check
+DEFAULT_CONFIDENCE = {
+    "email": 0.9,
+    "onion_v3": 1.0,
+    "onion_v2": 0.6,
+    "ipv4": 0.8,
+    "aws_access_key": 0.9,
+    "google_api_key": 0.9,
+}
+FALLBACK_CONFIDENCE = 0.5
+
+HEX_DIGITS = set("0123456789abcdefABCDEF")
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+BASE58_INDEX = {ch: i for i, ch in enumerate(BASE58_ALPHABET)}
+BECH32_CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+BECH32_INDEX = {ch: i for i, ch in enumerate(BECH32_CHARSET)}
+BECH32_CONST = 1
+BECH32M_CONST = 0x2bc830a3
+# Monero base58 encodes 8-byte blocks as 11 characters; shorter tail blocks by size
+MONERO_BLOCK_SIZES = {0: 0, 2: 1, 3: 2, 5: 3, 6: 4, 7: 5, 9: 6, 10: 7, 11: 8}
+# SSNs that were published as examples and never issued
+INVALID_SSNS = {"078051120", "219099999", "123456789"}
+
+
+# --- Keccak-256 (as used by Ethereum and Monero; not NIST SHA3-256) ---
+
+_KECCAK_RC = [
+    0x0000000000000001, 0x0000000000008082, 0x800000000000808A, 0x8000000080008000,
+    0x000000000000808B, 0x0000000080000001, 0x8000000080008081, 0x8000000000008009,
+    0x000000000000008A, 0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+    0x000000008000808B, 0x800000000000008B, 0x8000000000008089, 0x8000000000008003,
+    0x8000000000008002, 0x8000000000000080, 0x000000000000800A, 0x800000008000000A,
+    0x8000000080008081, 0x8000000000008080, 0x0000000080000001, 0x8000000080008008,
+]
+# Rotation offsets, indexed [x][y]
+_KECCAK_ROT = [
+    [0, 36, 3, 41, 18],
+    [1, 44, 10, 45, 2],
+    [62, 6, 43, 15, 61],
+    [28, 55, 25, 21, 56],
+    [27, 20, 39, 8, 14],
+]
+_MASK64 = (1 << 64) - 1
+
+
+def _rol(value, shift):
+    return ((value << shift) | (value >> (64 - shift))) & _MASK64 if shift else value
+
+
+def _keccak_f(state):
+    for rc in _KECCAK_RC:
+        c = [state[x] ^ state[x + 5] ^ state[x + 10] ^ state[x + 15] ^ state[x + 20] for x in range(5)]
+        d = [c[(x - 1) % 5] ^ _rol(c[(x + 1) % 5], 1) for x in range(5)]
+        a = [state[i] ^ d[i % 5] for i in range(25)]
+        b = [0] * 25
+        for x in range(5):
+            for y in range(5):
+                b[y + 5 * ((2 * x + 3 * y) % 5)] = _rol(a[x + 5 * y], _KECCAK_ROT[x][y])
+        for y in range(0, 25, 5):
+            for x in range(5):
+                state[y + x] = b[y + x] ^ (~b[y + (x + 1) % 5] & b[y + (x + 2) % 5])
+        state[0] ^= rc
+
+
+def keccak256(data):
+    """
+    Original Keccak-256 digest of data (bytes).
+    """
+    rate = 136
+    padded = bytearray(data) + b"\x01"
+    padded += b"\x00" * (-len(padded) % rate)
+    padded[-1] |= 0x80
+    state = [0] * 25
+    for offset in range(0, len(padded), rate):
+        for i in range(rate // 8):
+            state[i] ^= int.from_bytes(padded[offset + 8 * i:offset + 8 * i + 8], "little")
+        _keccak_f(state)
+    return b"".join(lane.to_bytes(8, "little") for lane in state[:4])
+
+
+# --- Checks ---
+
+def luhn_valid(number):
+    total = 0
+    for i, digit in enumerate(int(ch) for ch in reversed(number)):
+        if i % 2:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return total % 10 == 0
+
+
+def base58_decode(value):
+    number = 0
+    for ch in value:
+        if ch not in BASE58_INDEX:
+            return None
+        number = number * 58 + BASE58_INDEX[ch]
+    body = number.to_bytes((number.bit_length() + 7) // 8, "big")
+    return b"\x00" * (len(value) - len(value.lstrip("1"))) + body
+
+
+def base58check_valid(address, versions=(0x00, 0x05)):
+    raw = base58_decode(address)
+    if raw is None or len(raw) != 25 or raw[0] not in versions:
+        return False
+    return hashlib.sha256(hashlib.sha256(raw[:-4]).digest()).digest()[:4] == raw[-4:]
+
+
+def _bech32_polymod(values):
+    generator = [0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3]
+    chk = 1
+    for value in values:
+        top = chk >> 25
+        chk = (chk & 0x1ffffff) << 5 ^ value
+        for i in range(5):
+            chk ^= generator[i] if ((top >> i) & 1) else 0
+    return chk
+
+
+def bech32_valid(address, hrp="bc"):
+    """
+    Checks a SegWit address: bech32 for witness v0, bech32m for v1+ (BIP 173/350).
+    """
+    if address.lower() != address and address.upper() != address:
+        return False
+    address = address.lower()
+    sep = address.rfind("1")
+    if address[:sep] != hrp or len(address) - sep - 1 < 7:
+        return False
+    try:
+        data = [BECH32_INDEX[ch] for ch in address[sep + 1:]]
+    except KeyError:
+        return False
+    expanded = [ord(ch) >> 5 for ch in hrp] + [0] + [ord(ch) & 31 for ch in hrp]
+    const = _bech32_polymod(expanded + data)
+    version = data[0]
+    if version > 16 or const != (BECH32_CONST if version == 0 else BECH32M_CONST):
+        return False
+    # Regroup the 5-bit witness program into bytes
+    acc, bits, program = 0, 0, []
+    for value in data[1:-6]:
+        acc = (acc << 5) | value
+        bits += 5
+        if bits >= 8:
+            bits -= 8
+            program.append((acc >> bits) & 0xff)
+    if bits >= 5 or (acc << (8 - bits)) & 0xff:
+        return False
+    return 2 <= len(program) <= 40 and (version != 0 or len(program) in (20, 32))
+
+
+def eip55_status(address):
+    """
+    True/False for a mixed-case address whose EIP-55 checksum (does not)
+    match; None for all-lower/all-upper addresses, which carry no checksum.
+    """
+    digits = address[2:]
+    if digits.lower() == digits or digits.upper() == digits:
+        return None
+    digest = keccak256(digits.lower().encode()).hex()
+    return all(ch.upper() == ch if int(nibble, 16) >= 8 else ch.lower() == ch
+               for ch, nibble in zip(digits, digest) if ch.isalpha())
+
+
+def monero_valid(address):
+    raw = bytearray()
+    for start in range(0, len(address), 11):
+        block = address[start:start + 11]
+        size = MONERO_BLOCK_SIZES.get(len(block))
+        number = 0
+        for ch in block:
+            if ch not in BASE58_INDEX:
+                return False
+            number = number * 58 + BASE58_INDEX[ch]
+        if size is None or number >> (8 * size):
+            return False
+        raw += number.to_bytes(size, "big")
+    return len(raw) == 69 and keccak256(bytes(raw[:-4]))[:4] == bytes(raw[-4:])
+
+
+def shannon_entropy(value):
+    counts = Counter(value)
+    return -sum(n / len(value) * math.log2(n / len(value)) for n in counts.values())
+
+
+# --- Scoring ---
+
+def _score_credit_card(value):
+    if len(set(value)) <= 2:
+        return 0.05
+    return 0.95 if luhn_valid(value) else 0.05
+
+
+def _score_btc(value):
+    if value.lower().startswith("bc1"):
+        return 1.0 if bech32_valid(value) else 0.05
+    return 1.0 if base58check_valid(value) else 0.05
+
+
+def _score_eth(value):
+    status = eip55_status(value)
+    if status is None:
+        # Well-formed but unchecksummed; long runs of one digit are placeholders
+        return 0.2 if max(Counter(value[2:].lower()).values()) > 20 else 0.7
+    return 1.0 if status else 0.1
+
+
+def _score_xmr(value):
+    return 1.0 if monero_valid(value) else 0.05
+
+
+def _score_ssn(value):
+    digits = value.replace("-", "").replace(" ", "")
+    if digits in INVALID_SSNS or len(set(digits)) == 1:
+        return 0.0
+    # Without separators any 9-digit number matches
+    return 0.8 if len(digits) != len(value) else 0.4
+
+
+def _char_class(ch):
+    return 0 if ch.islower() else 1 if ch.isupper() else 2
+
+
+def _score_api_key(value):
+    lower = any(ch.islower() for ch in value)
+    upper = any(ch.isupper() for ch in value)
+    digit = any(ch.isdigit() for ch in value)
+    if lower + upper + digit < 2:
+        # Long words, digit runs, single-case identifiers
+        return 0.1
+    hex_only = digit and lower != upper and all(ch in HEX_DIGITS for ch in value)
+    alphabet = 16 if hex_only else 26 * lower + 26 * upper + 10 * digit
+    # Entropy relative to a random string of the same length over the same alphabet
+    ratio = shannon_entropy(value) / math.log2(min(len(value), alphabet))
+    score = min(1.0, max(0.0, (ratio - 0.7) / 0.25))
+    # Keys interleave character classes; words with a number appended do not
+    mixing = sum(_char_class(a) != _char_class(b) for a, b in zip(value, value[1:])) / (len(value) - 1)
+    score *= min(1.0, mixing / 0.25)
+    if not digit:
+        score *= 0.6
+    return round(score, 2)
+
+
+def _score_ipv4(value):
+    octets = value.split(".")
+    if octets[0] == "0" or value == "255.255.255.255":
+        return 0.3
+    return DEFAULT_CONFIDENCE["ipv4"]
+
+
+SCORERS = {
+    "credit_card": _score_credit_card,
+    "btc_address": _score_btc,
+    "eth_address": _score_eth,
+    "xmr_address": _score_xmr,
+    "ssn": _score_ssn,
+    "api_key_generic": _score_api_key,
+    "ipv4": _score_ipv4,
+}
+
+
+@lru_cache(maxsize=65536)
+def score_artifact(type_, value):
+    """
+    Confidence in [0, 1] that value really is an artifact of type_.
+    """
+    scorer = SCORERS.get(type_)
+    if scorer is None:
+        return DEFAULT_CONFIDENCE.get(type_, FALLBACK_CONFIDENCE)
+    try:
+        return scorer(value)
+    except Exception as e:
+        logger.debug(f"Could not validate {type_} '{value}': {e}")
+        return FALLBACK_CONFIDENCE
+
+
+class ArtifactValidator:
+    """
+    Validation stage between extraction and storage: scores a batch of
+    candidate artifacts (checksums, Luhn, SSN rules, entropy) and keeps the
+    ones whose confidence reaches the threshold.
+
+    Each distinct (type, value) in a batch is checked once. A generic API key
+    that also matched a specific type in the same batch is dropped.
+    """
+    def __init__(self, threshold=ARTIFACT_MIN_CONFIDENCE):
+        self.threshold = threshold
+
+    def validate(self, artifacts):
+        """
+        Sets 'confidence' on every artifact dict; returns the list.
+        """
+        scores = {key: score_artifact(*key) for key in {(a['type'], a['value']) for a in artifacts}}
+        # A token that matched a specific type (wallet, AWS key, ...) is not also a generic key
+        specific = {value for type_, value in scores if type_ != "api_key_generic"}
+        for art in artifacts:
+            score = scores[(art['type'], art['value'])]
+            if art['type'] == "api_key_generic" and art['value'] in specific:
+                score = 0.0
+            art['confidence'] = score
+        return artifacts
+
+    def filter(self, artifacts):
+        """
+        Validates artifacts and returns the ones at or above the threshold.
+        """
+        kept = [art for art in self.validate(artifacts) if art['confidence'] >= self.threshold]
+        if len(kept) < len(artifacts):
+            logger.debug(f"Validation dropped {len(artifacts) - len(kept)} of {len(artifacts)} artifacts.")
+        return kept
@@ -0,0 +1,293 @@
+import logging
+import re
+import threading
+import time
+from collections import deque
+
+from .analyzer import PATTERNS, CONTEXT_WINDOW, context_windows
+
+try:
+    from config import WATCHLIST_REFRESH_INTERVAL
+except ImportError:
+    WATCHLIST_REFRESH_INTERVAL = 60
+
+logger = logging.getLogger(__name__)
+
+# Shorter selectors match too much to be useful
+MIN_SELECTOR_LENGTH = 3
+# Rebuild the trie from scratch once removed selectors outnumber live ones
+COMPACT_RATIO = 1.0
+
+WALLET_RES = [re.compile(PATTERNS[name]) for name in ("btc_address", "eth_address", "xmr_address")]
+
+
+def normalize_selector(selector):
+    """
+    Canonical watchlist form of a selector (matching is case-insensitive).
+    """
+    return (selector or "").strip().lower()
+
+
+def guess_kind(selector):
+    """
+    Best-effort selector kind: wallet, email, onion, domain, handle or keyword.
+    """
+    if any(pattern.fullmatch(selector) for pattern in WALLET_RES):
+        return "wallet"
+    if selector.startswith("@") and len(selector) > 1:
+        return "handle"
+    if "@" in selector:
+        return "email"
+    if selector.endswith(".onion"):
+        return "onion"
+    if "." in selector and " " not in selector:
+        return "domain"
+    return "keyword"
+
+
+def _is_word(ch):
+    return ch.isalnum() or ch == "_"
+
+
+def _fold(text):
+    """
+    Lower-cases text without changing its length, so offsets stay valid.
+    """
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    # A few characters (e.g. 'İ') lower-case to two: fold them one by one
+    return "".join(low if len(low) == 1 else ch for ch, low in ((ch, ch.lower()) for ch in text))
+
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher: finds every occurrence of every keyword in one
+    pass over the text, however many keywords there are.
+
+    Keywords can be added and removed between scans. Added keywords only
+    extend the trie; removed ones just lose their output. The failure links
+    are recomputed once before the next scan, and the trie is rebuilt only
+    when removed keywords outnumber live ones.
+    """
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._goto = [{}]
+        self._own = [None]   # keyword ending at the state
+        self._fail = [0]
+        self._out = [()]     # (length, keyword) for every keyword ending at the state
+        self._keywords = {}  # keyword -> terminal state
+        self._removed = 0
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._keywords)
+
+    def __contains__(self, keyword):
+        return keyword in self._keywords
+
+    def add(self, keyword):
+        if not keyword or keyword in self._keywords:
+            return
+        state = 0
+        for ch in keyword:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._own.append(None)
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._own[state] = keyword
+        self._keywords[keyword] = state
+        self._dirty = True
+
+    def remove(self, keyword):
+        state = self._keywords.pop(keyword, None)
+        if state is None:
+            return
+        self._own[state] = None
+        self._removed += 1
+        self._dirty = True
+
+    def build(self):
+        """
+        Recomputes failure links and outputs after adds/removes (no-op otherwise).
+        """
+        if not self._dirty:
+            return
+        if self._removed > len(self._keywords) * COMPACT_RATIO:
+            keywords = list(self._keywords)
+            self._reset()
+            for keyword in keywords:
+                self.add(keyword)
+        goto, fail, own, out = self._goto, self._fail, self._own, self._out
+        out[0] = ()
+        queue = deque()
+        for state in goto[0].values():
+            fail[state] = 0
+            queue.append(state)
+        while queue:
+            state = queue.popleft()
+            inherited = out[fail[state]]
+            out[state] = ((len(own[state]), own[state]),) + inherited if own[state] else inherited
+            for ch, nxt in goto[state].items():
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                queue.append(nxt)
+        self._dirty = False
+
+    def finditer(self, text):
+        """
+        Yields (start, end, keyword) for every keyword occurrence, overlapping
+        ones included, in order of their end offset.
+        """
+        self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for index, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                end = index + 1
+                for length, keyword in out[state]:
+                    yield end - length, end, keyword
+
+
+class Watchlist:
+    """
+    Selectors (emails, domains, handles, wallets, keywords) watched across
+    every page the crawler sees, compiled into one AhoCorasick automaton so
+    a page is scanned once no matter how many selectors there are.
+
+    Selectors live in the watchlist table. Each instance pulls only the rows
+    changed since its last sync (at most every refresh_interval seconds) and
+    applies them to the automaton incrementally.
+    """
+    def __init__(self, storage=None, refresh_interval=WATCHLIST_REFRESH_INTERVAL, window=CONTEXT_WINDOW):
+        self.storage = storage
+        self.refresh_interval = refresh_interval
+        self.window = window
+        self._entries = {}  # selector -> {"selector", "kind", "label"}
+        self._automaton = AhoCorasick()
+        self._lock = threading.Lock()
+        self._synced_at = None
+        self._checked_at = 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def refresh(self, force=False):
+        """
+        Applies selectors added or removed elsewhere since the last sync.
+        """
+        if self.storage is None or (not force and time.time() - self._checked_at < self.refresh_interval):
+            return
+        self._checked_at = time.time()
+        try:
+            changes, synced_at = self.storage.get_watchlist_changes(self._synced_at)
+        except Exception as e:
+            logger.warning(f"Watchlist refresh failed: {e}")
+            return
+        with self._lock:
+            for entry in changes:
+                if entry["active"]:
+                    self._apply(entry)
+                else:
+                    self._drop(entry["selector"])
+            self._synced_at = synced_at
+        if changes:
+            logger.debug(f"Watchlist synced {len(changes)} changes ({len(self._entries)} selectors).")
+
+    def _apply(self, entry):
+        self._entries[entry["selector"]] = {
+            "selector": entry["selector"],
+            "kind": entry.get("kind"),
+            "label": entry.get("label")
+        }
+        self._automaton.add(entry["selector"])
+
+    def _drop(self, selector):
+        if self._entries.pop(selector, None) is not None:
+            self._automaton.remove(selector)
+
+    def add(self, selectors, kind=None, label=None):
+        """
+        Adds selectors (a string or a list). Returns the entries added.
+        """
+        if isinstance(selectors, str):
+            selectors = [selectors]
+        entries = []
+        for selector in selectors:
+            selector = normalize_selector(selector)
+            if len(selector) < MIN_SELECTOR_LENGTH:
+                logger.warning(f"Ignoring watchlist selector '{selector}': shorter than {MIN_SELECTOR_LENGTH} characters.")
+                continue
+            entries.append({"selector": selector, "kind": kind or guess_kind(selector), "label": label})
+        if self.storage is not None:
+            self.storage.add_watchlist_entries(entries)
+        with self._lock:
+            for entry in entries:
+                self._apply(entry)
+        return entries
+
+    def remove(self, selectors):
+        """
+        Removes selectors (a string or a list). Returns the number removed.
+        """
+        if isinstance(selectors, str):
+            selectors = [selectors]
+        selectors = [normalize_selector(s) for s in selectors]
+        with self._lock:
+            before = len(self._entries)
+            for selector in selectors:
+                self._drop(selector)
+            removed = before - len(self._entries)
+        if self.storage is not None:
+            removed = self.storage.remove_watchlist_entries(selectors)
+        return removed
+
+    def entries(self):
+        self.refresh()
+        with self._lock:
+            return sorted(self._entries.values(), key=lambda entry: entry["selector"])
+
+    def scan(self, text):
+        """
+        Every watched selector in text, as hit dicts with the selector's
+        kind/label, the matched text, its offsets and surrounding context.
+        Selectors that start or end with a word character only match on
+        word boundaries ('bob' does not hit 'bobby').
+        """
+        self.refresh()
+        if not text or not self._entries:
+            return []
+        with self._lock:
+            self._automaton.build()
+            matches = []
+            for start, end, selector in self._automaton.finditer(_fold(text)):
+                if _is_word(selector[0]) and start > 0 and _is_word(text[start - 1]):
+                    continue
+                if _is_word(selector[-1]) and end < len(text) and _is_word(text[end]):
+                    continue
+                matches.append((start, end, self._entries[selector]))
+        if not matches:
+            return []
+        matches.sort(key=lambda match: (match[0], match[1]))
+        windows, owners = context_windows([(start, end) for start, end, _ in matches], len(text), self.window)
+        return [{
+            "selector": entry["selector"],
+            "kind": entry["kind"],
+            "label": entry["label"],
+            "value": text[start:end],
+            "start": start,
+            "end": end,
+            "context": " ".join(text[windows[owner][0]:windows[owner][1]].split())
+        } for (start, end, entry), owner in zip(matches, owners)]
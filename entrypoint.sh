@@ -4,6 +4,21 @@
 echo "Starting Tor..."
 tor --runasdaemon 1
 
+# Extra Tor instances (separate guards and circuits) on SocksPorts 9060, 9070, ...
+TOR_INSTANCES=${TOR_INSTANCES:-1}
+EXTRA_PORTS=""
+for i in $(seq 1 $((TOR_INSTANCES - 1))); do
+    PORT=$((9050 + i * 10))
+    mkdir -p /var/lib/tor/instance$i
+    tor --runasdaemon 1 -f /dev/null --SocksPort "$PORT ExtendedErrors" --ControlPort 0 \
+        --DataDirectory /var/lib/tor/instance$i
+    EXTRA_PORTS="$EXTRA_PORTS${EXTRA_PORTS:+,}$PORT"
+done
+if [ -n "$EXTRA_PORTS" ] && [ -z "$TOR_SOCKS_PORTS" ]; then
+    export TOR_SOCKS_PORTS="$EXTRA_PORTS"
+    echo "Extra Tor instances on ports $TOR_SOCKS_PORTS"
+fi
+
 # Wait for Tor to bootstrap
 echo "Waiting for Tor to be ready..."
 sleep 10